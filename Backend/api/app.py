@@ -6,9 +6,10 @@ Authors: Meekaaeel Booley(BLYMEE001), Mubashir Dawood(DWDMUB001),
 This Flask backend follows a typical REST API structure with these key components:
 
     1. Authentication: Uses API keys (basic protection) and session management
-    2. File Processing: Handles PDF, DOCX, and TXT file uploads
+    2. File Processing: Handles PDF, DOCX, ODT, RTF, HTML, Markdown and TXT file uploads (or a ZIP of them, analysed in parallel)
     3. AI Detection: Uses a pre-trained model ( electra) to analyze text for AI/human classification
     4. Session Storage: SQLite for persistence with memory fallback
+       (plus a content-addressed cache so re-uploaded files skip extraction and the model)
     5. Error Handling: Comprehensive error handling for different scenarios
 
 The main flow for AI detection:
@@ -28,15 +29,23 @@ Key design choices:
     - CORS enabled for frontend communication
 """
 
-from flask import Flask, request, jsonify, session
+from flask import Flask, Request, request, jsonify, session, Response
+from werkzeug.exceptions import HTTPException
 from flask_cors import CORS
 import uuid
 import datetime
 from functools import wraps
 import os
-from services.file_processor import FileProcessor
+from services.file_processor import FileProcessor, FileTooLargeError
 from services.text_analyser import TextAnalyser
 from services.sqlite_manager import sqlite_manager
+from services.response_encoder import response_encoder, FormatNotAvailableError
+from services.analysis_cache import analysis_cache
+from services.session_maintenance import session_maintenance
+from services.fallback_store import fallback_store
+from services.archive_analyser import ArchiveAnalyser
+from services.extraction_pool import extraction_pool
+from services.extractor_registry import extractor_registry
 
 # API keys for basic authentication... in a non-academic project we'd use environment variables
 API_KEYS = {"jackboys25"}
@@ -56,13 +65,29 @@ def require_api_key(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Request class that writes uploaded files into a size-limited spooled buffer as they stream in,
+# instead of werkzeug's default buffer. Oversized uploads are rejected part way through.
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return file_processor.create_upload_buffer()
+
 # Initialize Flask app
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-here')
 
 # Configure upload settings from FileProcessor class
-app.config['UPLOAD_FOLDER'] = FileProcessor().upload_folder
-app.config['MAX_CONTENT_LENGTH'] = FileProcessor.MAX_FILE_SIZE
+# Whole request limit: the file limit plus some room for the multipart headers and form fields.
+# The per-file limit itself is enforced by UploadRequest while the file streams in.
+app.config['MAX_CONTENT_LENGTH'] = FileProcessor.MAX_FILE_SIZE + 64 * 1024
+
+# Default time budget (seconds) for a single analysis. Unset = no limit.
+# Past the budget the analyser returns a partial result instead of blowing the gateway timeout.
+app.config['ANALYSIS_TIME_BUDGET'] = float(os.environ['ANALYSIS_TIME_BUDGET']) if os.environ.get('ANALYSIS_TIME_BUDGET') else None
+
+# History is returned a page at a time: ?limit= (default HISTORY_PAGE_SIZE, at most HISTORY_MAX_PAGE_SIZE)
+app.config['HISTORY_PAGE_SIZE'] = int(os.environ.get('HISTORY_PAGE_SIZE', '20'))
+app.config['HISTORY_MAX_PAGE_SIZE'] = int(os.environ.get('HISTORY_MAX_PAGE_SIZE', '100'))
 
 # Session security settings
 app.config.update(
@@ -91,12 +116,10 @@ CORS(app,
      expose_headers=["Set-Cookie", "X-Session-ID"],
      methods=["GET", "POST", "DELETE", "OPTIONS"])
 
-# Fallback session storage if SQLite fails
-session_data = {}
-
 # Initialize our main service classes
 file_processor = FileProcessor()
-text_analyser = TextAnalyser()
+text_analyser = TextAnalyser(time_budget=app.config['ANALYSIS_TIME_BUDGET'])
+archive_analyser = ArchiveAnalyser(file_processor, text_analyser, analysis_cache)
 
 # Decorator to ensure session exists for each request - FIXED VERSION
 def ensure_session(f):
@@ -133,20 +156,27 @@ def ensure_session(f):
         # Store the session ID in request for easy access
         request.session_id = session_id
         
+        # Expired sessions and old history are cleaned up in the background (started on the first request)
+        session_maintenance.start()
+        # Replays analyses left in the fallback log by an earlier run (only does anything on the first request)
+        fallback_store.start()
+
         # Try to get session from SQLite, create if not exists
-        session_data_sqlite = sqlite_manager.get_session(session_id)
-        if not session_data_sqlite:
+        # (only the session's own fields and a count, its analyses aren't loaded on every request).
+        # touch=True: this request counts as activity, so the session doesn't expire while it's in use
+        session_info = sqlite_manager.get_session_info(session_id, touch=True)
+        if not session_info:
             print(f"DEBUG: Creating new session in SQLite for ID: {session_id}")
-            session_data_sqlite = {
-                'created_at': datetime.datetime.now(),
-                'analyses': []
+            session_info = {
+                'created_at': datetime.datetime.now()
             }
-            sqlite_manager.store_session(session_id, session_data_sqlite)
+            sqlite_manager.store_session(session_id, session_info)
+            session_info['total_analyses'] = 0
         else:
-            print(f"DEBUG: Found existing session in SQLite with {len(session_data_sqlite.get('analyses', []))} analyses")
+            print(f"DEBUG: Found existing session in SQLite with {session_info['total_analyses']} analyses")
         
         # Store session data in request context for easy access
-        request.session_data = session_data_sqlite
+        request.session_data = session_info
         
         return f(*args, **kwargs)
     return decorated_function
@@ -160,11 +190,20 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.datetime.now().isoformat(),
-        'supported_formats': list(FileProcessor.ALLOWED_EXTENSIONS),
+        'supported_formats': sorted(extractor_registry.extensions),
+        'archive_formats': list(FileProcessor.ARCHIVE_EXTENSIONS),
+        'max_archive_files': FileProcessor.MAX_ARCHIVE_MEMBERS,
         'max_file_size_kb': FileProcessor.MAX_FILE_SIZE / 1024,
         'max_text_length': TextAnalyser.MAX_TEXT_LENGTH,
         'database_status': db_status,
-        'database_type': db_type
+        'database_type': db_type,
+        'database_pool': sqlite_manager.get_pool_stats(),
+        'database_write_behind': sqlite_manager.get_write_behind_stats(),
+        'database_maintenance': session_maintenance.get_stats(),
+        'database_session_cache': sqlite_manager.get_session_cache_stats(),
+        'fallback_store': fallback_store.get_stats(),
+        'analysis_cache': analysis_cache.get_stats(),
+        'extraction_sandbox': extraction_pool.get_stats() if file_processor.sandbox else None
     })
 
 @app.route('/api/detect', methods=['POST'])
@@ -177,14 +216,93 @@ def detect_ai():
         filename = None
         source_type = 'text'
         is_file_upload = False
+        analysis_result = None
+        cache_key = None
+        cache_hit = False
+
+        # Clients can opt in to the compact columnar format (see services/response_encoder.py).
+        # Decided first, so a format we can't produce is refused before any analysis runs
+        try:
+            response_format = response_encoder.negotiate_format(request.accept_mimetypes, request.args.get('format'))
+        except FormatNotAvailableError as e:
+            return jsonify({
+                'error': str(e)
+            }), 406
+
+        # Options can come from a JSON body or form fields
+        json_data = request.get_json(silent=True) if request.is_json else None
+        if not isinstance(json_data, dict):
+            json_data = {}
+
+        # Check if user wants to force single analysis (ignore sentence splitting)
+        force_single_analysis = False
+        if json_data.get('force_single_analysis', False):
+            force_single_analysis = True
+        elif 'force_single_analysis' in request.form:
+            force_single_analysis = True
+
+        # Sampling mode: score a stratified sample with confidence intervals (for very long documents)
+        sampling = False
+        if json_data.get('sampling', False):
+            sampling = True
+        elif 'sampling' in request.form:
+            sampling = True
+
+        # Optional per-request time budget in seconds (falls back to the server default)
+        time_budget = None
+        if 'time_budget' in json_data:
+            time_budget = json_data['time_budget']
+        elif 'time_budget' in request.form:
+            time_budget = request.form['time_budget']
+        if time_budget is not None:
+            try:
+                time_budget = float(time_budget)
+            except (TypeError, ValueError):
+                time_budget = -1
+            if time_budget <= 0:
+                return jsonify({
+                    'error': 'time_budget must be a positive number of seconds'
+                }), 400
+
+        # Uploaded files are analysed while they're being extracted (PDFs page by page).
+        # Time budgets and sampling need every sentence up front, so they take the regular path.
+        stream_analysis = not sampling and time_budget is None and text_analyser.time_budget is None
         
         # Handle file upload
         if 'file' in request.files:
             file = request.files['file']
+
+            # A ZIP of documents gets one result per file plus an aggregate
+            if file_processor.is_archive(file.filename):
+                return detect_archive(file, force_single_analysis, time_budget, sampling, response_format)
+
             try:
-                text, filename = file_processor.process_file(file)
+                text_chunks, filename = file_processor.stream_file(file)
                 source_type = 'file'
                 is_file_upload = True
+
+                # Same bytes + same model + same mode = same answer, so check the cache before extracting.
+                # Sampled results are estimates and are never cached.
+                if not sampling:
+                    digest = file_processor.content_digest(file)
+                    if digest:
+                        cache_key = analysis_cache.make_key(digest, text_analyser.model_version, force_single_analysis)
+                cached = analysis_cache.get(cache_key) if cache_key else None
+
+                if cached:
+                    text_chunks.close()  # Nothing extracted yet, just release the upload buffer
+                    text, analysis_result = cached
+                    analysis_result['result']['filename'] = filename
+                    cache_hit = True
+                elif stream_analysis:
+                    text, analysis_result = text_analyser.analyse_stream(
+                        text_chunks,
+                        source_type=source_type,
+                        filename=filename,
+                        force_single_analysis=force_single_analysis,
+                    )
+                else:
+                    text = ''.join(text_chunks).strip()
             except ValueError as e:
                 return jsonify({
                     'error': str(e)
@@ -238,27 +356,27 @@ def detect_ai():
                     'error': f'Text must be less than {text_analyser.MAX_TEXT_LENGTH:,} characters'
                 }), 400
 
-        # Check if user wants to force single analysis (ignore sentence splitting)
-        force_single_analysis = False
-        if request.is_json and request.get_json().get('force_single_analysis', False):
-            force_single_analysis = True
-        elif 'force_single_analysis' in request.form:
-            force_single_analysis = True
-        
-        # Perform the actual AI detection analysis
-        try:
-            analysis_result = text_analyser.analyse_text(
-                text, 
-                source_type=source_type, 
-                filename=filename, 
-                force_single_analysis=force_single_analysis,
-            )
-        except ValueError as e:
-            return jsonify({'error': str(e)}), 400
-        except Exception as e:
-            return jsonify({
-                'error': 'Text analysis failed'
-            }), 500
+        # Perform the actual AI detection analysis (unless the upload was already analysed while streaming)
+        if analysis_result is None:
+            try:
+                analysis_result = text_analyser.analyse_text(
+                    text, 
+                    source_type=source_type, 
+                    filename=filename, 
+                    force_single_analysis=force_single_analysis,
+                    time_budget=time_budget,
+                    sampling=sampling,
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            except Exception as e:
+                return jsonify({
+                    'error': 'Text analysis failed'
+                }), 500
+
+        # Remember finished file analyses for the next upload of the same file
+        if cache_key and not cache_hit:
+            analysis_cache.put(cache_key, text, analysis_result)
 
         # Generate unique ID for this analysis
         analysis_id = str(uuid.uuid4())
@@ -274,37 +392,21 @@ def detect_ai():
             **analysis_result['session_data']  # Merge analysis results
         }
 
-        # Debug output to help with development
+        # Debug output to help with development (ensure_session already loaded the session,
+        # so we don't read it again before or after storing)
         print(f"=== SESSION DEBUG ===")
         print(f"Session ID: {request.session_id}")
         print(f"Analysis stored with ID: {analysis_id}")
-        
-        # Get current session to check before update
-        session_data_sqlite = sqlite_manager.get_session(request.session_id)
-        if session_data_sqlite:
-            print(f"Analyses in SQLite BEFORE update: {len(session_data_sqlite.get('analyses', []))}")
-        else:
-            print("No session data found in SQLite before update")
+        print(f"Analyses in session BEFORE update: {request.session_data['total_analyses']}")
         print("=====================")
 
         # Store analysis in session (SQLite preferred, fallback to memory)
         try:
-            if sqlite_manager and sqlite_manager.update_session_analyses(request.session_id, session_analysis):
-                print(f"{analysis_result['analysis_type']} analysis stored in SQLite")
-                
-                # Verify storage worked
-                updated_session = sqlite_manager.get_session(request.session_id)
-                if updated_session:
-                    print(f"Analyses in SQLite AFTER update: {len(updated_session.get('analyses', []))}")
-                    if updated_session.get('analyses'):
-                        print(f"Latest analysis ID: {updated_session['analyses'][-1].get('id', 'No ID')}")
-            else:
-                print("SQLite storage failed, falling back to in-memory session storage")
-                if request.session_id not in session_data:
-                    session_data[request.session_id] = {'analyses': []}
-                session_data[request.session_id]['analyses'].append(session_analysis)
-                print(f"{analysis_result['analysis_type']} analysis stored in session (fallback)")
-                
+            if not store_analysis_in_session(request.session_id, session_analysis):
+                return jsonify({
+                    'error': 'Failed to store analysis in session'
+                }), 500
+            print(f"{analysis_result['analysis_type']} analysis stored")
         except Exception as e:
             print(f"Error storing analysis: {e}")
             import traceback
@@ -319,14 +421,28 @@ def detect_ai():
             'analysis_id': analysis_id,
             'analysis_type': analysis_result['analysis_type'],
             'result': analysis_result['result'],
+            'cached': cache_hit,
             'session_id': request.session_id  # CRITICAL: Always include session ID
         }
         
         # Add sentence results if available
         if 'sentence_results' in analysis_result:
             response_data['sentence_results'] = analysis_result['sentence_results']
-            
-        return jsonify(response_data)
+
+        if response_format == 'json':
+            response = jsonify(response_data)
+        else:
+            body, mimetype = response_encoder.encode(response_encoder.to_compact(response_data), response_format)
+            response = Response(body, mimetype=mimetype)
+        response.vary.add('Accept')
+        return response
+    except FileTooLargeError as e:
+        return jsonify({
+            'error': str(e)
+        }), 413
+    except HTTPException:
+        # e.g. 413 from MAX_CONTENT_LENGTH, let Flask's error handlers deal with it
+        raise
     except ValueError as e:
         return jsonify({
             'error': str(e)
@@ -339,41 +455,125 @@ def detect_ai():
             'error': 'Internal server error'
         }), 500
 
+def store_analysis_in_session(session_id, session_analysis):
+    """Append an analysis to the session (SQLite preferred, fallback store until SQLite recovers).
+    Returns False if neither could keep it"""
+    if sqlite_manager and sqlite_manager.update_session_analyses(session_id, session_analysis):
+        return True
+    print("SQLite storage failed, keeping the analysis in the fallback store")
+    if fallback_store.add(session_id, session_analysis):
+        return True
+    print(f"ERROR: analysis {session_analysis['id']} could not be stored anywhere (SQLite and fallback log both failed)")
+    return False
+
+def detect_archive(file, force_single_analysis, time_budget, sampling, response_format):
+    """Analyse every document in an uploaded ZIP (called by detect_ai)"""
+    archive_result = archive_analyser.analyse_archive(
+        file,
+        force_single_analysis=force_single_analysis,
+        time_budget=time_budget,
+        sampling=sampling,
+    )
+
+    files = []
+    for entry in archive_result['files']:
+        item = {
+            'filename': entry['filename'],
+            'success': entry['success'],
+            'cached': entry['cached']
+        }
+        if not entry['success']:
+            item['error'] = entry['error']
+            if entry['timed_out']:
+                item['timed_out'] = True
+            files.append(item)
+            continue
+
+        # Each document is stored as its own analysis, so it shows up in the history like a single upload
+        text = entry['text']
+        analysis_result = entry['analysis']
+        analysis_id = str(uuid.uuid4())
+        stored = store_analysis_in_session(request.session_id, {
+            'id': analysis_id,
+            'text_preview': text[:500] + ('...' if len(text) > 500 else ''),
+            'timestamp': datetime.datetime.now(),
+            'text_length': len(text),
+            'source_type': 'file',
+            'filename': entry['filename'],
+            'archive': archive_result['filename'],
+            **analysis_result['session_data']
+        })
+        if not stored:
+            item.update({'success': False, 'error': 'Failed to store analysis in session'})
+            files.append(item)
+            continue
+
+        item.update({
+            'analysis_id': analysis_id,
+            'analysis_type': analysis_result['analysis_type'],
+            'result': analysis_result['result']
+        })
+        if 'sentence_results' in analysis_result:
+            item['sentence_results'] = analysis_result['sentence_results']
+        if response_format != 'json':
+            item = response_encoder.to_compact(item)
+        files.append(item)
+
+    print(f"Archive {archive_result['filename']}: {archive_result['aggregate']['analysed_files']} files analysed")
+
+    response_data = {
+        'success': True,
+        'analysis_type': 'archive',
+        'archive': archive_result['filename'],
+        'aggregate': archive_result['aggregate'],
+        'files': files,
+        'skipped': archive_result['skipped'],
+        'session_id': request.session_id
+    }
+    if response_format == 'json':
+        response = jsonify(response_data)
+    else:
+        body, mimetype = response_encoder.encode(response_data, response_format)
+        response = Response(body, mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
+
 @app.route('/api/history', methods=['GET'])
 @require_api_key
 @ensure_session
 def get_history():
-    """Get analysis history for current session"""
+    """Get one page of analysis history for current session, newest first.
+    Only summaries are returned (no per-sentence results), /api/analysis/<id> has the full analysis.
+    Pass the response's next_cursor as ?cursor= to get the next page."""
     try:
         session_id = request.session_id
         print(f"DEBUG HISTORY: Getting history for session: {session_id}")
-        
-        session_data_sqlite = sqlite_manager.get_session(session_id)
-        
-        if not session_data_sqlite:
-            print(f"DEBUG HISTORY: No session data found for {session_id}")
+
+        try:
+            limit = int(request.args.get('limit', app.config['HISTORY_PAGE_SIZE']))
+        except ValueError:
             return jsonify({
-                'success': True,
-                'analyses': [],
-                'total_analyses': 0,
-                'session_id': session_id
-            })
-        
-        # Make sure we're getting the analyses list
-        analyses = session_data_sqlite.get('analyses', [])
-        print(f"DEBUG HISTORY: Retrieved {len(analyses)} analyses from SQLite for session {session_id}")
-        
-        if analyses:
-            print(f"DEBUG HISTORY: First analysis ID: {analyses[0].get('id', 'No ID')}")
-            print(f"DEBUG HISTORY: Last analysis ID: {analyses[-1].get('id', 'No ID')}")
-        
-        # Return only recent analyses to avoid huge responses
-        recent_analyses = analyses[-20:] if len(analyses) > 20 else analyses
+                'error': 'limit must be a whole number'
+            }), 400
+        limit = max(1, min(limit, app.config['HISTORY_MAX_PAGE_SIZE']))
+
+        cursor = request.args.get('cursor')
+        try:
+            # Analyses still waiting in the fallback store (SQLite was down) are paged along with the stored ones
+            page = sqlite_manager.get_history_page(session_id, limit, cursor, fallback_store.get_summaries(session_id))
+        except ValueError as e:
+            return jsonify({
+                'error': str(e)
+            }), 400
+        analyses = page['analyses']
+        print(f"DEBUG HISTORY: Retrieved {len(analyses)} of {page['total_analyses']} analyses for session {session_id}")
         
         return jsonify({
             'success': True,
-            'analyses': recent_analyses,
-            'total_analyses': len(analyses),
+            'analyses': analyses,
+            'total_analyses': page['total_analyses'],
+            'next_cursor': page['next_cursor'],
+            'limit': limit,
             'session_id': session_id  # Include session ID in response
         })
         
@@ -392,16 +592,11 @@ def get_analysis(analysis_id):
     """Get specific analysis by ID"""
     try:
         session_id = request.session_id
-        session_data_sqlite = sqlite_manager.get_session(session_id)
-        
-        if not session_data_sqlite:
-            return jsonify({
-                'error': 'Session not found'
-            }), 404
-        
-        analyses = session_data_sqlite.get('analyses', [])
-        # Find the specific analysis by ID
-        analysis = next((a for a in analyses if a['id'] == analysis_id), None)
+        # Looked up by ID, and only returned if it belongs to this session
+        analysis = sqlite_manager.get_analysis(session_id, analysis_id)
+        if not analysis:
+            # Not in SQLite (yet) if it was stored while the database was down
+            analysis = next((a for a in fallback_store.get_analyses(session_id) if a.get('id') == analysis_id), None)
         
         if not analysis:
             return jsonify({
@@ -427,20 +622,18 @@ def get_session_info():
     """Get basic session information"""
     try:
         session_id = request.session_id
-        session_data_sqlite = sqlite_manager.get_session(session_id)
+        session_info = sqlite_manager.get_session_info(session_id)
         
-        if not session_data_sqlite:
+        if not session_info:
             return jsonify({
                 'error': 'Session not found'
             }), 404
         
-        analyses_count = len(session_data_sqlite.get('analyses', []))
-        
         return jsonify({
             'success': True,
             'session_id': session_id,  # Always include session ID
-            'created_at': session_data_sqlite.get('created_at', '').isoformat() if session_data_sqlite.get('created_at') else None,
-            'total_analyses': analyses_count
+            'created_at': session_info.get('created_at', '').isoformat() if session_info.get('created_at') else None,
+            'total_analyses': session_info['total_analyses']
         })
         
     except Exception as e:
@@ -458,10 +651,14 @@ def clear_history():
         session_id = request.session_id
         print(f"DEBUG CLEAR: Clearing history for session: {session_id}")
         
-        if not sqlite_manager.clear_session_analyses(session_id):
-            return jsonify({
-                'error': 'Failed to clear history'
-            }), 500
+        # Analyses waiting in the fallback store are part of the history too. Replays are paused so one can't
+        # write them back into SQLite between the two
+        with fallback_store.replay_paused():
+            if not sqlite_manager.clear_session_analyses(session_id):
+                return jsonify({
+                    'error': 'Failed to clear history'
+                }), 500
+            fallback_store.discard(session_id)
         
         return jsonify({
             'success': True,
@@ -542,11 +739,32 @@ def debug_session_detail(session_id):
             'error': str(e)
         }), 500
         
+# Compress large responses if the client supports it (gzip, or brotli when installed)
+@app.after_request
+def compress_response(response):
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    body = response.get_data()
+    if len(body) < response_encoder.COMPRESSION_MIN_SIZE:
+        return response
+
+    encoding = response_encoder.choose_encoding(request.accept_encodings)
+    if not encoding:
+        return response
+
+    response.set_data(response_encoder.compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
 # Error handlers for common HTTP errors
 @app.errorhandler(413)
 def too_large(e):
     return jsonify({
-        'error': 'File too large'
+        'error': f"File too large (maximum {FileProcessor.MAX_FILE_SIZE // (1024 * 1024)}MB)"
     }), 413
 
 @app.errorhandler(404)
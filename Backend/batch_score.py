@@ -0,0 +1,275 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+Offline batch scorer. Runs TextAnalyser over a whole corpus without going through the HTTP API.
+
+Supported Inputs:
+    A directory: every supported document (PDF, DOCX, ODT, RTF, HTML, Markdown, TXT) under it (recursively) is scored, the document ID is its relative path.
+    A JSONL file: one JSON object per line, e.g. the repo's requests.jsonl. The text and ID fields are configurable.
+
+How It Works:
+    A pool of worker processes each loads its own copy of the model once, then scores documents as they come in.
+    Only a bounded number of documents are in flight at a time, so a 100k document corpus never sits in memory.
+    Results are written to the output file (JSONL or CSV) as soon as each document finishes.
+
+Resuming:
+    Every finished document ID is appended to a checkpoint file (<output>.checkpoint by default).
+    Re-running the same command skips those IDs and appends to the existing output, so an interrupted run
+    picks up where it stopped. At worst the document that was being written when it died is scored twice.
+
+Usage examples:
+
+    python batch_score.py ./submissions -o results.csv
+    python batch_score.py ../requests.jsonl -o scores.jsonl --text-field body --id-field request_id --workers 4
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from services.file_processor import FileProcessor
+
+# Columns written for every document (CSV header order, JSONL keys)
+RESULT_FIELDS = [
+    'id', 'source', 'status', 'analysis_type', 'classification', 'ai_probability',
+    'ai_percentage', 'sentence_count', 'text_length', 'elapsed_ms', 'error'
+]
+
+# Set in each worker process by _init_worker
+_worker_analyser = None
+_worker_file_processor = None
+
+
+def _init_worker(threads_per_worker):
+    # Runs once in each worker process: load the model and limit torch's own threading
+    # so N workers don't each try to use every core
+    global _worker_analyser, _worker_file_processor
+    import torch
+    torch.set_num_threads(threads_per_worker)
+
+    from services.text_analyser import TextAnalyser
+    _worker_analyser = TextAnalyser()
+    _worker_file_processor = FileProcessor()
+
+
+def _extract_file(path):
+    # Extract text from a file on disk using the same extractors as the API
+    file_type = _worker_file_processor.detect_format(path, path)
+    return _worker_file_processor.extract_text(path, file_type)
+
+
+def _score_document(job):
+    # Score one document inside a worker process. Never raises, errors are reported in the record
+    doc_id, path, text, force_single_analysis = job
+    start = time.perf_counter()
+    record = dict.fromkeys(RESULT_FIELDS)
+    record.update({'id': doc_id, 'source': path or 'jsonl'})
+
+    try:
+        if path is not None:
+            text = _extract_file(path)
+        text = (text or '').strip()
+        record['text_length'] = len(text)
+
+        analysis = _worker_analyser.analyse_text(
+            text,
+            source_type='file' if path else 'text',
+            filename=os.path.basename(path) if path else None,
+            force_single_analysis=force_single_analysis,
+        )
+        result = analysis['result']
+        record['status'] = 'ok'
+        record['analysis_type'] = analysis['analysis_type']
+        if analysis['analysis_type'] == 'sentence_level':
+            record['classification'] = result['overall_classification']
+            record['ai_probability'] = result['overall_ai_probability']
+            record['ai_percentage'] = result['ai_percentage']
+            record['sentence_count'] = result['sentence_count']
+        else:
+            record['classification'] = result['classification']
+            record['ai_probability'] = round(result['ai_probability'], 4)
+            record['ai_percentage'] = 100.0 if result['ai_probability'] > 0.5 else 0.0
+            record['sentence_count'] = 1
+    except Exception as e:
+        record['status'] = 'error'
+        record['error'] = str(e)
+
+    record['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return record
+
+
+def iter_directory_jobs(root, force_single_analysis):
+    # Yield a job for every supported file under root, in a stable order
+    file_processor = FileProcessor()
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if file_processor.allowed_file(filename):
+                path = os.path.join(dirpath, filename)
+                yield os.path.relpath(path, root), path, None, force_single_analysis
+
+
+def iter_jsonl_jobs(jsonl_path, id_field, text_field, force_single_analysis):
+    # Yield a job for every line of a JSONL file. Lines without text are skipped with a warning
+    with open(jsonl_path, 'r', encoding='utf-8') as file:
+        for line_number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping line {line_number}: invalid JSON ({e})", file=sys.stderr)
+                continue
+
+            text = item.get(text_field)
+            if not isinstance(text, str):
+                print(f"Skipping line {line_number}: no '{text_field}' field", file=sys.stderr)
+                continue
+            doc_id = str(item.get(id_field, line_number))
+            yield doc_id, None, text, force_single_analysis
+
+
+def load_checkpoint(checkpoint_path):
+    # Read the IDs of documents that were already scored in a previous run
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, 'r', encoding='utf-8') as file:
+        return {line.rstrip('\n') for line in file if line.strip()}
+
+
+class ResultWriter:
+    # Streams result records to a JSONL or CSV file, appending when resuming
+
+    def __init__(self, output_path, output_format):
+        self.output_format = output_format
+        is_new = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        self.file = open(output_path, 'a', encoding='utf-8', newline='')
+        if output_format == 'csv':
+            self.csv_writer = csv.DictWriter(self.file, fieldnames=RESULT_FIELDS)
+            if is_new:
+                self.csv_writer.writeheader()
+
+    def write(self, record):
+        if self.output_format == 'csv':
+            self.csv_writer.writerow(record)
+        else:
+            self.file.write(json.dumps(record) + '\n')
+        # Flush every record so a crash never loses finished work
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def run(jobs, output_path, output_format, checkpoint_path, workers, threads_per_worker, progress_interval):
+    # Score every job with a process pool, streaming results and checkpointing as we go
+    done_ids = load_checkpoint(checkpoint_path)
+    if done_ids:
+        print(f"Resuming: {len(done_ids)} documents already scored, skipping them", file=sys.stderr)
+    jobs = (job for job in jobs if job[0] not in done_ids)
+
+    writer = ResultWriter(output_path, output_format)
+    checkpoint = open(checkpoint_path, 'a', encoding='utf-8')
+
+    # Keep a few jobs queued per worker so nobody sits idle, but never the whole corpus
+    max_in_flight = workers * 4
+    completed = 0
+    errors = 0
+    start = time.perf_counter()
+    last_report = start
+
+    # spawn instead of fork: torch doesn't like being forked after it has started threads
+    context = multiprocessing.get_context('spawn')
+    try:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(threads_per_worker,),
+        ) as pool:
+            in_flight = set()
+            exhausted = False
+
+            while in_flight or not exhausted:
+                # Top up the pool
+                while not exhausted and len(in_flight) < max_in_flight:
+                    job = next(jobs, None)
+                    if job is None:
+                        exhausted = True
+                        break
+                    in_flight.add(pool.submit(_score_document, job))
+
+                if not in_flight:
+                    break
+
+                finished, in_flight = concurrent.futures.wait(
+                    in_flight, timeout=progress_interval, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in finished:
+                    record = future.result()
+                    writer.write(record)
+                    # Only checkpoint after the result is safely written
+                    checkpoint.write(record['id'] + '\n')
+                    checkpoint.flush()
+                    completed += 1
+                    if record['status'] != 'ok':
+                        errors += 1
+
+                now = time.perf_counter()
+                if now - last_report >= progress_interval:
+                    rate = completed / (now - start)
+                    print(f"Scored {completed} documents ({errors} errors), {rate:.2f} docs/sec", file=sys.stderr)
+                    last_report = now
+    finally:
+        writer.close()
+        checkpoint.close()
+
+    elapsed = time.perf_counter() - start
+    rate = completed / elapsed if elapsed > 0 else 0.0
+    print(f"Done: {completed} documents ({errors} errors) in {elapsed:.1f}s, {rate:.2f} docs/sec", file=sys.stderr)
+    return completed, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score a directory of documents or a JSONL corpus offline.')
+    parser.add_argument('input', help='Directory of documents (PDF, DOCX, ODT, RTF, HTML, Markdown, TXT), or a .jsonl file')
+    parser.add_argument('-o', '--output', required=True, help='Output file (.jsonl or .csv)')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help='Output format (default: from the output file extension)')
+    parser.add_argument('--checkpoint', help='Checkpoint file (default: <output>.checkpoint)')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2), help='Worker processes')
+    parser.add_argument('--threads-per-worker', type=int, default=1, help='Torch threads per worker')
+    parser.add_argument('--text-field', default='text', help='JSONL field holding the text')
+    parser.add_argument('--id-field', default='id', help='JSONL field holding the document ID')
+    parser.add_argument('--force-single-analysis', action='store_true', help='Score each document as a whole')
+    parser.add_argument('--progress-interval', type=float, default=5.0, help='Seconds between progress reports')
+    args = parser.parse_args(argv)
+
+    output_format = args.format or ('csv' if args.output.lower().endswith('.csv') else 'jsonl')
+    checkpoint_path = args.checkpoint or args.output + '.checkpoint'
+
+    if os.path.isdir(args.input):
+        jobs = iter_directory_jobs(args.input, args.force_single_analysis)
+    elif os.path.isfile(args.input):
+        jobs = iter_jsonl_jobs(args.input, args.id_field, args.text_field, args.force_single_analysis)
+    else:
+        parser.error(f"Input not found: {args.input}")
+
+    completed, errors = run(
+        jobs, args.output, output_format, checkpoint_path,
+        workers=max(1, args.workers),
+        threads_per_worker=max(1, args.threads_per_worker),
+        progress_interval=args.progress_interval,
+    )
+    return 0 if errors == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
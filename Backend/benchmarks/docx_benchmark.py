@@ -0,0 +1,149 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+DOCX extraction benchmark: the streaming extractor (services/docx_extractor.py) against python-docx.
+
+What It Measures:
+    Throughput: MB of .docx per second and paragraphs per second, median over --runs runs.
+    Peak memory: how far the process's peak RSS rises above its RSS before extraction.
+        python-docx keeps its tree in lxml (C memory), which tracemalloc can't see, so we use RSS instead.
+        Each extractor runs in its own fresh process so one can't inflate the other's peak.
+    Output: paragraph count and characters for both, so a big difference in coverage is visible too
+        (python-docx only reads body paragraphs, the streaming extractor also reads tables, notes, headers...).
+
+Usage:
+    python benchmarks/docx_benchmark.py                      # generates a large test document
+    python benchmarks/docx_benchmark.py --paragraphs 50000   # bigger generated document
+    python benchmarks/docx_benchmark.py path/to/thesis.docx  # your own document
+
+Generating a document needs python-docx (pip install python-docx), as does the comparison itself.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Backend folder, so the child processes can import services/
+project_root = Path(__file__).parent.parent
+
+# Runs in a child process: time one extractor over the file and report peak memory growth.
+# argv: extractor name, path, runs
+PROBE = """
+import json, resource, sys, time
+
+def current_rss_kb():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+extractor, path, runs = sys.argv[1], sys.argv[2], int(sys.argv[3])
+if extractor == 'streaming':
+    from services.docx_extractor import docx_extractor
+    def paragraphs():
+        return docx_extractor.iter_paragraphs(path)
+else:
+    import docx
+    def paragraphs():
+        return (paragraph.text for paragraph in docx.Document(path).paragraphs)
+
+def extract():
+    # Count as we go instead of keeping the text, so we measure the extractor and not a list of results
+    count = characters = 0
+    for text in paragraphs():
+        count += 1
+        characters += len(text)
+    return count, characters
+
+baseline_kb = current_rss_kb()
+timings = []
+for _ in range(runs):
+    start = time.perf_counter()
+    count, characters = extract()
+    timings.append(time.perf_counter() - start)
+peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+print(json.dumps({
+    'timings': timings,
+    'peak_growth_mb': max(0, peak_kb - baseline_kb) / 1024,
+    'paragraphs': count,
+    'characters': characters
+}))
+"""
+
+
+def generate_document(path, paragraph_count):
+    # Build a large Word document with body text, tables, a header and a footer
+    import docx
+
+    document = docx.Document()
+    document.sections[0].header.paragraphs[0].text = 'Benchmark Thesis - Running Header'
+    document.sections[0].footer.paragraphs[0].text = 'Confidential draft'
+    sentence = ('The results of this study suggest that the proposed method improves accuracy '
+                'while keeping the computational cost within practical limits. ')
+    for index in range(paragraph_count):
+        document.add_paragraph(f"{index}. " + sentence * 3)
+        if index % 500 == 499:
+            # A table every 500 paragraphs, python-docx's doc.paragraphs never sees these
+            table = document.add_table(rows=5, cols=4)
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.text = 'Cell value with a few words'
+    document.save(path)
+
+
+def run_probe(extractor, path, runs):
+    # Measure one extractor in a fresh interpreter
+    env = dict(os.environ)
+    env['PYTHONPATH'] = str(project_root) + os.pathsep + env.get('PYTHONPATH', '')
+    completed = subprocess.run(
+        [sys.executable, '-c', PROBE, extractor, path, str(runs)],
+        env=env, capture_output=True, text=True, timeout=3600
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{extractor} extractor failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare the streaming DOCX extractor with python-docx.')
+    parser.add_argument('path', nargs='?', help='DOCX file to extract (default: generate one)')
+    parser.add_argument('--paragraphs', type=int, default=20000, help='Paragraphs in the generated document')
+    parser.add_argument('--runs', type=int, default=3, help='Extractions per extractor')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = args.path
+        if path is None:
+            path = os.path.join(workdir, 'benchmark.docx')
+            print(f"Generating a document with {args.paragraphs} paragraphs...")
+            generate_document(path, args.paragraphs)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+
+        results = {name: run_probe(name, path, max(1, args.runs)) for name in ('python-docx', 'streaming')}
+
+    print("=" * 60)
+    print(f"DOCX Extraction Benchmark ({size_mb:.2f}MB file, {args.runs} runs each)")
+    print("=" * 60)
+    print(f"{'Extractor':<12} {'Median':>9} {'MB/s':>8} {'Paras/s':>10} {'Peak +RSS':>10} {'Paras':>8} {'Chars':>10}")
+    for name, result in results.items():
+        median = statistics.median(result['timings'])
+        print(f"{name:<12} {median:>8.3f}s {size_mb / median:>8.2f} {result['paragraphs'] / median:>10.0f} "
+              f"{result['peak_growth_mb']:>8.1f}MB {result['paragraphs']:>8} {result['characters']:>10}")
+
+    old = statistics.median(results['python-docx']['timings'])
+    new = statistics.median(results['streaming']['timings'])
+    print(f"\nSpeedup: {old / new:.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+Synthetic analyses for the storage benchmarks and tests/test_storage.py.
+
+Why We Need It:
+    Every benchmark used to build its own sample analysis, and they drifted apart: one put its sentence rows under
+    result.sentence_results, where SQLiteManager never looks, so nothing it wrote reached analysis_details and it
+    measured a much smaller record than the API stores. One factory means they all measure the same shape.
+
+How It Works:
+    make_analysis(rng, sentences, timestamp) returns a record like the session_analysis detect_ai stores for a
+    sentence-level analysis: text preview, per-sentence results (sentence text, preview, offset, result) under
+    sentence_analysis, and the overall result. Pass a seeded random.Random for repeatable records.
+    Nothing here imports services/, so importing it never opens sessions.db.
+"""
+
+import datetime
+import uuid
+
+WORDS = ('model detection sentence text written human generated language student essay the of and a to in is '
+         'that for it with as was on be by this are analysis result probability').split()
+
+
+def make_sentence(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 25))).capitalize() + '.'
+
+
+def make_analysis(rng, sentences, timestamp=None):
+    # A record like the session_analysis detect_ai stores for a sentence-level analysis
+    sentence_results = []
+    offset = 0
+    for index in range(sentences):
+        sentence = make_sentence(rng)
+        probability = rng.random()
+        sentence_results.append({
+            'index': index,
+            'offset': offset,
+            'sentence': sentence,
+            'sentence_preview': sentence[:100] + ('...' if len(sentence) > 100 else ''),
+            'sentence_length': len(sentence),
+            'result': {
+                'ai_probability': probability,
+                'human_probability': 1 - probability,
+                'confidence': max(probability, 1 - probability),
+                'classification': 'AI-generated' if probability > 0.5 else 'Human-written'
+            }
+        })
+        offset += len(sentence) + 1
+    text = ' '.join(result['sentence'] for result in sentence_results)
+    ai_count = sum(1 for result in sentence_results if result['result']['ai_probability'] > 0.5)
+    return {
+        'id': str(uuid.uuid4()),
+        'text_preview': text[:500] + ('...' if len(text) > 500 else ''),
+        'timestamp': timestamp or datetime.datetime.now(),
+        'text_length': len(text),
+        'source_type': rng.choice(['text', 'file']),
+        'filename': rng.choice([None, 'essay.pdf', 'report.docx']),
+        'sentence_analysis': sentence_results,
+        'overall_result': {
+            'overall_ai_probability': round(rng.random(), 4),
+            'overall_human_probability': round(rng.random(), 4),
+            'overall_confidence': round(rng.random(), 4),
+            'overall_classification': 'Human-written',
+            'sentence_count': sentences,
+            'analyzed_sentences': sentences,
+            'ai_sentence_count': ai_count,
+            'human_sentence_count': sentences - ai_count,
+            'ai_percentage': round(ai_count / sentences * 100, 1) if sentences else 0,
+            'confidence_range': {'min': 0.5, 'max': 1.0, 'std_dev': 0.1}
+        },
+        'analysis_type': 'sentence_level'
+    }
@@ -0,0 +1,194 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+Serialization benchmark: the old recursive datetime conversion against services/serialization.py.
+
+What It Measures:
+    For a session with --analyses analyses (30 sentences each, like a few pages of text):
+    Write: what storing every analysis costs, in the layout each setup stores.
+    Read: what get_session costs once the rows are fetched (every whole analysis with its datetimes restored).
+    Setups:
+        old recursive: walk each record converting datetimes to strings, json.dumps the analysis (analysis_data)
+            and its summary (summary_data); json.loads, then walk each record calling datetime.fromisoformat on
+            every string (what SQLiteManager did before, schema version 3)
+        schema json: the current layout (schema version 4). The summary is encoded as analysis_data and the
+            sentence details are packed with pack_details (compressed, the analysis_details row). Reading decodes
+            both, joins them and parses only the known timestamp fields. The json module is used here
+        schema orjson: the same with orjson (if installed)
+        schema msgpack: the same with MessagePack (if msgpack is installed)
+    It also counts the strings the old read turned into datetimes that weren't timestamps (the sample
+    analyses include a filename and a sentence that look like dates), and the stored size of each layout.
+    Everything runs in memory, no database is touched.
+
+Usage:
+    python benchmarks/serialization_benchmark.py
+    python benchmarks/serialization_benchmark.py --analyses 1000 5000 --sentences 50 --runs 5
+"""
+
+import argparse
+import datetime
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+# Backend folder, so services/ can be imported
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks import sample_data
+from services.serialization import RecordSerializer, msgpack, orjson
+
+# Same as SQLiteManager.DETAIL_FIELDS (importing it would open sessions.db)
+DETAIL_FIELDS = ('sentence_analysis', 'skipped_segments')
+
+
+def make_analysis(rng, sentences):
+    # The shared sample analysis, with a couple of strings that look like dates
+    analysis = sample_data.make_analysis(rng, sentences)
+    analysis['sentence_analysis'][0]['sentence'] = '2021-03-04'
+    analysis['filename'] = '20240301.pdf' if rng.random() < 0.5 else '20240301'
+    return analysis
+
+
+def summarise(analysis):
+    return {key: value for key, value in analysis.items() if key not in DETAIL_FIELDS}
+
+
+def split(analysis):
+    # (summary, details), like SQLiteManager._split
+    return summarise(analysis), {key: analysis[key] for key in DETAIL_FIELDS if key in analysis}
+
+
+# The old SQLiteManager conversion, kept here for comparison
+def old_to_string(obj):
+    if isinstance(obj, dict):
+        return {k: old_to_string(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [old_to_string(item) for item in obj]
+    elif isinstance(obj, datetime.datetime):
+        return obj.isoformat()
+    return obj
+
+
+def old_to_datetime(obj):
+    if isinstance(obj, dict):
+        return {k: old_to_datetime(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [old_to_datetime(item) for item in obj]
+    elif isinstance(obj, str):
+        try:
+            return datetime.datetime.fromisoformat(obj)
+        except (ValueError, TypeError):
+            return obj
+    return obj
+
+
+class OldSerializer:
+    # Version 3 rows: (analysis_data with the whole analysis, summary_data)
+    def write(self, analysis):
+        serializable = old_to_string(analysis)
+        return json.dumps(serializable), json.dumps(summarise(serializable))
+
+    def read(self, stored):
+        return old_to_datetime(json.loads(stored[0]))
+
+
+class SchemaSerializer:
+    # Version 4 rows: (analysis_data with the summary, analysis_details blob)
+    def __init__(self, serializer):
+        self.serializer = serializer
+
+    def write(self, analysis):
+        summary, details = split(analysis)
+        return self.serializer.encode(summary), self.serializer.pack_details(details)
+
+    def read(self, stored):
+        # Like SQLiteManager._join followed by the datetime parsing get_session does
+        analysis = self.serializer.decode(stored[0])
+        analysis.update(self.serializer.unpack_details(stored[1]))
+        return self.serializer.analysis_datetimes(analysis)
+
+
+def setups():
+    found = {
+        'old recursive': OldSerializer(),
+        'schema json': SchemaSerializer(RecordSerializer('json', use_orjson=False))
+    }
+    if orjson is not None:
+        found['schema orjson'] = SchemaSerializer(RecordSerializer('json'))
+    if msgpack is not None:
+        found['schema msgpack'] = SchemaSerializer(RecordSerializer('msgpack'))
+    return found
+
+
+def best_time(function, runs):
+    # Fastest of several runs, the least disturbed by everything else on the machine
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def count_mangled(original, loaded):
+    # Values that came back as datetimes but were stored as something else
+    if isinstance(loaded, datetime.datetime):
+        return 0 if isinstance(original, datetime.datetime) else 1
+    if isinstance(loaded, dict):
+        return sum(count_mangled(original.get(key), value) for key, value in loaded.items())
+    if isinstance(loaded, list):
+        return sum(count_mangled(a, b) for a, b in zip(original, loaded))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare the old recursive datetime conversion with schema-aware serialization.')
+    parser.add_argument('--analyses', type=int, nargs='+', default=[1000, 5000], help='Analyses in the session')
+    parser.add_argument('--sentences', type=int, default=30, help='Sentences per analysis')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per measurement (the fastest is reported)')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    rows = []
+    for count in args.analyses:
+        analyses = [make_analysis(rng, args.sentences) for _ in range(count)]
+        for name, setup in setups().items():
+            write_time, blobs = best_time(lambda: [setup.write(analysis) for analysis in analyses], args.runs)
+            read_time, loaded = best_time(lambda: [setup.read(stored) for stored in blobs], args.runs)
+            rows.append({
+                'setup': name,
+                'analyses': count,
+                'write_ms': write_time * 1000,
+                'read_ms': read_time * 1000,
+                'size_mb': sum(len(first) + len(second) for first, second in blobs) / (1024 * 1024),
+                'mangled': sum(count_mangled(a, b) for a, b in zip(analyses, loaded))
+            })
+
+    print("=" * 80)
+    print(f"Serialization Benchmark ({args.sentences} sentences per analysis, best of {args.runs} runs)")
+    print("Write: each setup's stored layout (old: analysis + summary, schema: summary + compressed details)")
+    print("Read: whole analyses with their datetimes, like get_session")
+    print("=" * 80)
+    print(f"{'Setup':<16} {'Analyses':>8} {'Write':>11} {'Read':>11} {'Size':>9} {'Mangled strings':>16}")
+    for row in rows:
+        print(f"{row['setup']:<16} {row['analyses']:>8} {row['write_ms']:>9.1f}ms {row['read_ms']:>9.1f}ms "
+              f"{row['size_mb']:>7.1f}MB {row['mangled']:>16}")
+
+    print()
+    for count in args.analyses:
+        old = next(row for row in rows if row['setup'] == 'old recursive' and row['analyses'] == count)
+        for row in rows:
+            if row['analyses'] == count and row is not old:
+                print(f"{count} analyses, {row['setup']}: write {old['write_ms'] / row['write_ms']:.1f}x, "
+                      f"read {old['read_ms'] / row['read_ms']:.1f}x faster")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
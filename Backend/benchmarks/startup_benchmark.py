@@ -0,0 +1,129 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+Startup benchmark: how long a cold `import run` takes and how much memory the process holds afterwards.
+
+Why We Need It:
+    torch, transformers, PyPDF2 and python-docx are only imported on the code paths that need them.
+    That's easy to break by accident (one top-level import in a new service is enough), so this script
+    measures it and fails if startup goes over budget or a heavy library is loaded at import time.
+
+How It Works:
+    Each run starts a fresh Python process (so nothing is already imported or cached in memory)
+    in an empty temporary directory (so the benchmark's sessions.db never touches the real one).
+    That process times `import run` and reports its RSS and which heavy modules ended up loaded.
+    We report the median over --runs runs.
+
+Usage:
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --runs 10 --max-import-seconds 1.5 --max-rss-mb 120
+Exits with status 1 if a target is missed.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Backend folder, where run.py lives
+project_root = Path(__file__).parent.parent
+
+# Libraries (and format extractors from the registry) that must not be imported just by starting the server
+HEAVY_MODULES = ['torch', 'transformers', 'PyPDF2', 'docx', 'services.docx_extractor', 'services.document_extractors']
+
+# Runs in the child process. Prints one JSON line with the measurements
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import run
+elapsed = time.perf_counter() - start
+
+rss_kb = None
+try:
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                rss_kb = int(line.split()[1])
+except OSError:
+    import resource
+    # ru_maxrss is KB on Linux, bytes on macOS
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss_kb //= 1024
+
+print(json.dumps({
+    'import_seconds': elapsed,
+    'rss_mb': rss_kb / 1024 if rss_kb else None,
+    'heavy_modules': [name for name in %r if name in sys.modules]
+}))
+""" % (HEAVY_MODULES,)
+
+
+def measure_once():
+    # Start a fresh interpreter and measure one cold import of run.py
+    env = dict(os.environ)
+    env['PYTHONPATH'] = str(project_root) + os.pathsep + env.get('PYTHONPATH', '')
+    # Let the warm-up run write .pyc files so the measured runs see a normal deployed install
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        completed = subprocess.run(
+            [sys.executable, '-c', PROBE],
+            cwd=workdir, env=env, capture_output=True, text=True, timeout=300
+        )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import run failed:\n{completed.stderr}")
+
+    # The app prints while it starts up, the measurements are the last line
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure cold import time and baseline memory of run.py.')
+    parser.add_argument('--runs', type=int, default=5, help='Number of cold starts to measure')
+    parser.add_argument('--max-import-seconds', type=float, default=1.0, help='Target for the median import time')
+    parser.add_argument('--max-rss-mb', type=float, default=150.0, help='Target for the median resident memory')
+    args = parser.parse_args(argv)
+
+    # One warm-up run so .pyc files exist, like on a deployed server
+    measure_once()
+
+    runs = [measure_once() for _ in range(max(1, args.runs))]
+    import_seconds = statistics.median(run['import_seconds'] for run in runs)
+    rss_values = [run['rss_mb'] for run in runs if run['rss_mb'] is not None]
+    rss_mb = statistics.median(rss_values) if rss_values else None
+    heavy = sorted({name for run in runs for name in run['heavy_modules']})
+
+    print("=" * 50)
+    print("Startup Benchmark (import run)")
+    print("=" * 50)
+    print(f"Runs: {len(runs)}")
+    print(f"Import time (median): {import_seconds:.3f}s (target {args.max_import_seconds:.3f}s)")
+    print(f"Import time (min/max): {min(r['import_seconds'] for r in runs):.3f}s / {max(r['import_seconds'] for r in runs):.3f}s")
+    if rss_mb is not None:
+        print(f"RSS after import (median): {rss_mb:.1f}MB (target {args.max_rss_mb:.1f}MB)")
+    print(f"Heavy modules loaded at import: {', '.join(heavy) if heavy else 'none'}")
+
+    failures = []
+    if import_seconds > args.max_import_seconds:
+        failures.append('import time over target')
+    if rss_mb is not None and rss_mb > args.max_rss_mb:
+        failures.append('memory over target')
+    if heavy:
+        failures.append('heavy modules imported at startup')
+
+    if failures:
+        print(f"FAIL: {', '.join(failures)}")
+        return 1
+    print("pass: startup within targets")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+Session storage benchmark: SQLiteManager on pooled WAL connections (services/sqlite_pool.py)
+against the old setup (a new connection per call, default rollback journal),
+and pooled WAL with the write-behind queue on (services/write_behind.py).
+
+What It Measures:
+    Each simulated request does what /api/detect does to the database: read the session, add an analysis,
+    read the session again. Requests run on 1, 4 and 16 threads at once (--threads), like concurrent users.
+    For each setup and thread count: requests per second, median and p95 request latency,
+    and how often SQLite reported the database as busy (retries, and requests that failed anyway).
+    With write-behind the run isn't over until the queue has drained, so requests per second includes
+    the time to commit everything, and the Commits column shows how many commits that took.
+    Both setups run against a fresh copy of the same pre-filled database in a temporary folder,
+    so sessions.db is never touched.
+
+Usage:
+    python benchmarks/storage_benchmark.py
+    python benchmarks/storage_benchmark.py --threads 1 8 32 --requests 200 --sessions 500
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+# Backend folder, so services/ can be imported
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.sample_data import make_analysis
+
+# Sentences per stored analysis, like a few pages of text
+SENTENCES = 30
+
+SETUPS = {
+    # name: (pool_size, wal, write_behind)
+    'connect-per-call': (0, False, False),
+    'pooled WAL': (None, True, False),
+    'WAL + write-behind': (None, True, True)
+}
+
+
+def fill_database(manager, sessions, history, rng):
+    # Sessions with some history already, so reads do real work
+    session_ids = [str(uuid.uuid4()) for _ in range(sessions)]
+    for session_id in session_ids:
+        manager.store_session(session_id, {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'analyses': [make_analysis(rng, SENTENCES) for _ in range(history)]
+        })
+    return session_ids
+
+
+def run_requests(manager, session_ids, threads, requests_per_thread):
+    # Run the request mix on several threads at once. Returns (latencies, failed requests, elapsed seconds)
+    latencies = []
+    failures = [0]
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(threads)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        mine = []
+        failed = 0
+        start_barrier.wait()
+        for _ in range(requests_per_thread):
+            session_id = rng.choice(session_ids)
+            start = time.perf_counter()
+            ok = manager.get_session(session_id) is not None
+            ok = manager.update_session_analyses(session_id, make_analysis(rng, SENTENCES)) and ok
+            ok = manager.get_session(session_id) is not None and ok
+            mine.append(time.perf_counter() - start)
+            if not ok:
+                failed += 1
+        with lock:
+            latencies.extend(mine)
+            failures[0] += failed
+
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    if not manager.flush_writes(timeout=60):
+        failures[0] += 1
+    return latencies, failures[0], time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare pooled WAL SQLite connections with connect-per-call.')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16], help='Concurrent request threads')
+    parser.add_argument('--requests', type=int, default=100, help='Requests per thread')
+    parser.add_argument('--sessions', type=int, default=200, help='Sessions in the database')
+    parser.add_argument('--history', type=int, default=5, help='Analyses already stored per session')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # The module's global manager opens sessions.db in the current folder, keep it in here
+        os.chdir(workdir)
+        quiet = io.StringIO()
+        with contextlib.redirect_stdout(quiet):
+            from services.sqlite_manager import SQLiteManager
+            from services.sqlite_pool import SQLitePool
+
+            template = os.path.join(workdir, 'template.db')
+            manager = SQLiteManager(template, pool=SQLitePool(template, pool_size=0, wal=False))
+            session_ids = fill_database(manager, args.sessions, args.history, random.Random(0))
+
+        rows = []
+        for setup, (pool_size, wal, write_behind) in SETUPS.items():
+            for threads in args.threads:
+                db_path = os.path.join(workdir, f'run-{len(rows)}.db')
+                shutil.copyfile(template, db_path)
+                pool = SQLitePool(db_path, pool_size=pool_size, wal=wal)
+                with contextlib.redirect_stdout(quiet):
+                    manager = SQLiteManager(db_path, pool=pool, write_behind=write_behind)
+                    latencies, failures, elapsed = run_requests(manager, session_ids, threads, args.requests)
+                pool.close_all()
+                quiet.seek(0)
+                quiet.truncate()
+
+                stats = pool.get_stats()
+                write_stats = manager.get_write_behind_stats()
+                latencies.sort()
+                rows.append({
+                    'setup': setup,
+                    'threads': threads,
+                    'throughput': len(latencies) / elapsed,
+                    'p50_ms': statistics.median(latencies) * 1000,
+                    'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+                    'connections': stats['connections_opened'],
+                    'busy_retries': stats['busy_retries'],
+                    'batches': write_stats['batches'] if write_stats else len(latencies),
+                    'failures': failures
+                })
+
+    print("=" * 88)
+    print(f"Session Storage Benchmark ({args.requests} requests per thread, "
+          f"{args.sessions} sessions x {args.history} analyses)")
+    print("Request: get_session + update_session_analyses + get_session")
+    print("=" * 88)
+    print(f"{'Setup':<20} {'Threads':>7} {'Req/s':>9} {'p50':>9} {'p95':>9} {'Conns':>6} {'Commits':>8} "
+          f"{'Retries':>8} {'Failed':>7}")
+    for row in rows:
+        print(f"{row['setup']:<20} {row['threads']:>7} {row['throughput']:>9.1f} {row['p50_ms']:>7.2f}ms "
+              f"{row['p95_ms']:>7.2f}ms {row['connections']:>6} {row['batches']:>8} {row['busy_retries']:>8} "
+              f"{row['failures']:>7}")
+
+    print()
+    baseline = next(iter(SETUPS))
+    for threads in args.threads:
+        old = next(row for row in rows if row['setup'] == baseline and row['threads'] == threads)
+        for setup in list(SETUPS)[1:]:
+            new = next(row for row in rows if row['setup'] == setup and row['threads'] == threads)
+            print(f"{threads:>2} threads, {setup}: {new['throughput'] / old['throughput']:.1f}x throughput, "
+                  f"p95 {old['p95_ms']:.2f}ms -> {new['p95_ms']:.2f}ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,292 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+Storage load benchmark: SQLiteManager with many sessions and long histories, under a mixed request load.
+
+What It Measures:
+    Fill: --sessions sessions of synthetic analyses shaped like the session_analysis records detect_ai stores
+        (text preview, per-sentence results with sentence text and preview, overall result). Most sessions have a
+        short history (1 to --history analyses), --long-sessions of them have --long-history analyses each.
+        Reports how fast the database fills and how big it gets.
+    Load: --threads threads run --operations operations each, picked from this mix (like the API's requests):
+        session_info 30%   ensure_session's lookup (every request)
+        history      25%   one page of /api/history (a long session one time in five)
+        add          25%   update_session_analyses (/api/detect)
+        analysis     10%   get_analysis by ID (/api/analysis/<id>)
+        get_session   5%   the whole session with every analysis (debug endpoint)
+        store         3%   store_session of a new session
+        clear         2%   clear_session_analyses of a short session
+    For each operation: count, p50/p95/p99/max latency and failures. Overall: operations per second,
+    database size before and after (pages in use and the files on disk), session cache hit rate, busy retries.
+    --json writes the same numbers to a file, so runs with different storage settings can be compared.
+
+Everything runs in a temporary folder unless --db names a file (which is reused if it already has sessions,
+so a big fill only has to happen once), so sessions.db is never touched.
+
+Usage:
+    python benchmarks/storage_load_benchmark.py
+    python benchmarks/storage_load_benchmark.py --sessions 100000 --long-sessions 50 --long-history 5000 --db big.db
+    python benchmarks/storage_load_benchmark.py --threads 16 --format msgpack --no-cache --json results.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+# Backend folder, so services/ can be imported
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.sample_data import make_analysis
+
+OPERATION_MIX = [
+    ('session_info', 30), ('history', 25), ('add', 25), ('analysis', 10), ('get_session', 5), ('store', 3), ('clear', 2)
+]
+
+def fill_database(manager, args, rng):
+    # Returns (short session IDs, long session IDs, some stored analysis IDs per session)
+    short_ids = [str(uuid.uuid4()) for _ in range(args.sessions - args.long_sessions)]
+    long_ids = [str(uuid.uuid4()) for _ in range(args.long_sessions)]
+    analysis_ids = {}
+    start = datetime.datetime.now() - datetime.timedelta(days=1)
+    batch = []
+
+    def plan():
+        for session_id in short_ids:
+            yield session_id, rng.randint(1, args.history)
+        for session_id in long_ids:
+            yield session_id, args.long_history
+
+    for session_id, count in plan():
+        for position in range(count):
+            analysis = make_analysis(rng, args.sentences, start + datetime.timedelta(seconds=position))
+            batch.append((session_id, analysis))
+            # A few IDs per session are enough for get_analysis
+            if position < 3:
+                analysis_ids.setdefault(session_id, []).append(analysis['id'])
+            if len(batch) >= 500:
+                manager.add_analyses(batch)
+                batch = []
+    if batch:
+        manager.add_analyses(batch)
+    return short_ids, long_ids, analysis_ids
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run_load(manager, args, short_ids, long_ids, analysis_ids):
+    # Run the operation mix on several threads. Returns ({operation: [latencies]}, {operation: failures}, seconds)
+    names = [name for name, _ in OPERATION_MIX]
+    weights = [weight for _, weight in OPERATION_MIX]
+    latencies = {name: [] for name in names}
+    failures = {name: 0 for name in names}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(args.threads)
+
+    def pick_session(rng, long_share=0.2):
+        if long_ids and rng.random() < long_share:
+            return rng.choice(long_ids)
+        return rng.choice(short_ids)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        mine = {name: [] for name in names}
+        failed = {name: 0 for name in names}
+        # Built before timing starts, building them isn't what we're measuring
+        new_analyses = [make_analysis(rng, args.sentences) for _ in range(args.operations // 4 + 1)]
+        start_barrier.wait()
+        for _ in range(args.operations):
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            if name == 'session_info':
+                ok = manager.get_session_info(pick_session(rng), touch=True) is not None
+            elif name == 'history':
+                session_id = pick_session(rng)
+                page = manager.get_history_page(session_id, 20)
+                # Every other time, the second page as well
+                if page['next_cursor'] and rng.random() < 0.5:
+                    page = manager.get_history_page(session_id, 20, page['next_cursor'])
+                ok = page is not None
+            elif name == 'add':
+                analysis = new_analyses.pop() if new_analyses else make_analysis(rng, args.sentences)
+                ok = manager.update_session_analyses(pick_session(rng, 0.05), analysis)
+            elif name == 'analysis':
+                session_id = pick_session(rng)
+                ids = analysis_ids.get(session_id)
+                ok = not ids or manager.get_analysis(session_id, rng.choice(ids)) is not None
+            elif name == 'get_session':
+                ok = manager.get_session(pick_session(rng, 0.05)) is not None
+            elif name == 'store':
+                ok = manager.store_session(str(uuid.uuid4()), {'created_at': datetime.datetime.now()})
+            else:
+                ok = manager.clear_session_analyses(rng.choice(short_ids))
+            mine[name].append(time.perf_counter() - start)
+            if not ok:
+                failed[name] += 1
+        with lock:
+            for name in names:
+                latencies[name].extend(mine[name])
+                failures[name] += failed[name]
+
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(args.threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    manager.flush_writes(timeout=60)
+    return latencies, failures, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test SQLiteManager with many sessions and long histories.')
+    parser.add_argument('--sessions', type=int, default=10000, help='Sessions in the database')
+    parser.add_argument('--history', type=int, default=5, help='Most analyses in a short session')
+    parser.add_argument('--long-sessions', type=int, default=10, help='Sessions with a long history')
+    parser.add_argument('--long-history', type=int, default=2000, help='Analyses in each long session')
+    parser.add_argument('--sentences', type=int, default=20, help='Sentences per analysis')
+    parser.add_argument('--threads', type=int, default=8, help='Concurrent threads')
+    parser.add_argument('--operations', type=int, default=500, help='Operations per thread')
+    parser.add_argument('--format', choices=['json', 'msgpack'], default=None, help='Storage format (SQLITE_STORAGE_FORMAT)')
+    parser.add_argument('--write-behind', action='store_true', help='Queue analyses and commit them in batches')
+    parser.add_argument('--no-cache', action='store_true', help='Turn the session cache off')
+    parser.add_argument('--db', help='Database file to use (reused if it already has sessions)')
+    parser.add_argument('--json', dest='json_path', help='Also write the results to this JSON file')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    args.long_sessions = min(args.long_sessions, args.sessions - 1)
+
+    db_path = os.path.abspath(args.db) if args.db else None
+    json_path = os.path.abspath(args.json_path) if args.json_path else None
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # The module's global manager opens sessions.db in the current folder, keep it in here
+        os.chdir(workdir)
+        quiet = io.StringIO()
+        with contextlib.redirect_stdout(quiet):
+            from services.serialization import RecordSerializer
+            from services.session_cache import SessionCache
+            from services.sqlite_manager import SQLiteManager
+
+            db_path = db_path or os.path.join(workdir, 'load.db')
+            manager = SQLiteManager(
+                db_path,
+                write_behind=args.write_behind,
+                serializer=RecordSerializer(args.format) if args.format else None,
+                session_cache=SessionCache(0) if args.no_cache else None
+            )
+            pool = manager._pool
+
+            existing = pool.run(lambda conn: conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0])
+
+        if existing:
+            print(f"Reusing {db_path} ({existing} sessions)")
+            with contextlib.redirect_stdout(quiet):
+                short_ids, long_ids, analysis_ids = load_existing(pool, args.long_history)
+            fill_seconds = None
+        else:
+            print(f"Filling {args.sessions} sessions ({args.long_sessions} with {args.long_history} analyses)...")
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(quiet):
+                short_ids, long_ids, analysis_ids = fill_database(manager, args, rng)
+            fill_seconds = time.perf_counter() - start
+        analyses_before = pool.run(lambda conn: conn.execute('SELECT COUNT(*) FROM analyses').fetchone()[0])
+        size_before = manager.get_storage_stats()
+
+        with contextlib.redirect_stdout(quiet):
+            latencies, failures, elapsed = run_load(manager, args, short_ids, long_ids, analysis_ids)
+        quiet.seek(0)
+        quiet.truncate()
+        size_after = manager.get_storage_stats()
+        pool_stats = manager.get_pool_stats()
+        cache_stats = manager.get_session_cache_stats()
+        pool.close_all()
+
+    total_operations = sum(len(values) for values in latencies.values())
+    results = {
+        'settings': vars(args),
+        'sessions': len(short_ids) + len(long_ids),
+        'analyses': analyses_before,
+        'fill_seconds': fill_seconds,
+        'fill_analyses_per_second': analyses_before / fill_seconds if fill_seconds else None,
+        'operations_per_second': total_operations / elapsed,
+        'operations': {},
+        'size_before': size_before,
+        'size_after': size_after,
+        'session_cache_hit_rate': cache_stats['hit_rate'],
+        'busy_retries': pool_stats['busy_retries'],
+        'busy_failures': pool_stats['busy_failures']
+    }
+    for name, values in latencies.items():
+        values.sort()
+        results['operations'][name] = {
+            'count': len(values),
+            'p50_ms': percentile(values, 0.50) * 1000,
+            'p95_ms': percentile(values, 0.95) * 1000,
+            'p99_ms': percentile(values, 0.99) * 1000,
+            'max_ms': (values[-1] if values else 0) * 1000,
+            'failures': failures[name]
+        }
+
+    print("=" * 84)
+    print(f"Storage Load Benchmark: {results['sessions']} sessions, {analyses_before} analyses, "
+          f"{args.threads} threads x {args.operations} operations")
+    print(f"Format: {args.format or 'default'}, write-behind: {'on' if args.write_behind else 'off'}, "
+          f"session cache: {'off' if args.no_cache else 'on'}")
+    print("=" * 84)
+    if fill_seconds:
+        print(f"Fill: {fill_seconds:.1f}s ({results['fill_analyses_per_second']:.0f} analyses/s)")
+    print(f"Database: {size_before['size_bytes'] / 1048576:.1f}MB in use before, "
+          f"{size_after['size_bytes'] / 1048576:.1f}MB after, {size_after['file_bytes'] / 1048576:.1f}MB on disk "
+          f"(with the WAL)")
+    print()
+    print(f"{'Operation':<14} {'Count':>7} {'p50':>10} {'p95':>10} {'p99':>10} {'Max':>10} {'Failed':>7}")
+    for name, row in results['operations'].items():
+        print(f"{name:<14} {row['count']:>7} {row['p50_ms']:>8.2f}ms {row['p95_ms']:>8.2f}ms {row['p99_ms']:>8.2f}ms "
+              f"{row['max_ms']:>8.1f}ms {row['failures']:>7}")
+    print()
+    print(f"Throughput: {results['operations_per_second']:.0f} operations/s")
+    print(f"Session cache hit rate: {results['session_cache_hit_rate']}, busy retries: {results['busy_retries']}, "
+          f"busy failures: {results['busy_failures']}")
+
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2, default=str)
+        print(f"Results written to {json_path}")
+    return 0
+
+
+def load_existing(pool, long_history):
+    # Session and analysis IDs from a database filled by an earlier run
+    def read(conn):
+        counts = conn.execute('SELECT session_id, COUNT(*) FROM analyses GROUP BY session_id').fetchall()
+        short_ids = [session_id for session_id, count in counts if count < long_history]
+        long_ids = [session_id for session_id, count in counts if count >= long_history]
+        analysis_ids = {}
+        for session_id, analysis_id in conn.execute(
+            'SELECT session_id, analysis_id FROM analyses WHERE seq IN (SELECT MIN(seq) FROM analyses GROUP BY session_id)'
+        ):
+            analysis_ids[session_id] = [analysis_id]
+        return short_ids, long_ids, analysis_ids
+    return pool.run(read)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+Converts an older sessions.db to the current schema (see services/sqlite_manager.py):
+    version 1 (every session's history as one JSON list in sessions.session_data) to one row per analysis in the analyses table,
+    versions 2 and 3 (sentence details inside each analysis row) by moving the details to the analysis_details table, compressed.
+
+Why a Separate Tool:
+    The server migrates automatically when it starts, but on a big database that's a pause before the first request.
+    Running this first (e.g. during a deploy) gets it out of the way, takes a backup, and checks the result.
+
+How It Works:
+    1. Counts the sessions and analyses still in the old layout (--dry-run stops here).
+    2. Copies the database to <db>.v<version>-backup with SQLite's online backup API.
+    3. Moves every history list into the analyses table and every analysis's sentence details into
+       analysis_details, in one transaction.
+    4. Checks that every analysis made it across.
+The space the details used to take is free afterwards but stays in the file until it's vacuumed
+(the maintenance task does that on databases with incremental auto-vacuum, or use --compact).
+Running it again on a migrated database does nothing.
+
+--compact also rebuilds the file with auto_vacuum=INCREMENTAL (VACUUM), which databases created before
+session maintenance don't have. Without it deleted rows are reused but the file never shrinks.
+VACUUM needs the database to itself, so stop the server first.
+
+Usage:
+    python migrate_sessions.py                    # ./sessions.db
+    python migrate_sessions.py path/to/sessions.db --dry-run
+    python migrate_sessions.py sessions.db --no-backup
+    python migrate_sessions.py sessions.db --compact
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import sys
+
+# Only the database named on the command line should be migrated, not the default one the module opens on import
+os.environ['SQLITE_AUTO_MIGRATE'] = '0'
+
+from services.sqlite_manager import SQLiteManager
+
+
+def count_legacy_analyses(db_path):
+    # (schema version, sessions with a history list in session_data, analyses in those lists)
+    conn = sqlite3.connect(db_path)
+    try:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        sessions = analyses = 0
+        if 'sessions' in tables:
+            for (session_data_json,) in conn.execute('SELECT session_data FROM sessions'):
+                try:
+                    session_data = json.loads(session_data_json)
+                except ValueError:
+                    continue
+                if isinstance(session_data, dict) and 'analyses' in session_data:
+                    sessions += 1
+                    analyses += len(session_data['analyses'] or [])
+        return version, sessions, analyses
+    finally:
+        conn.close()
+
+
+def backup_database(db_path, version):
+    # Consistent copy of the database, even if the server has it open
+    backup_path = f"{db_path}.v{version}-backup"
+    if os.path.exists(backup_path):
+        backup_path += datetime.datetime.now().strftime('-%Y%m%d%H%M%S')
+    source = sqlite3.connect(db_path)
+    target = sqlite3.connect(backup_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    return backup_path
+
+
+def compact_database(db_path):
+    # Switch the file to incremental auto-vacuum and rebuild it without its free pages
+    before = os.path.getsize(db_path)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('VACUUM')
+        # In WAL mode the rebuilt pages are in the -wal file until they're checkpointed
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        mode = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+    finally:
+        conn.close()
+    print(f"Compacted: {before / 1024:.0f}KB -> {os.path.getsize(db_path) / 1024:.0f}KB")
+    if mode != 2:
+        print("FAIL: auto_vacuum is still not incremental")
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Migrate sessions.db to the current schema.')
+    parser.add_argument('db_path', nargs='?', default='sessions.db', help='Database file (default: sessions.db)')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would be migrated')
+    parser.add_argument('--no-backup', action='store_true', help="Don't copy the database before migrating")
+    parser.add_argument('--compact', action='store_true',
+                        help='Also rebuild the file with incremental auto-vacuum (stop the server first)')
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.db_path):
+        parser.error(f"Database not found: {args.db_path}")
+
+    version, legacy_sessions, legacy_analyses = count_legacy_analyses(args.db_path)
+    print(f"Database: {args.db_path} (schema version {version}, current is {SQLiteManager.SCHEMA_VERSION})")
+    print(f"Old layout: {legacy_analyses} analyses in {legacy_sessions} sessions")
+
+    if version >= SQLiteManager.SCHEMA_VERSION and not legacy_sessions:
+        print("Nothing to migrate")
+        return compact_database(args.db_path) if args.compact else 0
+    if args.dry_run:
+        print("Dry run, nothing changed")
+        return 0
+
+    if not args.no_backup:
+        print(f"Backup: {backup_database(args.db_path, version)}")
+
+    manager = SQLiteManager(args.db_path, auto_migrate=False)
+    stats = manager.migrate()
+    print(f"Migrated {stats['analyses']} analyses from {stats['sessions']} sessions"
+          f" ({stats['duplicates']} duplicate IDs skipped), compressed the sentence details of {stats['details']} analyses")
+
+    # Every analysis is either in the table now or was a duplicate of one that is
+    if stats['analyses'] + stats['duplicates'] != legacy_analyses:
+        print(f"FAIL: expected {legacy_analyses} analyses, migrated {stats['analyses'] + stats['duplicates']}")
+        return 1
+    remaining = count_legacy_analyses(args.db_path)[1]
+    if remaining:
+        print(f"FAIL: {remaining} sessions still in the old layout")
+        return 1
+    conn = sqlite3.connect(args.db_path)
+    try:
+        # A version 3 summary is only cleared once its row's details have been moved
+        unmoved = conn.execute('SELECT COUNT(*) FROM analyses WHERE summary_data IS NOT NULL').fetchone()[0]
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+    finally:
+        conn.close()
+    if unmoved or version != SQLiteManager.SCHEMA_VERSION:
+        print(f"FAIL: schema version {version}, {unmoved} analyses still have their details inline")
+        return 1
+    print("pass: migration complete")
+    return compact_database(args.db_path) if args.compact else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
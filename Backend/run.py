@@ -7,6 +7,8 @@ This is the main entry point for our Flask application
 It starts the web server and checks dependencies before running
 """
 
+import os
+
 # Import the Flask app from our api package
 from api.app import app
 
@@ -24,6 +26,12 @@ if __name__ == '__main__':
         # But the AI detection will still work for individual requests
     else:
         print("SQLite database connected successfully")
+
+    # The AI model is loaded on the first analysis request by default, so startup stays fast.
+    # PRELOAD_MODEL=1 loads it now instead, so the first user doesn't wait for it
+    if os.environ.get('PRELOAD_MODEL') == '1':
+        from api.app import text_analyser
+        text_analyser.load_model()
     
     # Start the Flask development server
     app.run(debug=False, host='0.0.0.0', port=5000)  # Set debug=False for production
@@ -0,0 +1,191 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+This file caches extracted text and finished analyses of uploaded files, keyed by the file's contents.
+
+Why We Need It:
+    The same PDF is often uploaded many times (the same assignment brief, a user retrying, a marker re-checking).
+    Every upload used to repeat text extraction and the full model analysis, which is by far our most expensive step.
+    With the cache a repeat upload is answered straight from SQLite in milliseconds.
+
+How It Works:
+    Cache Key: SHA-256 of the uploaded bytes + the model version + the options that change the result
+        (force_single_analysis), so a retrained model or a different mode never reuses an old answer.
+    Storage: an analysis_cache table in the same SQLite database as the sessions.
+        Each entry holds the extracted text, the analysis as JSON, its size and when it was last used.
+    Eviction: when the total size of all entries passes MAX_CACHE_BYTES, the least recently used entries are
+        deleted until we're back under EVICTION_TARGET of the limit (so we don't evict on every single insert).
+    Connections: the shared pool from services/sqlite_pool.py, the same one SQLiteManager uses for this file.
+        An insert and the eviction it triggers run as one transaction.
+
+What Isn't Cached:
+    Partial results (time budget ran out) and sampled results are estimates, so they're never stored.
+    Direct text input isn't cached either, it's cheap to resubmit and rarely repeated exactly.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from services.sqlite_manager import sqlite_manager
+from services.sqlite_pool import get_pool
+
+
+class AnalysisCache:
+    # Content-addressed cache of (extracted text, analysis) pairs for uploaded files
+
+    # Total size of cached entries before the least recently used ones are evicted
+    MAX_CACHE_BYTES = int(os.environ.get('ANALYSIS_CACHE_MAX_MB', '256')) * 1024 * 1024
+
+    # Eviction frees space down to this fraction of MAX_CACHE_BYTES
+    EVICTION_TARGET = 0.9
+
+    # Bump when the stored analysis format changes, old entries then simply stop matching
+    CACHE_FORMAT_VERSION = 1
+
+    def __init__(self, db_path='sessions.db', max_bytes=None):
+        self.db_path = db_path
+        self.max_bytes = self.MAX_CACHE_BYTES if max_bytes is None else max_bytes
+        self.enabled = os.environ.get('ANALYSIS_CACHE', '1') != '0' and self.max_bytes > 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._pool = get_pool(db_path)
+        self._init_db()
+
+    def _init_db(self):
+        # Create the cache table. last_access is indexed since eviction scans it oldest first
+        def create(conn):
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS analysis_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    extracted_text TEXT NOT NULL,
+                    analysis_data TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_access ON analysis_cache (last_access)')
+        try:
+            self._pool.run(create, write=True)
+        except Exception as e:
+            print(f"Error initializing analysis cache: {e}")
+            self.enabled = False
+
+    def make_key(self, content_digest, model_version, force_single_analysis=False):
+        # Combine everything that determines the analysis into one key
+        options = f"v{self.CACHE_FORMAT_VERSION}|{model_version}|single={int(bool(force_single_analysis))}"
+        return hashlib.sha256(f"{content_digest}|{options}".encode('utf-8')).hexdigest()
+
+    def get(self, cache_key):
+        # Return (extracted_text, analysis) for a key, or None on a miss
+        if not self.enabled:
+            return None
+        try:
+            row = self._pool.run(lambda conn: conn.execute(
+                'SELECT extracted_text, analysis_data FROM analysis_cache WHERE cache_key = ?',
+                (cache_key,)
+            ).fetchone())
+            if row:
+                self._pool.run(lambda conn: conn.execute(
+                    'UPDATE analysis_cache SET last_access = ? WHERE cache_key = ?', (time.time(), cache_key)
+                ), write=True)
+        except Exception as e:
+            print(f"Error reading analysis cache: {e}")
+            return None
+
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not row:
+            return None
+        return row[0], json.loads(row[1])
+
+    def put(self, cache_key, extracted_text, analysis):
+        # Store a finished analysis. Returns True if it was cached
+        if not self.enabled or self.is_estimate(analysis):
+            return False
+        try:
+            analysis_data = json.dumps(analysis, separators=(',', ':'))
+            size = len(extracted_text.encode('utf-8')) + len(analysis_data.encode('utf-8'))
+            if size > self.max_bytes:
+                # Would evict everything else and still not fit
+                return False
+
+            now = time.time()
+
+            def insert(conn):
+                conn.execute('''
+                    INSERT OR REPLACE INTO analysis_cache
+                        (cache_key, extracted_text, analysis_data, size, created_at, last_access)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (cache_key, extracted_text, analysis_data, size, now, now))
+                return self._evict(conn)
+            evicted = self._pool.run(insert, write=True)
+            with self._lock:
+                self.evictions += evicted
+            return True
+        except Exception as e:
+            print(f"Error writing analysis cache: {e}")
+            return False
+
+    def is_estimate(self, analysis):
+        # Partial (time budget) and sampled results shouldn't be served as the answer for a document
+        result = analysis.get('result', {})
+        return bool(result.get('partial') or result.get('sampled'))
+
+    def _evict(self, conn):
+        # Delete least recently used entries until the cache is back under its size target. Returns how many
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM analysis_cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+
+        target = self.max_bytes * self.EVICTION_TARGET
+        doomed = []
+        for cache_key, size in conn.execute('SELECT cache_key, size FROM analysis_cache ORDER BY last_access'):
+            if total <= target:
+                break
+            doomed.append((cache_key,))
+            total -= size
+
+        conn.executemany('DELETE FROM analysis_cache WHERE cache_key = ?', doomed)
+        return len(doomed)
+
+    def clear(self):
+        # Drop every cached entry (e.g. after changing the prose filter)
+        try:
+            self._pool.run(lambda conn: conn.execute('DELETE FROM analysis_cache'), write=True)
+        except Exception as e:
+            print(f"Error clearing analysis cache: {e}")
+
+    def get_stats(self):
+        # Counters and size for the health endpoint
+        entries, total = 0, 0
+        try:
+            entries, total = self._pool.run(
+                lambda conn: conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analysis_cache').fetchone()
+            )
+        except Exception as e:
+            print(f"Error reading analysis cache stats: {e}")
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'entries': entries,
+                'size_bytes': total,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+# Create a global instance that other files can use (same database file as the sessions)
+analysis_cache = AnalysisCache(sqlite_manager.db_path)
@@ -0,0 +1,189 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+This file analyses every document in an uploaded ZIP archive, several at a time.
+
+Why We Need It:
+    Markers with a folder of submissions had to upload them one by one through /api/detect.
+    Now the whole folder can be zipped and uploaded once.
+
+How It Works:
+    FileProcessor.open_archive picks the supported members (and enforces the zip bomb limits).
+    Each member is decompressed in memory, extracted with the same per-type extractors as a single upload
+    and analysed by the same TextAnalyser, on a thread pool of at most MAX_WORKERS threads.
+    Threads are enough here: PDF parsing and model inference both spend most of their time outside the GIL,
+    and the model is only loaded once.
+    Members go through the analysis cache just like single uploads, so a re-uploaded archive is nearly free.
+
+Time Budget:
+    The time budget (the request's, or the analyser's default) is for the whole archive, not for each member.
+    Each member is analysed with whatever is left of it when its analysis starts (extraction counts too),
+    so a slow member leaves less time for the rest instead of every member getting the full budget.
+    Members that haven't started when it runs out are reported as failed with 'timed_out' set, and
+    members it cut short have partial results, both counted in the aggregate.
+
+What Comes Back:
+    One entry per member (its result, or the error that stopped it) in archive order,
+    plus an aggregate over the members that were analysed successfully.
+    One failed member never fails the whole archive.
+"""
+
+import concurrent.futures
+import hashlib
+import io
+import os
+import time
+
+
+class ArchiveAnalyser:
+    # Runs archive members through extraction and analysis in parallel
+
+    # Members analysed at the same time. Each one holds its decompressed bytes in memory while it runs
+    MAX_WORKERS = max(1, int(os.environ.get('ARCHIVE_WORKERS', min(4, os.cpu_count() or 1))))
+
+    def __init__(self, file_processor, text_analyser, analysis_cache=None):
+        self.file_processor = file_processor
+        self.text_analyser = text_analyser
+        self.analysis_cache = analysis_cache
+
+    def analyse_archive(self, uploaded_file, force_single_analysis=False, time_budget=None, sampling=False):
+        # Analyse every supported member of an uploaded ZIP.
+        # Returns {'filename', 'files', 'skipped', 'aggregate'}. Raises ValueError if the archive itself is unusable.
+        if time_budget is None:
+            time_budget = self.text_analyser.time_budget
+        options = {
+            'force_single_analysis': force_single_analysis,
+            # One deadline shared by every member (see Time Budget above)
+            'deadline': time.monotonic() + time_budget if time_budget is not None else None,
+            'sampling': sampling
+        }
+
+        with self.file_processor.open_archive(uploaded_file) as (archive, members, skipped, filename):
+            workers = min(self.MAX_WORKERS, len(members))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                # map keeps archive order in the response regardless of which member finishes first
+                files = list(pool.map(lambda info: self.analyse_member(archive, info, options), members))
+
+        return {
+            'filename': filename,
+            'files': files,
+            'skipped': skipped,
+            'aggregate': self.build_aggregate(files, len(skipped))
+        }
+
+    def analyse_member(self, archive, info, options):
+        # Extract and analyse one member. Never raises, failures are reported in the entry
+        entry = {
+            'filename': info.filename,
+            'success': False,
+            'cached': False,
+            'text': None,
+            'analysis': None,
+            'error': None,
+            'timed_out': False
+        }
+
+        try:
+            data = self.file_processor.read_archive_member(archive, info)
+            # Members are sniffed like single uploads, so a mislabelled one is reported instead of misread
+            file_type = self.file_processor.detect_format(io.BytesIO(data), info.filename)
+
+            # Same cache as single uploads: keyed by the member's own bytes
+            cache_key = None
+            if self.analysis_cache is not None and not options['sampling']:
+                digest = hashlib.sha256(data).hexdigest()
+                cache_key = self.analysis_cache.make_key(
+                    digest, self.text_analyser.model_version, options['force_single_analysis']
+                )
+                cached = self.analysis_cache.get(cache_key)
+                if cached:
+                    text, analysis = cached
+                    analysis['result']['filename'] = info.filename
+                    entry.update({'success': True, 'cached': True, 'text': text, 'analysis': analysis})
+                    return entry
+
+            if options['deadline'] is not None and time.monotonic() >= options['deadline']:
+                entry.update({'error': 'Time budget ran out before this file was analysed', 'timed_out': True})
+                return entry
+
+            text, analysis = self._analyse_bytes(data, file_type, info.filename, options)
+
+            if cache_key:
+                self.analysis_cache.put(cache_key, text, analysis)
+            entry.update({'success': True, 'text': text, 'analysis': analysis})
+        except ValueError as e:
+            entry['error'] = str(e)
+        except Exception as e:
+            print(f"Error analysing archive member {info.filename}: {e}")
+            entry['error'] = 'Analysis failed'
+        return entry
+
+    def _analyse_bytes(self, data, file_type, filename, options):
+        # Same flow as a single upload in /api/detect: stream when we can, otherwise extract first
+        chunks = self.file_processor.iter_text(io.BytesIO(data), file_type)
+
+        if not options['sampling'] and options['deadline'] is None:
+            text, analysis = self.text_analyser.analyse_stream(
+                chunks, source_type='file', filename=filename,
+                force_single_analysis=options['force_single_analysis']
+            )
+            if len(text) < 10:
+                raise ValueError('Extracted text must be at least 10 characters long')
+            return text, analysis
+
+        text = ''.join(chunks).strip()
+        if not text:
+            raise ValueError('No text content found')
+        if len(text) < 10:
+            raise ValueError('Extracted text must be at least 10 characters long')
+        if len(text) > self.text_analyser.MAX_TEXT_LENGTH:
+            raise ValueError(f'Text exceeds maximum length of {self.text_analyser.MAX_TEXT_LENGTH} characters')
+        time_budget = None
+        if options['deadline'] is not None:
+            # Whatever the members before this one left (the analyser always scores at least one sentence)
+            time_budget = max(0.0, options['deadline'] - time.monotonic())
+        analysis = self.text_analyser.analyse_text(
+            text, source_type='file', filename=filename,
+            force_single_analysis=options['force_single_analysis'],
+            time_budget=time_budget,
+            sampling=options['sampling']
+        )
+        return text, analysis
+
+    def build_aggregate(self, files, skipped_count=0):
+        # Summarise the archive: counts per classification and a length-weighted overall probability
+        analysed = [entry for entry in files if entry['success']]
+        ai_files = 0
+        probabilities = []
+        weighted_total = 0.0
+        total_length = 0
+
+        for entry in analysed:
+            result = entry['analysis']['result']
+            if entry['analysis']['analysis_type'] == 'sentence_level':
+                probability = result['overall_ai_probability']
+            else:
+                probability = result['ai_probability']
+            if probability > 0.5:
+                ai_files += 1
+            probabilities.append(probability)
+            weighted_total += probability * result['text_length']
+            total_length += result['text_length']
+
+        overall = weighted_total / total_length if total_length else 0.0
+        return {
+            'total_files': len(files),
+            'analysed_files': len(analysed),
+            'failed_files': len(files) - len(analysed),
+            'skipped_files': skipped_count,
+            'timed_out_files': sum(1 for entry in files if entry['timed_out']),
+            'partial_files': sum(1 for entry in analysed if entry['analysis']['result'].get('partial')),
+            'ai_generated_files': ai_files,
+            'human_written_files': len(analysed) - ai_files,
+            'average_ai_probability': round(sum(probabilities) / len(probabilities), 4) if probabilities else None,
+            'overall_ai_probability': round(overall, 4) if analysed else None,
+            'overall_classification': ('AI-generated' if overall > 0.5 else 'Human-written') if analysed else None,
+            'total_text_length': total_length
+        }
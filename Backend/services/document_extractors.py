@@ -0,0 +1,583 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+This file reads the text out of HTML, Markdown, OpenDocument (.odt) and RTF files.
+
+Why We Need It:
+    Students don't only hand in PDFs and Word documents. Essays exported from Google Docs, LibreOffice,
+    WordPad, blogs and note-taking apps come in all of these formats.
+
+How It Works:
+    Every extractor streams: it reads its input a block at a time and yields text in chunks of about
+    TEXT_CHUNK_SIZE characters, so memory stays flat however big the file is. Only the Python standard library
+    is used, and this module is only imported when the first file of one of these formats comes in
+    (see services/extractor_registry.py).
+
+    HTML: html.parser, fed the decoded text chunk by chunk. Scripts, styles and other non-content elements
+        are dropped, block elements (p, div, li, tr, headings...) end a line, whitespace is collapsed like a browser would.
+    Markdown: line by line. Syntax is removed (headings, emphasis, list markers, quotes, link targets, HTML tags)
+        and the words are kept. Front matter and fenced code blocks are skipped, code isn't the author's prose.
+    ODT: a ZIP like DOCX. content.xml is run through an incremental XML parser with a target (callbacks for
+        start tag, end tag and text), so no tree is ever built. Footnotes and endnotes come after the body,
+        then headers and footers from styles.xml, same order as DOCX.
+    RTF: a tokenizer over the raw bytes. Control words become text where they stand for a character
+        (\\par, \\tab, \\'hh, \\uN...), non-text groups (fonts, colours, pictures, field codes...) are skipped,
+        and footnotes, headers and footers are moved after the body.
+
+Every extractor takes (file_processor, source), where source is a file path or a seekable binary stream,
+and yields chunks that end with a newline.
+"""
+
+import codecs
+import html.parser
+import re
+import xml.etree.ElementTree as ElementTree
+import zipfile
+
+# XML namespaces used by OpenDocument
+TEXT_NAMESPACE = 'urn:oasis:names:tc:opendocument:xmlns:text:1.0'
+STYLE_NAMESPACE = 'urn:oasis:names:tc:opendocument:xmlns:style:1.0'
+OFFICE_NAMESPACE = 'urn:oasis:names:tc:opendocument:xmlns:office:1.0'
+
+
+def _chunked(pieces, chunk_size):
+    # Group small pieces of text (lines, paragraphs) into chunks of about chunk_size characters
+    chunk = []
+    size = 0
+    for piece in pieces:
+        chunk.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+def _iter_lines(chunks):
+    # Split decoded text chunks into lines (without the newline), even when a line spans two chunks
+    pending = ''
+    for chunk in chunks:
+        lines = (pending + chunk).split('\n')
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+
+class HtmlExtractor:
+    # Streams the visible text out of an HTML document
+
+    # Elements whose content is never shown as text
+    SKIPPED_TAGS = {'script', 'style', 'noscript', 'template', 'head', 'svg', 'math', 'iframe', 'object'}
+    # Elements that start and end on their own line
+    BLOCK_TAGS = {
+        'address', 'article', 'aside', 'blockquote', 'br', 'caption', 'dd', 'div', 'dl', 'dt', 'figcaption',
+        'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav',
+        'ol', 'p', 'pre', 'section', 'table', 'td', 'th', 'tr', 'ul'
+    }
+    # Elements without a closing tag: they never open a skipped section
+    VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+    class _Parser(html.parser.HTMLParser):
+        # Collects text pieces as the document is fed in
+
+        def __init__(self, extractor):
+            # convert_charrefs turns &amp; &eacute; &#8217; etc. into characters for us
+            super().__init__(convert_charrefs=True)
+            self.extractor = extractor
+            self.pieces = []
+            self.skip_depth = 0
+            self.pre_depth = 0
+            self.after_space = False    # The last text ended with a collapsed space
+
+        def handle_starttag(self, tag, attrs):
+            if tag in self.extractor.SKIPPED_TAGS and tag not in self.extractor.VOID_TAGS:
+                self.skip_depth += 1
+            elif tag == 'pre':
+                self.pre_depth += 1
+            if tag in self.extractor.BLOCK_TAGS:
+                self.pieces.append('\n')
+
+        def handle_startendtag(self, tag, attrs):
+            # <br/> and friends: a block tag still breaks the line, nothing to open or close
+            if tag in self.extractor.BLOCK_TAGS:
+                self.pieces.append('\n')
+
+        def handle_endtag(self, tag):
+            if tag in self.extractor.SKIPPED_TAGS:
+                self.skip_depth = max(0, self.skip_depth - 1)
+            elif tag == 'pre':
+                self.pre_depth = max(0, self.pre_depth - 1)
+            if tag in self.extractor.BLOCK_TAGS:
+                self.pieces.append('\n')
+
+        def handle_data(self, data):
+            if self.skip_depth:
+                return
+            if self.pre_depth:
+                self.pieces.append(data)
+                self.after_space = False
+                return
+            # Outside <pre> any run of whitespace (newlines included) shows as one space,
+            # also when the run is split over two pieces of data (two reads, or around an inline tag)
+            text = re.sub(r'\s+', ' ', data)
+            if self.after_space and text.startswith(' '):
+                text = text[1:]
+            if text:
+                self.pieces.append(text)
+                self.after_space = text.endswith(' ')
+
+    def iter_chunks(self, file_processor, source):
+        # Yield the text of an HTML file in chunks of whole lines
+        parser = self._Parser(self)
+        return _chunked(self._iter_lines(parser, file_processor.iter_txt_chunks(source)), file_processor.TEXT_CHUNK_SIZE)
+
+    def _iter_lines(self, parser, chunks):
+        # Feed the parser and yield cleaned up lines as they're completed
+        pending = ''
+        blank = True    # Last line yielded was blank (so we never yield two in a row, or one at the start)
+        for is_last, chunk in self._with_last(chunks):
+            parser.feed(chunk)
+            if is_last:
+                parser.close()
+            text = pending + ''.join(parser.pieces)
+            parser.pieces.clear()
+            lines = text.split('\n')
+            # The last line may still be growing, keep it until the next chunk (or the end)
+            pending = '' if is_last else lines.pop()
+            for line in lines:
+                line = line.strip()
+                if line:
+                    blank = False
+                    yield line + '\n'
+                elif not blank:
+                    blank = True
+                    yield '\n'
+
+    def _with_last(self, chunks):
+        # (is_last, chunk) pairs, with an empty final chunk so the parser is always closed
+        for chunk in chunks:
+            yield False, chunk
+        yield True, ''
+
+
+class MarkdownExtractor:
+    # Streams the prose out of a Markdown file, without the syntax
+
+    FENCE = re.compile(r'^\s{0,3}(`{3,}|~{3,})')
+    HORIZONTAL_RULE = re.compile(r'^\s{0,3}([-*_])(\s*\1){2,}\s*$')
+    SETEXT_UNDERLINE = re.compile(r'^\s{0,3}(=+|-+)\s*$')
+    REFERENCE_DEFINITION = re.compile(r'^\s{0,3}\[[^\]]+\]:\s*\S+')
+    TABLE_SEPARATOR = re.compile(r'^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$')
+    HEADING = re.compile(r'^\s{0,3}#{1,6}(\s+|$)')
+    BLOCKQUOTE = re.compile(r'^\s{0,3}(>\s?)+')
+    LIST_MARKER = re.compile(r'^\s*([-*+]|\d{1,9}[.)])\s+(\[[ xX]\]\s+)?')
+
+    # Inline syntax, applied in this order
+    INLINE_RULES = [
+        (re.compile(r'!\[([^\]]*)\]\([^)]*\)'), r'\1'),          # ![alt](image.png) -> alt
+        (re.compile(r'\[([^\]]*)\]\([^)]*\)'), r'\1'),           # [text](url) -> text
+        (re.compile(r'\[([^\]]*)\]\[[^\]]*\]'), r'\1'),          # [text][ref] -> text
+        (re.compile(r'<(https?://[^>]+)>'), r'\1'),              # <https://...> -> https://...
+        (re.compile(r'</?[A-Za-z][^>]*>'), ''),                  # inline HTML tags
+        (re.compile(r'`+([^`]*)`+'), r'\1'),                     # `code` -> code
+        (re.compile(r'(\*\*|__)(?=\S)(.+?)(?<=\S)\1'), r'\2'),    # **bold** / __bold__
+        (re.compile(r'(?<![\w*\\])\*(?=\S)(.+?)(?<=[^\s\\])\*(?![\w*])'), r'\1'),  # *italic* (not \*)
+        (re.compile(r'(?<!\w)_(?=\S)(.+?)(?<=\S)_(?!\w)'), r'\1'),           # _italic_ (not snake_case)
+        (re.compile(r'~~(?=\S)(.+?)(?<=\S)~~'), r'\1'),           # ~~strikethrough~~
+        (re.compile(r'\\([\\`*_{}\[\]()#+\-.!|>~])'), r'\1'),   # \* -> *
+    ]
+
+    def iter_chunks(self, file_processor, source):
+        # Yield the text of a Markdown file in chunks of whole lines
+        lines = _iter_lines(file_processor.iter_txt_chunks(source))
+        return _chunked(self._iter_text_lines(lines), file_processor.TEXT_CHUNK_SIZE)
+
+    def _iter_text_lines(self, lines):
+        fence = None        # The fence that opened the code block we're in
+        front_matter = False
+        for number, line in enumerate(lines):
+            if number == 0 and line.strip() == '---':
+                # YAML front matter (title, date...) isn't part of the text
+                front_matter = True
+                continue
+            if front_matter:
+                if line.strip() in ('---', '...'):
+                    front_matter = False
+                continue
+
+            match = self.FENCE.match(line)
+            if fence is not None:
+                if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence):
+                    fence = None
+                continue
+            if match:
+                fence = match.group(1)
+                continue
+
+            text = self._convert_line(line)
+            if text is not None:
+                yield text + '\n'
+
+    def _convert_line(self, line):
+        # Text of one line without its Markdown syntax, or None for lines that are only syntax
+        if (self.HORIZONTAL_RULE.match(line) or self.SETEXT_UNDERLINE.match(line)
+                or self.REFERENCE_DEFINITION.match(line)):
+            return None
+        if line.lstrip().startswith('|'):
+            if self.TABLE_SEPARATOR.match(line):
+                return None
+            # Table row: one cell after the other, tab separated
+            line = '\t'.join(cell.strip() for cell in line.strip().strip('|').split('|'))
+
+        line = self.HEADING.sub('', line)
+        line = self.BLOCKQUOTE.sub('', line)
+        line = self.LIST_MARKER.sub('', line)
+        line = re.sub(r'\s#+\s*$', '', line)  # Closing hashes of "## Heading ##"
+        for pattern, replacement in self.INLINE_RULES:
+            line = pattern.sub(replacement, line)
+        return line.strip()
+
+
+class OdtExtractor:
+    # Streams paragraphs out of an OpenDocument text file (LibreOffice, Google Docs export)
+
+    PARAGRAPHS = {f'{{{TEXT_NAMESPACE}}}p', f'{{{TEXT_NAMESPACE}}}h'}
+    NOTE_BODY = f'{{{TEXT_NAMESPACE}}}note-body'
+    SPACE = f'{{{TEXT_NAMESPACE}}}s'
+    CHARACTERS = {
+        f'{{{TEXT_NAMESPACE}}}tab': '\t',
+        f'{{{TEXT_NAMESPACE}}}line-break': '\n',
+        f'{{{TEXT_NAMESPACE}}}soft-page-break': '',
+    }
+    # Never part of the text: footnote numbers, comments, deleted tracked changes
+    SKIPPED = {
+        f'{{{TEXT_NAMESPACE}}}note-citation',
+        f'{{{OFFICE_NAMESPACE}}}annotation',
+        f'{{{TEXT_NAMESPACE}}}tracked-changes',
+    }
+    # Where the text is in styles.xml: the page headers and footers of each master page
+    HEADER_FOOTER = {
+        f'{{{STYLE_NAMESPACE}}}{name}'
+        for name in ('header', 'header-left', 'header-first', 'footer', 'footer-left', 'footer-first')
+    }
+
+    # Compressed bytes fed to the XML parser at a time
+    READ_SIZE = 64 * 1024
+
+    class _Target:
+        # XML parser target: called for every tag and piece of text, collects finished paragraphs
+
+        def __init__(self, extractor, only_inside=None):
+            self.extractor = extractor
+            self.only_inside = only_inside  # Only keep paragraphs inside these elements (None: keep all)
+            self.inside_depth = 0
+            self.paragraphs = []    # Text buffers of the paragraphs we're in (notes nest paragraphs)
+            self.skip_depth = 0
+            self.note_depth = 0
+            self.finished = []      # Paragraphs ready to be yielded
+            self.notes = []         # Note paragraphs, yielded after the body
+
+        def start(self, tag, attrib):
+            extractor = self.extractor
+            if self.only_inside is not None and tag in self.only_inside:
+                self.inside_depth += 1
+            if tag in extractor.SKIPPED:
+                self.skip_depth += 1
+            if self.skip_depth:
+                return
+            if tag in extractor.PARAGRAPHS:
+                self.paragraphs.append([])
+            elif tag == extractor.NOTE_BODY:
+                self.note_depth += 1
+            elif self.paragraphs:
+                if tag == extractor.SPACE:
+                    # <text:s text:c="3"/> is 3 spaces (consecutive spaces are collapsed in ODF otherwise)
+                    count = attrib.get(f'{{{TEXT_NAMESPACE}}}c', '1')
+                    self.paragraphs[-1].append(' ' * int(count) if count.isdigit() else ' ')
+                elif tag in extractor.CHARACTERS:
+                    self.paragraphs[-1].append(extractor.CHARACTERS[tag])
+
+        def end(self, tag):
+            extractor = self.extractor
+            if tag in extractor.SKIPPED:
+                self.skip_depth -= 1
+            elif not self.skip_depth:
+                if tag in extractor.PARAGRAPHS and self.paragraphs:
+                    text = ''.join(self.paragraphs.pop())
+                    if self.only_inside is None or self.inside_depth:
+                        (self.notes if self.note_depth else self.finished).append(text)
+                elif tag == extractor.NOTE_BODY:
+                    self.note_depth -= 1
+            if self.only_inside is not None and tag in self.only_inside:
+                self.inside_depth -= 1
+
+        def data(self, text):
+            if self.paragraphs and not self.skip_depth:
+                self.paragraphs[-1].append(text)
+
+        def close(self):
+            return None
+
+    def iter_chunks(self, file_processor, source):
+        # Yield the text of an ODT file in chunks of whole paragraphs
+        return _chunked((paragraph + '\n' for paragraph in self.iter_paragraphs(source)), file_processor.TEXT_CHUNK_SIZE)
+
+    def iter_paragraphs(self, source):
+        # Body paragraphs (tables included) in order, then notes, then headers and footers
+        with zipfile.ZipFile(source) as archive:
+            names = set(archive.namelist())
+            if 'content.xml' not in names:
+                raise ValueError('Not an OpenDocument text file (no content.xml)')
+            yield from self._iter_part(archive, 'content.xml', None)
+            if 'styles.xml' in names:
+                yield from self._iter_part(archive, 'styles.xml', self.HEADER_FOOTER)
+
+    def _iter_part(self, archive, part_name, only_inside):
+        target = self._Target(self, only_inside)
+        parser = ElementTree.XMLParser(target=target)
+        with archive.open(part_name) as part:
+            while True:
+                data = part.read(self.READ_SIZE)
+                if not data:
+                    break
+                parser.feed(data)
+                yield from target.finished
+                target.finished.clear()
+        parser.close()
+        yield from target.finished
+        yield from target.notes
+
+
+class RtfExtractor:
+    # Streams the text out of an RTF file (WordPad, TextEdit, older Word exports)
+
+    # Bytes read from the file at a time
+    READ_SIZE = 64 * 1024
+    # Longest control word we wait for at the end of the data (backslash, 32 letters, 11 digit parameter, space)
+    TOKEN_LOOKAHEAD = 48
+
+    # One RTF token: control word (\par, \u8217, \ansicpg1252), hex byte (\'e9), control symbol (\~ \{ \*),
+    # group start/end, or a run of plain text. CR/LF in the file are not text in RTF
+    TOKEN = re.compile(
+        rb"\\([a-zA-Z]{1,32})(-?\d{1,10})? ?"
+        rb"|\\'([0-9a-fA-F]{2})"
+        rb"|\\([^a-zA-Z])"
+        rb"|([{}])"
+        rb"|([^\\{}\r\n]+)"
+        rb"|([\r\n]+)"
+    )
+
+    # Groups that never contain document text
+    SKIPPED_DESTINATIONS = {
+        b'fonttbl', b'colortbl', b'stylesheet', b'info', b'pict', b'object', b'themedata', b'colorschememapping',
+        b'datastore', b'latentstyles', b'listtable', b'listoverridetable', b'rsidtbl', b'generator', b'xmlnstbl',
+        b'filetbl', b'revtbl', b'pgdsctbl', b'fldinst', b'pntext', b'listtext', b'nonshppict', b'bkmkstart',
+        b'bkmkend', b'mmathPr', b'operator', b'author', b'title', b'subject', b'keywords', b'comment',
+    }
+    # Groups whose text comes after the body, like DOCX (notes, then headers and footers, in file order)
+    DEFERRED_DESTINATIONS = {
+        b'footnote', b'header', b'headerl', b'headerr', b'headerf', b'footer', b'footerl', b'footerr', b'footerf',
+    }
+    # Control words that stand for text
+    CHARACTERS = {
+        b'par': '\n', b'line': '\n', b'sect': '\n', b'page': '\n', b'row': '\n', b'tab': '\t', b'cell': '\t',
+        b'emdash': '\u2014', b'endash': '\u2013', b'bullet': '\u2022', b'lquote': '\u2018', b'rquote': '\u2019',
+        b'ldblquote': '\u201c', b'rdblquote': '\u201d', b'emspace': ' ', b'enspace': ' ', b'qmspace': ' ',
+    }
+    # Control symbols that stand for text (\\ \{ \} are literal characters)
+    SYMBOLS = {b'\\': '\\', b'{': '{', b'}': '}', b'~': '\u00a0', b'_': '-', b'\n': '\n', b'\r': '\n', b'\t': '\t'}
+
+    class _State:
+        # Tokenizer state for one document
+
+        def __init__(self):
+            # Per group: (skip, deferred, unicode fallback length). Starts with the state outside {\rtf1 ...}
+            self.groups = [(False, False, 1)]
+            self.skip = False
+            self.deferred = False
+            self.unicode_skip = 1       # Characters after \uN that are a fallback for old readers (\ucN)
+            self.fallback_left = 0      # Fallback characters still to drop
+            self.group_start = False    # The previous token was '{' (the next control word may be a destination)
+            self.codepage = 'cp1252'
+            self.pending_bytes = bytearray()  # \'hh and raw bytes, decoded together (multi-byte code pages)
+            self.high_surrogate = None
+            self.body = []
+            self.later = []
+
+    def iter_chunks(self, file_processor, source):
+        # Yield the text of an RTF file in chunks
+        if isinstance(source, str):
+            with open(source, 'rb') as file:
+                yield from self.iter_chunks(file_processor, file)
+            return
+        source.seek(0)
+
+        state = self._State()
+        chunk_size = file_processor.TEXT_CHUNK_SIZE
+        buffer = b''
+        binary_left = 0     # Bytes of \binN data still to skip
+        while True:
+            data = source.read(self.READ_SIZE)
+            final = not data
+            if binary_left:
+                skipped = min(binary_left, len(data))
+                data = data[skipped:]
+                binary_left -= skipped
+            buffer += data
+
+            used, binary_left = self._tokenize(state, buffer, final)
+            buffer = buffer[used:]
+            if final:
+                break
+            if sum(len(text) for text in state.body) >= chunk_size:
+                yield ''.join(state.body)
+                state.body = []
+
+        self._flush_bytes(state)
+        if state.body:
+            yield ''.join(state.body)
+        if state.later:
+            yield from _chunked(state.later, chunk_size)
+
+    def _tokenize(self, state, buffer, final):
+        # Handle every complete token in buffer. Returns (bytes used, \bin bytes still to skip)
+        position = 0
+        length = len(buffer)
+        while position < length:
+            match = self.TOKEN.match(buffer, position)
+            if match is None:
+                # A lone backslash at the end: wait for more data, or drop it at the end of the file
+                if final:
+                    position += 1
+                    continue
+                break
+            word, parameter, hex_byte, symbol, brace, text, newlines = match.groups()
+            if (not final and match.end() > length - self.TOKEN_LOOKAHEAD
+                    and text is None and newlines is None):
+                # A control word near the end of the data may be cut off (\pa|r), finish it next time.
+                # Plain text can be split anywhere, so long text runs never wait
+                break
+            position = match.end()
+
+            if word is not None:
+                if word == b'bin' and parameter:
+                    # Raw binary data follows, skip it without tokenizing
+                    count = max(0, int(parameter))
+                    skipped = min(count, length - position)
+                    position += skipped
+                    if count > skipped:
+                        return position, count - skipped
+                    continue
+                self._control_word(state, word, parameter)
+            elif hex_byte is not None:
+                state.group_start = False
+                self._add_bytes(state, bytes([int(hex_byte, 16)]))
+            elif symbol is not None:
+                self._control_symbol(state, symbol)
+            elif brace == b'{':
+                self._flush_bytes(state)
+                state.groups.append((state.skip, state.deferred, state.unicode_skip))
+                state.group_start = True
+            elif brace == b'}':
+                self._flush_bytes(state)
+                if len(state.groups) > 1:
+                    state.skip, state.deferred, state.unicode_skip = state.groups.pop()
+                state.fallback_left = 0
+                state.group_start = False
+            elif text is not None:
+                state.group_start = False
+                self._add_bytes(state, text)
+            # Line breaks in the file itself are ignored
+        return position, 0
+
+    def _control_word(self, state, word, parameter):
+        group_start = state.group_start
+        state.group_start = False
+        if group_start and word in self.SKIPPED_DESTINATIONS:
+            state.skip = True
+            return
+        if group_start and word in self.DEFERRED_DESTINATIONS:
+            self._flush_bytes(state)
+            state.deferred = True
+            return
+        if state.skip:
+            return
+
+        if word == b'ansicpg' and parameter:
+            state.codepage = f'cp{parameter.decode()}'
+            try:
+                codecs.lookup(state.codepage)
+            except LookupError:
+                state.codepage = 'cp1252'
+        elif word == b'uc' and parameter:
+            state.unicode_skip = max(0, int(parameter))
+        elif word == b'u' and parameter:
+            self._flush_bytes(state)
+            code = int(parameter)
+            if code < 0:
+                code += 65536  # Signed 16 bit in the file
+            self._add_text(state, self._unicode_character(state, code))
+            state.fallback_left = state.unicode_skip
+        elif word in self.CHARACTERS:
+            self._flush_bytes(state)
+            self._add_text(state, self.CHARACTERS[word])
+
+    def _control_symbol(self, state, symbol):
+        group_start = state.group_start
+        state.group_start = False
+        if symbol == b'*':
+            # {\*\destination ...}: a group readers may ignore if they don't know it. We never need those
+            if group_start:
+                state.skip = True
+            return
+        if state.skip:
+            return
+        if symbol == b'-':
+            return  # Optional hyphen, not shown unless the word breaks there
+        if symbol in self.SYMBOLS:
+            self._add_bytes(state, self.SYMBOLS[symbol].encode(state.codepage, errors='replace'))
+
+    def _unicode_character(self, state, code):
+        # \uN can be half of a surrogate pair (emoji and other characters outside the BMP)
+        if 0xD800 <= code <= 0xDBFF:
+            state.high_surrogate = code
+            return ''
+        if 0xDC00 <= code <= 0xDFFF and state.high_surrogate is not None:
+            high = state.high_surrogate
+            state.high_surrogate = None
+            return chr(0x10000 + ((high - 0xD800) << 10) + (code - 0xDC00))
+        state.high_surrogate = None
+        return chr(code) if code < 0xD800 or code > 0xDFFF else ''
+
+    def _add_bytes(self, state, data):
+        # Text bytes in the document's code page. The first ones may be the fallback of a \uN
+        if state.skip:
+            return
+        if state.fallback_left:
+            dropped = min(state.fallback_left, len(data))
+            data = data[dropped:]
+            state.fallback_left -= dropped
+        state.pending_bytes += data
+
+    def _flush_bytes(self, state):
+        # Decode the bytes collected so far and add them to the text
+        if state.pending_bytes:
+            text = bytes(state.pending_bytes).decode(state.codepage, errors='replace')
+            state.pending_bytes.clear()
+            (state.later if state.deferred else state.body).append(text)
+
+    def _add_text(self, state, text):
+        if text and not state.skip:
+            (state.later if state.deferred else state.body).append(text)
+
+
+# Create global instances that other files can use
+html_extractor = HtmlExtractor()
+markdown_extractor = MarkdownExtractor()
+odt_extractor = OdtExtractor()
+rtf_extractor = RtfExtractor()
@@ -0,0 +1,146 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+This file reads the text out of Word (.docx) files without python-docx.
+
+Why We Need It:
+    python-docx builds an object for every paragraph, run and style in the document before we can read anything,
+    which is slow and memory hungry on big documents. We also only read doc.paragraphs with it, so text in
+    tables, text boxes, footnotes, headers and footers was silently dropped.
+
+How It Works:
+    A .docx file is a zip of XML files. We open the parts we need straight out of the zip and run an incremental
+    XML parser (ElementTree.iterparse) over them, handling each element as it's parsed and throwing it away
+    straight after, so memory stays flat no matter how long the document is.
+
+    Parts, in this order:
+        the main document (normally word/document.xml): body paragraphs, tables and text boxes in document order
+        word/footnotes.xml and word/endnotes.xml
+        word/header*.xml and word/footer*.xml
+
+    Inside a part:
+        w:p   a paragraph, yielded when it ends (an empty paragraph gives an empty line, like python-docx did)
+        w:t   text inside a run
+        w:tab, w:br, w:cr, w:noBreakHyphen   tabs, line breaks and hyphens inside a run
+        w:delText, w:instrText   deleted text and field codes are different tags, so they're skipped automatically
+        mc:Fallback   old-Word copies of text boxes (mc:Choice has the same text), skipped to avoid duplicates
+    Table cells contain ordinary paragraphs, so each cell paragraph comes out as its own line.
+    A text box paragraph sits inside a run of its anchor paragraph and is yielded just before that paragraph.
+"""
+
+import posixpath
+import xml.etree.ElementTree as ElementTree
+import zipfile
+
+# XML namespaces used by WordprocessingML
+W_NAMESPACE = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+MC_NAMESPACE = 'http://schemas.openxmlformats.org/markup-compatibility/2006'
+OFFICE_DOCUMENT_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+
+
+class DocxExtractor:
+    # Streams paragraphs out of a .docx file
+
+    PARAGRAPH = f'{{{W_NAMESPACE}}}p'
+    RUN = f'{{{W_NAMESPACE}}}r'
+    TEXT = f'{{{W_NAMESPACE}}}t'
+    FALLBACK = f'{{{MC_NAMESPACE}}}Fallback'
+
+    # Run-level elements that stand for a character
+    RUN_CHARACTERS = {
+        f'{{{W_NAMESPACE}}}tab': '\t',
+        f'{{{W_NAMESPACE}}}br': '\n',
+        f'{{{W_NAMESPACE}}}cr': '\n',
+        f'{{{W_NAMESPACE}}}noBreakHyphen': '-',
+    }
+
+    # Parts read after the main document
+    NOTE_PARTS = ['word/footnotes.xml', 'word/endnotes.xml']
+    HEADER_FOOTER_PREFIXES = ('word/header', 'word/footer')
+
+    def iter_paragraphs(self, source):
+        # Yield the text of every paragraph in the document, in order
+        # source can be a file path or a seekable binary file-like object
+        with zipfile.ZipFile(source) as archive:
+            for part_name in self.text_parts(archive):
+                with archive.open(part_name) as part:
+                    yield from self.iter_part_paragraphs(part)
+
+    def extract_text(self, source):
+        # The whole document as one string, one paragraph per line (same shape as the old python-docx extractor)
+        return '\n'.join(self.iter_paragraphs(source)).strip()
+
+    def text_parts(self, archive):
+        # Names of the XML parts that hold text, main document first
+        names = set(archive.namelist())
+        main_part = self.main_document_part(archive, names)
+        if main_part is None:
+            raise ValueError('Not a Word document (no main document part)')
+
+        parts = [main_part]
+        parts.extend(name for name in self.NOTE_PARTS if name in names)
+        # header1, header2... then footer1, footer2...
+        for prefix in self.HEADER_FOOTER_PREFIXES:
+            parts.extend(sorted(name for name in names if name.startswith(prefix) and name.endswith('.xml')))
+        return parts
+
+    def main_document_part(self, archive, names):
+        # The package relationships say where the main document is. It's word/document.xml in practice,
+        # but a few generators name it differently
+        if '_rels/.rels' in names:
+            with archive.open('_rels/.rels') as rels:
+                for relationship in ElementTree.parse(rels).getroot():
+                    if relationship.get('Type') == OFFICE_DOCUMENT_TYPE:
+                        target = posixpath.normpath(relationship.get('Target', '').lstrip('/'))
+                        if target in names:
+                            return target
+        return 'word/document.xml' if 'word/document.xml' in names else None
+
+    def iter_part_paragraphs(self, part):
+        # Stream one XML part and yield each paragraph's text when its closing tag is parsed
+        paragraphs = []     # Text buffers of the paragraphs we're inside (text boxes nest paragraphs)
+        elements = []       # Open elements, so finished ones can be detached from their parent
+        run_depth = 0
+        fallback_depth = 0
+
+        for event, element in ElementTree.iterparse(part, events=('start', 'end')):
+            tag = element.tag
+
+            if event == 'start':
+                elements.append(element)
+                if tag == self.FALLBACK:
+                    fallback_depth += 1
+                elif fallback_depth:
+                    continue
+                elif tag == self.PARAGRAPH:
+                    paragraphs.append([])
+                elif tag == self.RUN:
+                    run_depth += 1
+                continue
+
+            # 'end' event
+            elements.pop()
+            if tag == self.FALLBACK:
+                fallback_depth -= 1
+            elif not fallback_depth:
+                if tag == self.TEXT:
+                    if paragraphs and element.text:
+                        paragraphs[-1].append(element.text)
+                elif tag == self.RUN:
+                    run_depth -= 1
+                elif tag == self.PARAGRAPH:
+                    yield ''.join(paragraphs.pop())
+                elif run_depth and tag in self.RUN_CHARACTERS and paragraphs:
+                    # Only inside runs: w:tab also appears in paragraph properties as a tab stop
+                    paragraphs[-1].append(self.RUN_CHARACTERS[tag])
+
+            # Done with this element: drop it so the tree never grows past the current path
+            element.clear()
+            if elements:
+                elements[-1].remove(element)
+
+
+# Create a global instance that other files can use
+docx_extractor = DocxExtractor()
@@ -0,0 +1,288 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+This file runs text extraction of complex formats (PDF, DOCX, ODT) in sandboxed worker processes.
+
+Why We Need It:
+    A malformed (or deliberately hostile) PDF can make PyPDF2 loop forever or allocate memory without bound.
+    Inside a Flask request thread that stalls the whole server for everyone else.
+    In a separate process it can be limited, killed and forgotten about.
+
+How It Works:
+    A small pool of long-lived worker processes (EXTRACTION_WORKERS) is started on first use.
+    Each request borrows a worker, sends it the document bytes and gets the text back one page at a time,
+    so streaming analysis still starts on page 1 while later pages are being extracted.
+    The pages are buffered as they arrive, so the worker is returned to the pool when extraction finishes,
+    however long the request then spends analysing them.
+
+Limits Per Job:
+    Memory: RLIMIT_AS caps the worker's address space (EXTRACTION_MEMORY_MB). Going over it raises MemoryError.
+    CPU time: RLIMIT_CPU is moved to "CPU used so far + EXTRACTION_CPU_SECONDS" before every job,
+        so the kernel kills a worker that spins. (The limit is per process, hence the moving target.)
+    Wall clock: the parent waits at most EXTRACTION_TIMEOUT seconds for the job, covering workers that are
+        stuck without using CPU. Only the worker's time counts, not the time the request spends on the pages.
+    A worker that breaches a limit (or dies for any other reason) is killed and replaced by a fresh one,
+    and the request gets an ExtractionLimitError explaining what happened.
+    rlimits only exist on Unix. Elsewhere only the wall clock timeout applies.
+"""
+
+import io
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+
+try:
+    import resource  # Unix only: per-process resource limits
+except ImportError:
+    resource = None
+
+
+class ExtractionLimitError(ValueError):
+    # Raised when a document breaches the sandbox limits. A ValueError so the API reports it as a bad upload
+    pass
+
+
+def _apply_memory_limit(memory_limit_mb):
+    # Cap the worker's address space. Called once, after the worker's own imports are done
+    if resource is None or not memory_limit_mb:
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _apply_cpu_limit(cpu_seconds):
+    # Allow this job cpu_seconds more CPU time than the worker has used so far
+    if resource is None or not cpu_seconds:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = usage.ru_utime + usage.ru_stime
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(used) + 1 + int(cpu_seconds)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _worker_main(conn, memory_limit_mb, cpu_seconds):
+    # Worker process loop: receive (format name, data), send back ('chunk', text)... then ('done',) or ('error', message)
+    from services.file_processor import FileProcessor
+
+    # Extract in this process: no nested sandbox, no nested PDF pool
+    processor = FileProcessor(sandbox=False)
+    processor.PDF_EXTRACTION_WORKERS = 0
+    # Load the parsers before the memory limit goes on
+    import PyPDF2  # noqa: F401
+    from services.extractor_registry import extractor_registry
+    extractor_registry.preload(sandboxed_only=True)
+    _apply_memory_limit(memory_limit_mb)
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if job is None:
+            return
+
+        file_type, data = job
+        _apply_cpu_limit(cpu_seconds)
+        try:
+            source = io.BytesIO(data)
+            del data
+            for chunk in processor.iter_text(source, file_type):
+                conn.send(('chunk', chunk))
+            conn.send(('done',))
+        except MemoryError:
+            # State after a failed allocation isn't trustworthy, report it and let the parent replace us
+            conn.send(('memory',))
+            return
+        except Exception as e:
+            conn.send(('error', str(e)))
+
+
+class _Worker:
+    # One sandboxed worker process and the parent's end of its pipe
+
+    def __init__(self, context, memory_limit_mb, cpu_seconds):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, memory_limit_mb, cpu_seconds),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        # Stop the process for good (used after a breach or a job we gave up on)
+        try:
+            self.process.kill()
+            self.process.join(timeout=5)
+        except Exception as e:
+            print(f"Error stopping extraction worker: {e}")
+        self.conn.close()
+
+    def describe_exit(self):
+        # Best explanation for why the worker died
+        self.process.join(timeout=1)
+        if resource is not None and self.process.exitcode == -signal.SIGXCPU:
+            return 'cpu'
+        if self.process.exitcode == -signal.SIGKILL:
+            # The kernel's OOM killer, or the CPU hard limit
+            return 'killed'
+        return 'crashed'
+
+
+class ExtractionPool:
+    # Pool of sandboxed extraction workers, shared by all request threads
+
+    WORKERS = max(1, int(os.environ.get('EXTRACTION_WORKERS', '2')))
+    JOB_TIMEOUT = float(os.environ.get('EXTRACTION_TIMEOUT', '30'))
+    CPU_SECONDS = int(os.environ.get('EXTRACTION_CPU_SECONDS', '20'))
+    MEMORY_LIMIT_MB = int(os.environ.get('EXTRACTION_MEMORY_MB', '1024'))
+
+    def __init__(self, workers=None, job_timeout=None, cpu_seconds=None, memory_limit_mb=None):
+        self.workers = workers or self.WORKERS
+        self.job_timeout = job_timeout or self.JOB_TIMEOUT
+        self.cpu_seconds = self.CPU_SECONDS if cpu_seconds is None else cpu_seconds
+        self.memory_limit_mb = self.MEMORY_LIMIT_MB if memory_limit_mb is None else memory_limit_mb
+
+        # spawn, not fork: forking a multi-threaded Flask/torch process is asking for trouble
+        self._context = multiprocessing.get_context('spawn')
+        # Idle workers. None stands for "a slot with no process yet", started when it's first borrowed
+        self._idle = queue.LifoQueue()
+        for _ in range(self.workers):
+            self._idle.put(None)
+
+        self._lock = threading.Lock()
+        self.stats = {'jobs': 0, 'timeouts': 0, 'cpu_limit': 0, 'memory_limit': 0, 'crashes': 0, 'replaced': 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _acquire(self):
+        # Borrow a worker, starting one if the slot is empty. Waits up to job_timeout for a free slot
+        try:
+            worker = self._idle.get(timeout=self.job_timeout)
+        except queue.Empty:
+            raise ExtractionLimitError('Server is busy extracting other documents, please try again')
+        if worker is not None and not worker.process.is_alive():
+            # Died while idle (killed from outside?), clean up and start over
+            worker.kill()
+            worker = None
+        if worker is None:
+            worker = _Worker(self._context, self.memory_limit_mb, self.cpu_seconds)
+        return worker
+
+    def _release(self, worker, healthy):
+        # Return a worker to the pool, or kill it and leave an empty slot for a fresh one
+        if healthy:
+            self._idle.put(worker)
+        else:
+            worker.kill()
+            self._count('replaced')
+            self._idle.put(None)
+
+    def extract(self, data, file_type):
+        # Extract text from document bytes in a sandboxed worker. Yields text chunks (pages) as they arrive.
+        # Raises ExtractionLimitError if the document breaches a limit.
+        # A drain thread reads the worker's output into a buffer, so the time limit only covers the worker's own
+        # work (not how long the caller spends on each page) and the worker goes back to the pool as soon as
+        # it's finished, even while the caller is still analysing the pages
+        worker = self._acquire()
+        self._count('jobs')
+        output = queue.Queue()
+        threading.Thread(
+            target=self._drain, args=(worker, file_type, data, output), name='extraction-drain', daemon=True
+        ).start()
+        del data
+        while True:
+            kind, value = output.get()
+            if kind == 'chunk':
+                yield value
+            elif kind == 'done':
+                return
+            else:
+                raise value
+
+    def _drain(self, worker, file_type, data, output):
+        # Run one job on a borrowed worker, putting ('chunk', text)... then ('done', None) or ('error', exception)
+        # on output, and give the worker back (or replace it) once the job is over
+        # The clock starts once we have a worker, waiting for one doesn't count against the document
+        deadline = time.monotonic() + self.job_timeout
+        healthy = False
+        try:
+            try:
+                worker.conn.send((file_type, data))
+            except OSError:
+                # Worker died before it could take the job (e.g. it failed to start)
+                self._count('crashes')
+                raise ExtractionLimitError('Document could not be extracted (the extraction process stopped)')
+            del data
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not worker.conn.poll(remaining):
+                    self._count('timeouts')
+                    raise ExtractionLimitError(
+                        f'Document took too long to extract (limit {self.job_timeout:g}s) and was rejected'
+                    )
+                try:
+                    message = worker.conn.recv()
+                except (EOFError, OSError):
+                    reason = worker.describe_exit()
+                    if reason == 'cpu':
+                        self._count('cpu_limit')
+                        raise ExtractionLimitError(
+                            f'Document used too much processing time to extract (limit {self.cpu_seconds}s) and was rejected'
+                        )
+                    self._count('crashes')
+                    raise ExtractionLimitError('Document could not be extracted (the extraction process stopped)')
+
+                kind = message[0]
+                if kind == 'chunk':
+                    output.put(('chunk', message[1]))
+                elif kind == 'done':
+                    healthy = True
+                    output.put(('done', None))
+                    return
+                elif kind == 'memory':
+                    self._count('memory_limit')
+                    raise ExtractionLimitError(
+                        f'Document needed too much memory to extract (limit {self.memory_limit_mb}MB) and was rejected'
+                    )
+                else:
+                    # Ordinary extraction error, the worker itself is fine
+                    healthy = True
+                    raise ValueError(f'Could not extract text from file: {message[1]}')
+        except Exception as e:
+            output.put(('error', e))
+        finally:
+            # A worker that breached a limit or stopped is replaced, a finished one is ready for the next job
+            self._release(worker, healthy)
+
+    def shutdown(self):
+        # Stop all idle workers (busy ones are stopped when their job finishes)
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if worker is not None:
+                worker.kill()
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, workers=self.workers)
+
+
+# Create a global instance that other files can use (workers start on first use)
+extraction_pool = ExtractionPool()
@@ -0,0 +1,212 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+This file keeps the list of document formats we can read and decides which one an upload really is.
+
+Why We Need It:
+    Format handling used to be an if/elif on the file extension in FileProcessor, so every new format meant
+    editing that method (and usually importing another library at the top of the file).
+    The extension was also trusted blindly: a PDF renamed to .txt was "decoded" as Latin-1 garbage,
+    and random bytes named .docx went all the way to the parser before failing.
+
+How It Works:
+    Each format is registered once with:
+        name          short name, also used as the format's main extension ('pdf', 'docx'...)
+        label         how we name the format to users ('PDF', 'Markdown'...)
+        extensions    file extensions accepted for it
+        loader        'module:attribute' of its extractor, imported the first time a file of that format comes in,
+                      so registering a format costs nothing at startup
+        sniff         function(head, source) that recognises the format from its content (None if it can't be recognised)
+        textual       a text format, which can be taken from the extension when no signature matches
+        max_size_mb   the most we accept for this format (never more than the global upload limit)
+        sandboxed     parse it in the extraction sandbox (services/extraction_pool.py)
+    An extractor is called as extractor(file_processor, source) and yields text chunks ending in newlines.
+
+Content Sniffing (detect):
+    The first SNIFF_BYTES of the upload are matched against every format's sniff function, in registration order.
+    If one matches, that format is used, whatever the extension says.
+    If none matches, text formats (TXT, Markdown, HTML) are taken from the extension,
+    as long as the content doesn't contain NUL bytes (which means it's binary, not text).
+    A binary format (PDF, DOCX, ODT) or RTF whose signature is missing is rejected.
+
+Adding a Format:
+    Write a streaming extractor (see services/document_extractors.py) and register it at the bottom of this file.
+    Nothing else needs to change: validation, the API, archives and the sandbox all go through the registry.
+"""
+
+import importlib
+import threading
+import zipfile
+
+# Bytes read from the start of an upload to recognise its format
+SNIFF_BYTES = 4096
+
+ODT_MIMETYPE = b'application/vnd.oasis.opendocument.text'
+
+
+def _sniff_pdf(head, source):
+    # PDF readers accept the header anywhere in the first 1KB (some generators put junk before it)
+    return b'%PDF-' in head[:1024]
+
+
+def _is_zip(head):
+    return head.startswith(b'PK\x03\x04')
+
+
+def _zip_names(source):
+    # Member names of a ZIP, read from its central directory (nothing is decompressed)
+    try:
+        with zipfile.ZipFile(source) as archive:
+            return set(archive.namelist())
+    except (zipfile.BadZipFile, OSError, ValueError):
+        return set()
+    finally:
+        source.seek(0)
+
+
+def _sniff_docx(head, source):
+    # A Word document is a ZIP with the main document under word/
+    return _is_zip(head) and not _sniff_odt(head, source) and 'word/document.xml' in _zip_names(source)
+
+
+def _sniff_odt(head, source):
+    # OpenDocument files start with an uncompressed "mimetype" member, so its content is right there in the head
+    return _is_zip(head) and head[30:38] == b'mimetype' and head[38:38 + len(ODT_MIMETYPE)] == ODT_MIMETYPE
+
+
+def _sniff_rtf(head, source):
+    return head.lstrip(b'\xef\xbb\xbf \t\r\n').startswith(b'{\\rtf')
+
+
+def _sniff_html(head, source):
+    # Only a real HTML document counts, not a text or Markdown file that happens to contain a few tags
+    start = head.lstrip(b'\xef\xbb\xbf \t\r\n')[:64].lower()
+    return start.startswith(b'<!doctype html') or start.startswith(b'<html')
+
+
+class DocumentFormat:
+    # One registered format and its (lazily imported) extractor
+
+    def __init__(self, name, label, extensions, loader, sniff=None, textual=False, max_size_mb=None, sandboxed=False):
+        self.name = name
+        self.label = label
+        self.extensions = list(extensions)
+        self.loader = loader
+        self.sniff = sniff
+        self.textual = textual
+        self.max_size_mb = max_size_mb
+        self.sandboxed = sandboxed
+        self._extractor = None
+
+    def extractor(self):
+        # Import the extractor the first time it's needed
+        if self._extractor is None:
+            module_name, attribute = self.loader.split(':')
+            target = importlib.import_module(module_name)
+            for part in attribute.split('.'):
+                target = getattr(target, part)
+            self._extractor = target
+        return self._extractor
+
+
+class ExtractorRegistry:
+    # All formats we can extract text from, looked up by extension or by content
+
+    def __init__(self):
+        self._formats = {}      # name -> DocumentFormat, in registration order
+        self._extensions = {}   # extension -> DocumentFormat
+        self._lock = threading.Lock()
+
+    def register(self, name, label, extensions, loader, sniff=None, textual=False, max_size_mb=None, sandboxed=False):
+        # Add a format. Extensions are lowercase without the dot
+        document_format = DocumentFormat(name, label, extensions, loader, sniff, textual, max_size_mb, sandboxed)
+        with self._lock:
+            self._formats[name] = document_format
+            for extension in document_format.extensions:
+                self._extensions[extension] = document_format
+        return document_format
+
+    def get(self, file_type):
+        # Format for an extension or format name (every name is also one of its extensions), or None
+        if not file_type:
+            return None
+        return self._extensions.get(file_type.lower())
+
+    @property
+    def extensions(self):
+        return set(self._extensions)
+
+    @property
+    def formats(self):
+        return list(self._formats.values())
+
+    def describe(self):
+        # "PDF, DOCX or TXT" style list of the formats, for error messages
+        labels = [document_format.label for document_format in self._formats.values()]
+        if len(labels) < 2:
+            return ''.join(labels)
+        return ', '.join(labels[:-1]) + ' or ' + labels[-1]
+
+    def detect(self, source, extension):
+        # Work out the format of a seekable binary stream from its content, using the extension only for text formats.
+        # Leaves the stream at position 0. Raises ValueError if the content doesn't fit the extension.
+        declared = self.get(extension)
+        source.seek(0)
+        head = source.read(SNIFF_BYTES)
+        source.seek(0)
+
+        for document_format in self._formats.values():
+            if document_format.sniff is not None and document_format.sniff(head, source):
+                return document_format
+
+        if declared is None:
+            raise ValueError(f"File type not supported. Please upload {self.describe()} files.")
+        if not declared.textual:
+            # These formats always carry a signature, so a missing one means a corrupt or mislabelled file
+            raise ValueError(f"File content is not a valid {declared.label} document")
+        if b'\x00' in head:
+            raise ValueError(f"File content doesn't look like a {declared.label} file")
+        return declared
+
+    def preload(self, sandboxed_only=False):
+        # Import extractors up front (the sandbox workers do this before their memory limit goes on)
+        for document_format in self.formats:
+            if document_format.sandboxed or not sandboxed_only:
+                document_format.extractor()
+
+
+# Create a global instance that other files can use
+extractor_registry = ExtractorRegistry()
+
+# Sniffing tries formats in this order.
+# Extractors in FileProcessor are called as unbound methods: extractor(file_processor, source)
+extractor_registry.register(
+    'pdf', 'PDF', ['pdf'], 'services.file_processor:FileProcessor.iter_pdf_chunks',
+    sniff=_sniff_pdf, sandboxed=True
+)
+extractor_registry.register(
+    'docx', 'DOCX', ['docx'], 'services.file_processor:FileProcessor.iter_docx_chunks',
+    sniff=_sniff_docx, sandboxed=True
+)
+extractor_registry.register(
+    'odt', 'ODT', ['odt'], 'services.document_extractors:odt_extractor.iter_chunks',
+    sniff=_sniff_odt, sandboxed=True
+)
+extractor_registry.register(
+    'rtf', 'RTF', ['rtf'], 'services.document_extractors:rtf_extractor.iter_chunks',
+    sniff=_sniff_rtf
+)
+extractor_registry.register(
+    'html', 'HTML', ['html', 'htm'], 'services.document_extractors:html_extractor.iter_chunks',
+    sniff=_sniff_html, textual=True, max_size_mb=5
+)
+extractor_registry.register(
+    'md', 'Markdown', ['md', 'markdown'], 'services.document_extractors:markdown_extractor.iter_chunks',
+    textual=True, max_size_mb=5
+)
+extractor_registry.register(
+    'txt', 'TXT', ['txt'], 'services.file_processor:FileProcessor.iter_txt_chunks',
+    textual=True
+)
@@ -0,0 +1,332 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+This file holds analyses that couldn't be written to SQLite, until the database is back.
+
+Why We Need It:
+    When storing an analysis failed, app.py appended it to a plain dict. Nothing ever removed anything from it,
+    so a long database outage slowly used up memory, the history endpoints never looked at it (users didn't see
+    their results), and a restart lost all of it.
+
+How It Works:
+    Spill log: every analysis added here is first appended as one JSON line to an append-only file next to the
+        database (FALLBACK_LOG_PATH), so nothing is lost if the server restarts before SQLite recovers.
+        The log is capped at FALLBACK_LOG_MAX_MB. Once it's full, add() refuses new analyses (the request reports
+        them as not stored) rather than filling the disk. It's only ever read a line at a time, never whole.
+    Memory: the same analyses are kept in memory, grouped by session, so /api/history and /api/analysis can show them.
+        Once they take up more than FALLBACK_MAX_MB the least recently used sessions are dropped from memory.
+        They're still in the log, so they'll reach the database, they just don't show up until then.
+    Replay: a background thread (started by the first fallback write, or on startup if the log isn't empty)
+        tries every FALLBACK_REPLAY_INTERVAL seconds to write the log into SQLite. It reads the first
+        REPLAY_BATCH_SIZE lines, writes them in one transaction, cuts them off the front of the log and drops them
+        from memory, then does the next batch. A failed attempt has only read one batch, and the batches already
+        committed aren't written again. Analyses that are already stored are skipped, so replaying the same line
+        twice (e.g. after a crash during a replay) does no harm. The thread stops once the log is empty.
+    Clearing: discard() drops a session's analyses from memory and copies the log without its lines, so clearing
+        a session's history also clears what's waiting here (and a later replay can't bring it back). app.py holds
+        replay_paused() around the SQLite delete and the discard, so a replay can't write the session's analyses
+        in between.
+"""
+
+import collections
+import os
+import shutil
+import threading
+import time
+
+from services.serialization import RecordSerializer
+from services.sqlite_manager import sqlite_manager, SQLiteManager
+
+
+class FallbackStore:
+    # Memory-capped store for analyses SQLite couldn't take, backed by an append-only log
+
+    MAX_BYTES = int(float(os.environ.get('FALLBACK_MAX_MB', '16')) * 1024 * 1024)
+    MAX_LOG_BYTES = int(float(os.environ.get('FALLBACK_LOG_MAX_MB', '256')) * 1024 * 1024)
+    REPLAY_INTERVAL = float(os.environ.get('FALLBACK_REPLAY_INTERVAL', '30'))
+    REPLAY_BATCH_SIZE = 200
+
+    def __init__(self, manager, log_path=None, max_bytes=None, replay_interval=None, max_log_bytes=None):
+        self.manager = manager
+        self.log_path = log_path or os.environ.get('FALLBACK_LOG_PATH') or f"{manager.db_path}-fallback.log"
+        self.max_bytes = self.MAX_BYTES if max_bytes is None else max_bytes
+        self.max_log_bytes = self.MAX_LOG_BYTES if max_log_bytes is None else max_log_bytes
+        self.replay_interval = self.REPLAY_INTERVAL if replay_interval is None else replay_interval
+
+        # The log is always JSON lines, whatever format the database stores
+        self._serializer = RecordSerializer('json')
+        self._sessions = collections.OrderedDict()  # session_id -> [(analysis, size)], least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Held for a whole replay (reading the log through writing it to SQLite), see replay_paused()
+        self._replay_lock = threading.RLock()
+        self._thread = None
+        self._checked_log = False
+        self.stats = {
+            'added': 0, 'rejected': 0, 'replayed': 0, 'replay_failures': 0, 'evicted_sessions': 0, 'discarded': 0,
+            'bad_lines': 0, 'last_error': None
+        }
+        # Write-behind analyses that fail to commit come here too, the request has already reported them as stored
+        manager.set_write_failure_handler(self.add)
+
+    def add(self, session_id, analysis):
+        # Keep an analysis that couldn't be stored. Returns False if it couldn't be written to the log (or the log is full)
+        text = self._serializer.encode({'session_id': session_id, 'analysis': analysis}) + '\n'
+        line = text.encode('utf-8')
+        # Read back from the line, so memory holds exactly what a replay will write (datetimes as ISO strings)
+        entry = self._serializer.decode(text)
+        with self._lock:
+            try:
+                with open(self.log_path, 'a+b') as log:
+                    log_bytes = log.seek(0, os.SEEK_END)
+                    if log_bytes:
+                        # A line cut off by a crash would swallow this one, so end it first (replay skips it)
+                        log.seek(log_bytes - 1)
+                        if log.read(1) != b'\n':
+                            log.write(b'\n')
+                            log_bytes += 1
+                    if log_bytes + len(line) > self.max_log_bytes:
+                        print(f"Fallback store: {self.log_path} is full, analysis not kept")
+                        self.stats['rejected'] += 1
+                        self.stats['last_error'] = 'Fallback log is full'
+                        return False
+                    log.write(line)
+                    log.flush()
+                    os.fsync(log.fileno())
+            except OSError as e:
+                print(f"Fallback store could not write to {self.log_path}: {e}")
+                self.stats['last_error'] = str(e)
+                return False
+            self._remember(session_id, entry['analysis'], len(line))
+            self.stats['added'] += 1
+            self._checked_log = True
+        self._start_replay()
+        return True
+
+    def _remember(self, session_id, analysis, size):
+        # Caller holds the lock
+        self._sessions.setdefault(session_id, []).append((analysis, size))
+        self._sessions.move_to_end(session_id)
+        self._bytes += size
+        while self._bytes > self.max_bytes and len(self._sessions) > 1:
+            _, dropped = self._sessions.popitem(last=False)
+            self._bytes -= sum(size for _, size in dropped)
+            self.stats['evicted_sessions'] += 1
+
+    def start(self):
+        # Called on every request: the first time, picks up a log left over from before a restart
+        if self._checked_log:
+            return
+        with self._lock:
+            if self._checked_log:
+                return
+            self._checked_log = True
+            # A line at a time: memory stays within max_bytes however big the log is
+            pending = False
+            for raw, entry in self._iter_log():
+                if entry is not None:
+                    self._remember(entry[0], entry[1], len(raw))
+                    pending = True
+        if pending:
+            print(f"Fallback store: found analyses from before the restart in {self.log_path}, replaying them")
+            self._start_replay()
+
+    def _start_replay(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='fallback-replay', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        # Retry until the log has been written to SQLite
+        while True:
+            time_to_wait = self.replay_interval
+            if self.replay():
+                with self._lock:
+                    if not os.path.exists(self.log_path):
+                        self._thread = None
+                        return
+                time_to_wait = 0
+            time.sleep(time_to_wait)
+
+    def _iter_log(self):
+        # (line, (session_id, analysis)) for each line of the log in order, read one at a time. The entry is None
+        # for a line that can't be read. Caller holds the lock
+        try:
+            log = open(self.log_path, 'rb')
+        except FileNotFoundError:
+            return
+        with log:
+            for raw in log:
+                yield raw, self._decode_line(raw)
+
+    def _decode_line(self, raw):
+        if not raw.endswith(b'\n'):
+            # Cut off by a crash while it was being written, so add() never reported it as kept
+            return None
+        try:
+            entry = self._serializer.decode(raw.decode('utf-8'))
+            return entry['session_id'], entry['analysis']
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def _read_batch(self):
+        # The first REPLAY_BATCH_SIZE lines of the log: ([(session_id, analysis)], bytes they take up, unreadable lines).
+        # Caller holds the lock
+        batch, used, bad_lines = [], 0, 0
+        for raw, entry in self._iter_log():
+            used += len(raw)
+            if entry is None:
+                bad_lines += 1
+            else:
+                batch.append(entry)
+            if len(batch) + bad_lines >= self.REPLAY_BATCH_SIZE:
+                break
+        return batch, used, bad_lines
+
+    def _rewrite_log(self, keep_line, start=0):
+        # Copy the log from byte offset start into a new file, keeping the lines keep_line(raw) accepts,
+        # and put it in place of the log (removed if nothing is left). Caller holds the lock
+        temp_path = self.log_path + '.tmp'
+        with open(self.log_path, 'rb') as log, open(temp_path, 'wb') as rest:
+            log.seek(start)
+            if keep_line is None:
+                shutil.copyfileobj(log, rest)
+            else:
+                for raw in log:
+                    if keep_line(raw):
+                        rest.write(raw)
+            rest.flush()
+            os.fsync(rest.fileno())
+            kept = rest.tell()
+        if kept:
+            os.replace(temp_path, self.log_path)
+        else:
+            os.remove(temp_path)
+            os.remove(self.log_path)
+
+    def _forget(self, batch):
+        # Drop replayed analyses from memory. Caller holds the lock
+        replayed = collections.defaultdict(set)
+        for session_id, analysis in batch:
+            replayed[session_id].add(analysis.get('id'))
+        for session_id, ids in replayed.items():
+            if session_id not in self._sessions:
+                continue
+            kept = [(analysis, size) for analysis, size in self._sessions[session_id] if analysis.get('id') not in ids]
+            self._bytes -= sum(size for _, size in self._sessions[session_id]) - sum(size for _, size in kept)
+            if kept:
+                self._sessions[session_id] = kept
+            else:
+                del self._sessions[session_id]
+
+    def replay(self):
+        # Write the log into SQLite. Returns True if all of it was written (or there was nothing to write)
+        with self._replay_lock:
+            return self._replay()
+
+    def _replay(self):
+        replayed = 0
+        while True:
+            # Only replays and discard() remove lines, and both hold the replay lock, so the lines read here
+            # are still the first ones in the log when they're cut off below (add() only appends)
+            with self._lock:
+                batch, used, bad_lines = self._read_batch()
+            if not used:
+                break
+
+            try:
+                if batch:
+                    self.manager.add_analyses(batch)
+            except Exception as e:
+                with self._lock:
+                    self.stats['replay_failures'] += 1
+                    self.stats['last_error'] = str(e)
+                print(f"Fallback store: database still unavailable ({e}), retrying in {self.replay_interval:.0f}s")
+                if replayed:
+                    print(f"Fallback store: replayed {replayed} analyses into SQLite before that")
+                return False
+
+            with self._lock:
+                # Committed: cut the batch off the log, so it isn't read (or written) again
+                self._rewrite_log(None, start=used)
+                self._forget(batch)
+                self.stats['replayed'] += len(batch)
+                # Counted once they're dropped from the log, not on every retry
+                self.stats['bad_lines'] += bad_lines
+                self.stats['last_error'] = None
+            replayed += len(batch)
+
+        if replayed:
+            print(f"Fallback store: replayed {replayed} analyses into SQLite")
+        return True
+
+    def replay_paused(self):
+        """Hold this (with fallback_store.replay_paused(): ...) to keep replays from writing to SQLite meanwhile.
+        Waits for a replay that's already running to finish"""
+        return self._replay_lock
+
+    def discard(self, session_id):
+        """Drop a session's analyses from memory and from the log. Returns how many were dropped from the log"""
+        with self._replay_lock, self._lock:
+            analyses = self._sessions.pop(session_id, [])
+            self._bytes -= sum(size for _, size in analyses)
+
+            if not os.path.exists(self.log_path):
+                return 0
+            counts = {'discarded': 0, 'bad_lines': 0}
+
+            def keep_line(raw):
+                entry = self._decode_line(raw)
+                if entry is None:
+                    # Replay would skip it anyway
+                    counts['bad_lines'] += 1
+                    return False
+                if entry[0] == session_id:
+                    counts['discarded'] += 1
+                    return False
+                return True
+
+            self._rewrite_log(keep_line)
+            discarded = counts['discarded']
+            self.stats['discarded'] += discarded
+            self.stats['bad_lines'] += counts['bad_lines']
+        if discarded:
+            print(f"Fallback store: discarded {discarded} analyses of session {session_id}")
+        return discarded
+
+    def get_analyses(self, session_id):
+        """A session's analyses that aren't in SQLite yet, newest first (with datetimes, like SQLiteManager returns)"""
+        with self._lock:
+            if session_id not in self._sessions:
+                return []
+            self._sessions.move_to_end(session_id)
+            analyses = [analysis for analysis, _ in self._sessions[session_id]]
+        return [self._serializer.analysis_datetimes(analysis) for analysis in reversed(analyses)]
+
+    def get_summaries(self, session_id):
+        """The same without per-sentence details, for the history list"""
+        return [
+            {key: value for key, value in analysis.items() if key not in SQLiteManager.DETAIL_FIELDS}
+            for analysis in self.get_analyses(session_id)
+        ]
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({
+                'sessions': len(self._sessions),
+                'analyses': sum(len(analyses) for analyses in self._sessions.values()),
+                'memory_bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'max_log_bytes': self.max_log_bytes,
+                'log_bytes': os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0,
+                'replaying': self._thread is not None and self._thread.is_alive()
+            })
+        return stats
+
+
+# Create a global instance that other files can use (its log sits next to the sessions database)
+fallback_store = FallbackStore(sqlite_manager)
@@ -4,64 +4,177 @@ Year: 2025
 Authors: Meekaaeel Booley(BLYMEE001), Mubashir Dawood(DWDMUB001)
 
 This file handles all the file upload processing.
-It can read PDF, DOCX, and TXT files and extract the text content.
+It can read PDF, DOCX, ODT, RTF, HTML, Markdown and TXT files and extract the text content.
 
 The File Processing Pipeline:
     Validation: Checks if file is safe and supported.
-    Temporary Storage: Saves upload to a temp file (required by extraction libraries).
-    Text Extraction: Uses different libraries based on file type.
-    Cleanup: Always deletes temp files to avoid disk clutter.
+    Buffering: Uses the upload stream directly if it is seekable, otherwise copies it into a spooled buffer.
+    Format Detection: Sniffs the content to find out what the file really is (detect_format).
+    Text Extraction: Hands the buffer to that format's extractor from the registry (services/extractor_registry.py).
+    Cleanup: Closes any buffer we created.
 
 Supported File Types & How Theyre Handled:
-    PDF: Uses PyPDF2 to read each page and extract text.
-    DOCX: Uses python-docx to read paragraphs from Word documents.
-    TXT: Simple file reading with encoding fallback (UTF-8 to Latin-1)
+    PDF: Uses PyPDF2 to read each page and extract text. Pages are yielded one at a time (iter_pdf_pages),
+         and big PDFs can have their pages extracted by a process pool (PDF_EXTRACTION_WORKERS).
+    DOCX: Streams paragraphs straight out of the document XML (services/docx_extractor.py), including tables,
+          text boxes, footnotes, endnotes, headers and footers.
+    TXT: Decoded in 64KB chunks with encoding fallback (UTF-8 to Latin-1)
+    ODT, RTF, HTML, Markdown: Streaming extractors in services/document_extractors.py.
+    The registry decides which extractor reads a file, from its content rather than its name,
+    and imports each extractor the first time a file of that format comes in.
 
 Safety Features:
     File Type Whitelist: Only allows specific extensions, prevents executable uploads.
-    Size Limits: Prevents huge files that could crash our server
-    Temporary Files: Uploads are never permanently stored on server.
+    Content Check: A file has to actually be what its extension says (a .pdf has to start like a PDF),
+        binary junk under a text extension is rejected.
+    Size Limits: MAX_FILE_SIZE (MAX_UPLOAD_SIZE_MB env variable, default 20MB) is enforced while the upload
+        streams in: UploadBuffer counts bytes as the form parser writes them and stops as soon as the limit is passed.
+        Some formats declare a lower limit of their own in the registry (HTML and Markdown: 5MB).
+    Bounded Memory: UploadBuffer keeps the first SPOOL_THRESHOLD bytes in memory and spills the rest to disk,
+        and the extractors read from it incrementally, so a big upload doesn't mean a big process.
+    No Temporary Files: Uploads are never written to disk by us (except a spooled buffer above SPOOL_THRESHOLD).
 
 Key Technical Details:
-    empfile.mkstemp(): Creates secure temporary files with unique names.
+    File-like objects: PyPDF2.PdfReader and zipfile.ZipFile both accept any seekable binary stream, not just paths.
+    tempfile.SpooledTemporaryFile(): Keeps data in memory and only spills to disk above SPOOL_THRESHOLD.
     finally block: Ensures cleanup happens even if extraction fails
     Encoding fallback: Handles text files with different character encodings.
-    Chunked reading: Processes large files efficiently without loading everything into memory
 
-Why We Need Temporary Files:
-    The text extraction libraries (PyPDF2, python-docx) need actual files on disk to work with. We can't just pass them the uploaded file data directly.
+Why No Temporary Files:
+    We used to copy every upload to a tempfile.mkstemp() file, re-open it and delete it again, which is three
+    rounds of disk I/O per request. The extractors work just as well on the in-memory upload stream.
+    Every extract_text_from_* method still accepts a file path too (used by batch_score.py).
+
+Sandboxed Extraction:
+    PDF, DOCX and ODT parsing runs in a pool of worker processes with CPU time, memory and wall clock limits
+    (services/extraction_pool.py), so a pathological document can't stall the request threads.
+    Pages still stream back one at a time. A sandbox worker extracts its pages itself, PDF_EXTRACTION_WORKERS
+    only applies with the sandbox turned off (EXTRACTION_SANDBOX=0).
+
+Archives:
+    A ZIP of supported files can be uploaded instead of a single file (open_archive).
+    Members are read straight out of the archive in memory, nothing is unpacked to disk.
+    Zip bomb guards: at most MAX_ARCHIVE_MEMBERS documents, each no bigger than MAX_FILE_SIZE, and at most
+    MAX_ARCHIVE_UNCOMPRESSED_SIZE in total. These are checked against the sizes declared in the archive before
+    anything is decompressed, and reads are capped at those sizes so a lying header can't get past them.
+    Folders, hidden files (e.g. __MACOSX/) and unsupported types are skipped and reported, not treated as errors.
+
+Streaming:
+    stream_file() returns the text as an iterator of chunks (one per PDF page) instead of one string,
+    so TextAnalyser.analyse_stream can start scoring the first pages while later pages are still being extracted.
 """
 
+import codecs
+import concurrent.futures
+import contextlib
+import hashlib
+import io
+import multiprocessing
 import os
+import shutil
 import tempfile
+import threading
+import zipfile
 from typing import Tuple, Optional
-import PyPDF2  # Library for reading PDF files
-import docx    # Library for reading Word documents
-from contextlib import contextmanager
+
+from services.extractor_registry import extractor_registry
+
+# PyPDF2 (PDFs) and the other format readers are imported inside the methods that use them (or by the registry),
+# so importing this module (and the API) doesn't load them until the first file of that format comes in.
+
+
+def _extract_pdf_page_range(data, start, stop):
+    # Runs in a worker process: extract the text of pages [start, stop) from the PDF bytes.
+    # Module-level so it can be pickled for the process pool.
+    import PyPDF2
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return [reader.pages[idx].extract_text() or '' for idx in range(start, stop)]
+
+
+class FileTooLargeError(Exception):
+    # Raised while an upload is still streaming in, as soon as it passes MAX_FILE_SIZE.
+    # Deliberately not a ValueError: werkzeug's form parser silently swallows those.
+    pass
+
+
+class UploadBuffer(tempfile.SpooledTemporaryFile):
+    # Spooled buffer for one uploaded file: in memory up to spool_size bytes, then on disk.
+    # Refuses to grow past max_bytes, so oversized uploads are rejected before they're fully received.
+
+    # Also hashes the bytes as they arrive, so the analysis cache gets the digest for free.
+
+    def __init__(self, spool_size, max_bytes):
+        super().__init__(max_size=spool_size, mode='w+b')
+        self.max_bytes = max_bytes
+        self.bytes_written = 0
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        if self.bytes_written > self.max_bytes:
+            raise FileTooLargeError(f"File size exceeds maximum limit of {self.max_bytes // (1024 * 1024)}MB")
+        self.sha256.update(data)
+        return super().write(data)
+
 
 class FileProcessor:
     # This class is responsible for handling file uploads and text extraction
     
-    # What file types we allow users to upload
-    ALLOWED_EXTENSIONS = {'txt', 'pdf', 'docx'}
+    # What file types we allow users to upload: every extension in services/extractor_registry.py
     
-    # Maximum file size (500KB) to prevent huge uploads
-    MAX_FILE_SIZE = 500 * 1024  # 500kb
+    # Maximum file size to prevent huge uploads (theses and reports are often several MB)
+    MAX_FILE_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE_MB', '20')) * 1024 * 1024
+
+    # Uploads are buffered in memory up to this size, then spill to disk
+    SPOOL_THRESHOLD = 1024 * 1024  # 1MB
+
+    # Text files are decoded this many bytes at a time
+    TEXT_CHUNK_SIZE = 64 * 1024
+
+    # Parallel PDF extraction: number of worker processes (0 = extract pages in the calling thread).
+    # Only PDFs with at least PARALLEL_PDF_MIN_PAGES pages are fanned out, PDF_PAGES_PER_TASK pages per job.
+    PDF_EXTRACTION_WORKERS = int(os.environ.get('PDF_EXTRACTION_WORKERS', '0'))
+    PARALLEL_PDF_MIN_PAGES = 16
+    PDF_PAGES_PER_TASK = 4
+
+    # Archives of several documents can be uploaded in one go
+    ARCHIVE_EXTENSIONS = {'zip'}
+    MAX_ARCHIVE_MEMBERS = int(os.environ.get('ARCHIVE_MAX_MEMBERS', '50'))
+    MAX_ARCHIVE_UNCOMPRESSED_SIZE = int(os.environ.get('ARCHIVE_MAX_UNCOMPRESSED_MB', '100')) * 1024 * 1024
     
-    def __init__(self, upload_folder=None):
-        # Set where to temporarily store uploaded files
-        # If no folder specified, use system's temp directory
-        self.upload_folder = upload_folder or tempfile.gettempdir()
+    def __init__(self, sandbox=None):
+        # Extract formats marked sandboxed in the registry in worker processes (EXTRACTION_SANDBOX=0 turns it off)
+        if sandbox is None:
+            sandbox = os.environ.get('EXTRACTION_SANDBOX', '1') != '0'
+        self.sandbox = sandbox
+
+        # Process pool for parallel PDF extraction, created on first use
+        self._pdf_pool = None
+        self._pdf_pool_lock = threading.Lock()
         
     def allowed_file(self, filename):
         # Check if file extension is allowed
         # Returns True if file type is supported, False if not
+        return extractor_registry.get(self.file_extension(filename)) is not None
+
+    def file_extension(self, filename):
+        # The part after the last dot, lowercased ('' if there isn't one)
+        if not filename or '.' not in filename:
+            return ''
+        return filename.rsplit('.', 1)[1].lower()
+
+    def max_file_size(self, file_type):
+        # Size limit for a format: its own limit from the registry, never more than MAX_FILE_SIZE
+        document_format = extractor_registry.get(file_type)
+        if document_format is None or not document_format.max_size_mb:
+            return self.MAX_FILE_SIZE
+        return min(self.MAX_FILE_SIZE, document_format.max_size_mb * 1024 * 1024)
+
+    def is_archive(self, filename):
+        # Check if the upload is an archive of documents rather than a single document
         if not filename or '.' not in filename:
             return False
-        
-        # Get the file extension (the part after the last dot)
-        extension = filename.rsplit('.', 1)[1].lower()
-        return extension in self.ALLOWED_EXTENSIONS
+        return filename.rsplit('.', 1)[1].lower() in self.ARCHIVE_EXTENSIONS
 
     def validate_uploaded_file(self, file) -> Tuple[bool, Optional[str]]:
         # Basic file validation... checks if file is safe to process
@@ -72,120 +185,349 @@ class FileProcessor:
 
         # Check if file type is supported
         if not self.allowed_file(file.filename):
-            return False, "File type not supported. Please upload PDF, DOCX, or TXT files."
+            return False, f"File type not supported. Please upload {extractor_registry.describe()} files."
         
-        # Check file size to prevent huge uploads
-        file.stream.seek(0, 2)  # Seek to end to get file size
-        file_size = file.stream.tell()  # Get current position (which is file size)
-        file.stream.seek(0)  # Reset stream position to beginning for later reading
+        # Check file size to prevent huge uploads.
+        # Uploads parsed by the API arrive in an UploadBuffer, which already enforced the limit while streaming.
+        file_size = getattr(file.stream, 'bytes_written', None)
+        if file_size is None:
+            # Stream from another caller (scripts, tests): it's already seekable, so measuring it is cheap
+            file.stream.seek(0, 2)  # Seek to end to get file size
+            file_size = file.stream.tell()  # Get current position (which is file size)
+            file.stream.seek(0)  # Reset stream position to beginning for later reading
         
-        if file_size > self.MAX_FILE_SIZE:
-            return False, f"File size exceeds maximum limit of {self.MAX_FILE_SIZE // 1024}KB"
+        max_size = self.max_file_size(self.file_extension(file.filename))
+        if file_size > max_size:
+            return False, f"File size exceeds maximum limit of {max_size // (1024 * 1024)}MB"
         
         return True, file.filename  # File passed all checks!
 
-    def extract_text_from_pdf(self, file_path):
-        # Extract text from PDF file using PyPDF2 library
+    def detect_format(self, source, filename):
+        # Find out which format a document really is from its content (the extension only decides for text files).
+        # source is a file path or a seekable binary stream. Returns the format's name ('pdf', 'docx'...)
+        # Raises ValueError if the content doesn't match the extension or is too big for the format it turned out to be.
+        if isinstance(source, str):
+            with open(source, 'rb') as file:
+                return self.detect_format(file, filename)
+
+        document_format = extractor_registry.detect(source, self.file_extension(filename))
+
+        max_size = self.max_file_size(document_format.name)
+        size = getattr(source, 'bytes_written', None)
+        if size is None:
+            source.seek(0, 2)
+            size = source.tell()
+            source.seek(0)
+        if size > max_size:
+            raise ValueError(f"File size exceeds maximum limit of {max_size // (1024 * 1024)}MB")
+        return document_format.name
+
+    def _get_pdf_pool(self):
+        # Create the PDF extraction pool the first time a big PDF comes in
+        with self._pdf_pool_lock:
+            if self._pdf_pool is None:
+                # spawn, not fork: forking a multi-threaded Flask/torch process is asking for trouble
+                self._pdf_pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.PDF_EXTRACTION_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+            return self._pdf_pool
+
+    def iter_pdf_pages(self, source):
+        # Yield the text of each PDF page in order, as soon as it is available
+        # source can be a file path or a seekable binary file-like object
+        # Errors are raised, not swallowed: stopping early would look like the end of the document
+        # (and get cached as a complete result). The sandbox reports them as "Could not extract text".
+        import PyPDF2  # Library for reading PDF files
+        reader = PyPDF2.PdfReader(source)
+        page_count = len(reader.pages)
+
+        if self.PDF_EXTRACTION_WORKERS > 0 and page_count >= self.PARALLEL_PDF_MIN_PAGES:
+            # Big PDF: hand page ranges to the process pool. Each worker parses the PDF itself.
+            if isinstance(source, str):
+                with open(source, 'rb') as file:
+                    data = file.read()
+            else:
+                source.seek(0)
+                data = source.read()
+
+            pool = self._get_pdf_pool()
+            futures = [
+                pool.submit(_extract_pdf_page_range, data, start, min(start + self.PDF_PAGES_PER_TASK, page_count))
+                for start in range(0, page_count, self.PDF_PAGES_PER_TASK)
+            ]
+            # Yield in page order. Early ranges are usually done first, so we can start right away.
+            for future in futures:
+                for page_text in future.result():
+                    yield page_text
+            return
+
+        # Small PDF (or no pool): extract in this thread, one page at a time
+        for page in reader.pages:
+            yield page.extract_text() or ''
+
+    def iter_pdf_chunks(self, source):
+        # PDF extractor for the registry: one chunk per page, each ending with a newline
+        for page_text in self.iter_pdf_pages(source):
+            yield page_text + '\n'
+
+    def extract_text_from_pdf(self, source):
+        # Extract text from PDF using PyPDF2 library
+        # source can be a file path or a seekable binary file-like object
+        # Pages are joined with newlines in one go instead of repeated string concatenation
         try:
-            with open(file_path, 'rb') as file:  # 'rb' = read binary mode
-                reader = PyPDF2.PdfReader(file)
-                text = ''
-                # Go through each page and extract text
-                for page in reader.pages:
-                    text += page.extract_text() + '\n'  # Add newline between pages
-                return text.strip()  # Remove extra whitespace
+            return '\n'.join(self.iter_pdf_pages(source)).strip()
+        except MemoryError:
+            raise
         except Exception as e:
             print(f"Error extracting text from PDF: {e}")
             return ''  # Return empty string if extraction fails
 
-    def extract_text_from_docx(self, file_path):
-        # Extract text from DOCX (Word) file using python-docx library
+    def iter_docx_chunks(self, source):
+        # Yield the text of a DOCX file in chunks of whole paragraphs (about TEXT_CHUNK_SIZE characters each)
+        # source can be a file path or a seekable binary file-like object
+        from services.docx_extractor import docx_extractor
+
+        chunk = []
+        size = 0
+        for paragraph in docx_extractor.iter_paragraphs(source):
+            chunk.append(paragraph + '\n')
+            size += len(paragraph) + 1
+            if size >= self.TEXT_CHUNK_SIZE:
+                yield ''.join(chunk)
+                chunk = []
+                size = 0
+        if chunk:
+            yield ''.join(chunk)
+
+    def extract_text_from_docx(self, source):
+        # Extract text from DOCX (Word) file, including tables, text boxes, notes, headers and footers
+        # source can be a file path or a seekable binary file-like object
         try:
-            doc = docx.Document(file_path)
-            text = ''
-            # Read each paragraph in the document
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + '\n'
-            return text.strip()
+            return ''.join(self.iter_docx_chunks(source)).strip()
+        except MemoryError:
+            raise
         except Exception as e:
             print(f"Error extracting text from DOCX: {e}")
             return ''
 
-    def extract_text_from_txt(self, file_path):
-        # Extract text from TXT file... simplest case, just read the file
+    def _detect_text_encoding(self, source):
+        # Check whether a binary stream is valid UTF-8 without holding it all in memory.
+        # Returns 'utf-8', or 'latin-1' as the fallback (every byte is valid Latin-1).
+        decoder = codecs.getincrementaldecoder('utf-8')()
         try:
-            # First try UTF-8 encoding (most common)
-            with open(file_path, 'r', encoding='utf-8') as file:
-                return file.read().strip()
+            while True:
+                data = source.read(self.TEXT_CHUNK_SIZE)
+                if not data:
+                    decoder.decode(b'', final=True)
+                    return 'utf-8'
+                decoder.decode(data)
         except UnicodeDecodeError:
-            # If UTF-8 fails, try Latin-1 encoding (handles different character sets)
-            try:
-                with open(file_path, 'r', encoding='latin-1') as file:
-                    return file.read().strip()
-            except Exception as e:
-                print(f"Error extracting text from TXT: {e}")
-                return ''
+            return 'latin-1'
+
+    def iter_txt_chunks(self, source):
+        # Yield the decoded text of a TXT file in chunks
+        # source can be a file path or a seekable binary file-like object
+        if isinstance(source, str):
+            with open(source, 'rb') as file:
+                yield from self.iter_txt_chunks(file)
+            return
+
+        # First pass picks the encoding (UTF-8 first, most common), second pass decodes
+        source.seek(0)
+        encoding = self._detect_text_encoding(source)
+        source.seek(0)
+
+        # newline=None normalises Windows/old Mac line endings, even across chunk boundaries
+        reader = io.TextIOWrapper(source, encoding=encoding, newline=None)
+        try:
+            while True:
+                chunk = reader.read(self.TEXT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            # Don't let the wrapper close the underlying upload stream
+            reader.detach()
+
+    def extract_text_from_txt(self, source):
+        # Extract text from TXT file... simplest case, just decode the bytes
+        # source can be a file path or a seekable binary file-like object
+        try:
+            return ''.join(self.iter_txt_chunks(source)).strip()
         except Exception as e:
             print(f"Error extracting text from TXT: {e}")
             return ''
 
-    def process_file(self, uploaded_file, upload_folder=None):
-        # Main method: Process uploaded file and extract text
-        # This is the method that other parts of our app will call
-        
+    def _read_source(self, source):
+        # All bytes of a path or seekable stream (for handing a document to a sandbox worker)
+        if isinstance(source, str):
+            with open(source, 'rb') as file:
+                return file.read()
+        source.seek(0)
+        return source.read()
+
+    def iter_text(self, source, file_type):
+        # Yield the text of a document in chunks: one chunk per page for PDFs, about TEXT_CHUNK_SIZE for the rest.
+        # file_type is a format name from detect_format (an extension works too).
+        # Chunks end with a newline so joining them gives the same text as the extract_text_from_* methods.
+        document_format = extractor_registry.get(file_type)
+        if document_format is None:
+            # This shouldn't happen since we validated, but safety check
+            raise ValueError("Unsupported file type")
+
+        if self.sandbox and document_format.sandboxed:
+            # Parsers of complex formats run in a worker process with time and memory limits
+            from services.extraction_pool import extraction_pool
+            yield from extraction_pool.extract(self._read_source(source), document_format.name)
+        else:
+            yield from document_format.extractor()(self, source)
+
+    def extract_text(self, source, file_type):
+        # Whole text of a document as one string, extracted in this process. Returns '' if extraction fails
+        document_format = extractor_registry.get(file_type)
+        if document_format is None:
+            raise ValueError("Unsupported file type")
+        try:
+            return ''.join(document_format.extractor()(self, source)).strip()
+        except MemoryError:
+            raise
+        except Exception as e:
+            print(f"Error extracting text from {document_format.label}: {e}")
+            return ''
+
+    def content_digest(self, uploaded_file):
+        # SHA-256 of an uploaded file's bytes, used as the analysis cache key
+        stream = uploaded_file.stream
+        if isinstance(stream, UploadBuffer):
+            # Already hashed while the upload streamed in
+            return stream.sha256.hexdigest()
+
+        if not (hasattr(stream, 'seekable') and stream.seekable()):
+            return None
+        digest = hashlib.sha256()
+        stream.seek(0)
+        for block in iter(lambda: stream.read(self.TEXT_CHUNK_SIZE), b''):
+            digest.update(block)
+        stream.seek(0)
+        return digest.hexdigest()
+
+    def create_upload_buffer(self):
+        # Stream factory for the Flask request: where the form parser writes each uploaded file
+        return UploadBuffer(self.SPOOL_THRESHOLD, self.MAX_FILE_SIZE)
+
+    def _buffer_upload(self, stream):
+        # Get a seekable binary stream for the upload without touching disk if we can.
+        # Returns (buffer, owned): owned is True if we created the buffer and must close it.
+        try:
+            if stream.seekable():
+                # Werkzeug already gives us a seekable stream (in memory for small uploads)
+                stream.seek(0)
+                return stream, False
+        except (AttributeError, io.UnsupportedOperation):
+            pass
+
+        # Not seekable: copy it into memory, spilling to disk only above SPOOL_THRESHOLD
+        buffer = self.create_upload_buffer()
+        try:
+            shutil.copyfileobj(stream, buffer)
+        except FileTooLargeError:
+            buffer.close()
+            raise
+        buffer.seek(0)
+        return buffer, True
+
+    @contextlib.contextmanager
+    def open_archive(self, uploaded_file):
+        # Open an uploaded ZIP and decide which members to analyse. Used as a context manager:
+        #     with file_processor.open_archive(file) as (archive, members, skipped, filename): ...
+        # members are ZipInfo objects of supported documents, skipped lists {'filename', 'reason'} for the rest.
         if not uploaded_file or not uploaded_file.filename:
             raise ValueError("No file provided")
-        
-        # Step 1: Validate the uploaded file
+        if not self.is_archive(uploaded_file.filename):
+            raise ValueError("File type not supported. Please upload a ZIP archive.")
+
+        buffer, owned = self._buffer_upload(uploaded_file.stream)
+        try:
+            try:
+                archive = zipfile.ZipFile(buffer)
+            except zipfile.BadZipFile:
+                raise ValueError("Archive is not a valid ZIP file")
+
+            with archive:
+                members, skipped = self._select_archive_members(archive)
+                yield archive, members, skipped, uploaded_file.filename
+        finally:
+            # Close the buffer if we made one (this also deletes any spilled temp file)
+            if owned:
+                buffer.close()
+
+    def _select_archive_members(self, archive):
+        # Pick the documents to analyse and enforce the zip bomb limits on their declared sizes
+        members = []
+        skipped = []
+        total_size = 0
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            name = info.filename
+            parts = name.split('/')
+            if any(part.startswith('.') or part == '__MACOSX' for part in parts):
+                # Finder/Explorer metadata, not a submission
+                continue
+            if not self.allowed_file(parts[-1]):
+                skipped.append({'filename': name, 'reason': 'File type not supported'})
+                continue
+            max_size = self.max_file_size(self.file_extension(parts[-1]))
+            if info.file_size > max_size:
+                skipped.append({'filename': name, 'reason': f"File size exceeds maximum limit of {max_size // (1024 * 1024)}MB"})
+                continue
+            members.append(info)
+            total_size += info.file_size
+
+        if not members:
+            raise ValueError(f"Archive doesn't contain any {extractor_registry.describe()} files")
+        if len(members) > self.MAX_ARCHIVE_MEMBERS:
+            raise ValueError(f"Archive contains more than {self.MAX_ARCHIVE_MEMBERS} documents")
+        if total_size > self.MAX_ARCHIVE_UNCOMPRESSED_SIZE:
+            raise ValueError(f"Archive contents exceed {self.MAX_ARCHIVE_UNCOMPRESSED_SIZE // (1024 * 1024)}MB uncompressed")
+        return members, skipped
+
+    def read_archive_member(self, archive, info):
+        # Decompress one archive member into memory, never more than its declared (already checked) size.
+        # Safe to call from several threads at once, zipfile serialises access to the underlying file.
+        with archive.open(info) as member:
+            data = member.read(info.file_size + 1)
+        if len(data) > info.file_size:
+            raise ValueError("Archive member is larger than declared")
+        return data
+
+    def stream_file(self, uploaded_file):
+        # Main method: validate an uploaded file and return (chunk_iterator, filename).
+        # Validation happens straight away, extraction happens lazily as the iterator is consumed.
+
+        if not uploaded_file or not uploaded_file.filename:
+            raise ValueError("No file provided")
+
         is_valid, result = self.validate_uploaded_file(uploaded_file)
         if not is_valid:
-            raise ValueError(result)  # result contains the error message
-            
-        filename = result  # Now result is the filename since validation passed
-        file_extension = filename.rsplit('.', 1)[1].lower()  # Get file extension
-        
-        # Step 2: Create a temporary file to store the upload
-        # mkstemp creates a unique temporary file and returns a file descriptor and path. ChatGPT assisted me with the following line:
-        fd, file_path = tempfile.mkstemp(suffix=f'_{filename}', prefix='upload_')
-        
+            raise ValueError(result)
+
+        filename = result
+        buffer, owned = self._buffer_upload(uploaded_file.stream)
         try:
-            # Step 3: Save uploaded file to temporary location
-            # We need to do this because the extraction libraries need a file on disk
-            with os.fdopen(fd, 'wb') as temp_file:  # 'wb' = write binary mode
-                uploaded_file.stream.seek(0)  # Reset file pointer to beginning
-                chunk_size = 8192  # Read in 8KB chunks to handle large files efficiently
-                while True:
-                    chunk = uploaded_file.stream.read(chunk_size)
-                    if not chunk:  # No more data to read
-                        break
-                    temp_file.write(chunk)  # Write chunk to temporary file
-            
-            # Step 4: Extract text based on file extension
-            if file_extension == 'pdf':
-                text = self.extract_text_from_pdf(file_path)
-            elif file_extension == 'docx':
-                text = self.extract_text_from_docx(file_path)
-            elif file_extension == 'txt':
-                text = self.extract_text_from_txt(file_path)
-            else:
-                # This shouldn't happen since we validated, but safety check
-                raise ValueError("Unsupported file type")
-            
-            # Return the extracted text and original filename
-            return text, filename
-        
-        finally:
-            # Step 5: Clean up temporary file no matter what happens
-            # This 'finally' block runs even if there's an error above
+            # Sniffed now, so a mislabelled file is rejected before anything else happens
+            file_type = self.detect_format(buffer, filename)
+        except Exception:
+            if owned:
+                buffer.close()
+            raise
+
+        def chunks():
             try:
-                os.close(fd)  # Close the file descriptor
-            except OSError:
-                pass  # If it's already closed, that's fine
-            
-            # Delete the temporary file if it exists
-            if file_path and os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except Exception as e:
-                    print(f"Delete error for {file_path}: {e}")
-                    # Don't raise exception here... we don't want file deletion errors to interrupt the main functionality
\ No newline at end of file
+                yield from self.iter_text(buffer, file_type)
+            finally:
+                if owned:
+                    buffer.close()
+
+        return chunks(), filename
@@ -19,26 +19,35 @@ How the Model Works:
     -Processing: The neural network analyzes these numbers
     -Output: We get probabilities like: 80% AI, 20% Human for example
 
+Lazy Imports:
+    torch and transformers take seconds to import and a few hundred MB of memory, so they're imported
+    inside the methods that use them instead of at the top of this file. Importing this module is cheap;
+    the cost is only paid when an AIDetectionModel is actually created (TextAnalyser does that on first use).
+
 To run this model directly, without using a web server, use:
 
     python services/model.py
 
 """
 
-import torch
-import torch.nn.functional as F
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import hashlib
+import os
 
 class AIDetectionModel:
+    # This path is for the backend hosted on the AWS EC2 Instance (Virtual Machine):
+    # MODEL_PATH = "/home/ubuntu/aicd-backend/ai_detector_model"
+
+    # This path is for when the model is located on our machines.
+    # Updated path to reflect new structure
+    MODEL_PATH = "./ai_detector_model"  # Model files are in a folder at project root
+
     def __init__(self):
         # Initialize the AI detection model with the appropriate path
-        
-        # This path is for the backend hosted on the AWS EC2 Instance (Virtual Machine):
-        # self.model_path = "/home/ubuntu/aicd-backend/ai_detector_model"
-        
-        # This path is for when the model is located on our machines.
-        # Updated path to reflect new structure
-        self.model_path = "./ai_detector_model"  # Model files are in a folder at project root
+        # Heavy imports happen here, not at module level (see Lazy Imports above)
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+        self.model_path = self.MODEL_PATH
         
         # Load the tokenizer (converts text to numbers the model understands)
         self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
@@ -50,10 +59,34 @@ class AIDetectionModel:
         self.device = torch.device("cpu")
         self.model.to(self.device)  # Move model to CPU
         self.model.eval()  # Set model to evaluation mode (not training mode)
+
+        # Identifies these weights, so cached results from a different model are never reused
+        self.model_version = self.compute_model_version(self.model_path)
+
+    @staticmethod
+    def compute_model_version(model_path):
+        # Fingerprint the model folder: full config files plus the name and size of every file.
+        # Hashing the weights themselves (hundreds of MB) would slow down every startup.
+        # MODEL_VERSION can be set to pin it explicitly instead.
+        if os.environ.get('MODEL_VERSION'):
+            return os.environ['MODEL_VERSION']
+
+        digest = hashlib.sha256()
+        for name in sorted(os.listdir(model_path)):
+            path = os.path.join(model_path, name)
+            if not os.path.isfile(path):
+                continue
+            digest.update(f"{name}:{os.path.getsize(path)}\n".encode('utf-8'))
+            if name.endswith('.json'):
+                with open(path, 'rb') as file:
+                    digest.update(file.read())
+        return digest.hexdigest()[:16]
     
     def predict(self, text):
         # Predict whether text is AI-generated or human-written
         # Returns a dictionary with probabilities and confidence
+        import torch  # Already loaded by __init__, this is just a lookup
+        import torch.nn.functional as F
         
         # Convert text into numbers (tokens) that the model can process
         inputs = self.tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=512)
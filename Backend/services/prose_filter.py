@@ -0,0 +1,249 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+This file filters out text that isn't prose before it reaches the AI model.
+
+Why We Need It:
+    Text extracted from PDFs (especially student papers) is full of fragments that aren't sentences:
+    page numbers, running headers, reference lists, URLs and tables of numbers.
+    Every fragment costs a model call and the model's opinion on "Page 3 of 12" just skews the overall score.
+
+How It Works:
+    The text is checked line by line with cheap heuristics and a set of precompiled regex patterns:
+        page_number: "12", "Page 3", "3 of 12"
+        running_header: short lines that repeat on many pages (digits ignored, so "Thesis - 4" matches "Thesis - 5")
+        references: everything after a "References" / "Bibliography" heading up to the next section heading
+            (e.g. "Appendix A", or a short title line after a blank line), plus citation-looking lines
+        url: lines that are mostly links
+        numeric: table rows, lines that are mostly digits and symbols. Judged in context, since wrapped PDF text
+            can leave a line like "by 12.5% to 3,400 in 2021." that is the end of a sentence: only skipped when
+            the line before it finished a sentence and a neighbouring line isn't prose either (another row,
+            a blank line, or a skipped line)
+    Skipped lines are blanked out with spaces instead of removed, so the character offsets of the remaining
+    sentences still point into the original extracted text.
+
+Skipped segments are reported back (reason, offset, length and a short preview) so nothing disappears silently.
+
+Streaming:
+    filter_stream() does the same thing for text that arrives in chunks (e.g. PDF pages).
+    Running headers are then only recognised from their HEADER_MIN_REPEATS-th appearance onwards,
+    since we can't count lines on pages we haven't seen yet.
+    The last line of each chunk is held back until the next chunk arrives, so the numeric rule can see the line after it.
+"""
+
+import re
+from collections import Counter
+
+
+class ProseFilter:
+    # Classifies lines of extracted text as prose or non-prose
+
+    # Lines repeated at least this many times (and short enough) are treated as running headers/footers
+    HEADER_MIN_REPEATS = 3
+    HEADER_MAX_LENGTH = 100
+
+    # A line needs at least this share of letters (among non-space characters) to count as prose
+    MIN_LETTER_RATIO = 0.5
+
+    # Limit how many individual segments are listed in the response
+    MAX_REPORTED_SEGMENTS = 20
+
+    PAGE_NUMBER_PATTERN = re.compile(r'^\s*(?:page\s+)?[-–]?\s*\d{1,4}\s*[-–]?(?:\s*(?:of|/)\s*\d{1,4})?\s*$', re.IGNORECASE)
+    REFERENCES_HEADING_PATTERN = re.compile(r'^\s*(?:\d+\.?\s*)?(?:references|bibliography|works cited|reference list|sources)\s*:?\s*$', re.IGNORECASE)
+    # Ends a reference list: a short capitalised title (letters only, optionally numbered), which only counts
+    # after a blank line or when numbered, so a wrapped reference like "Press" doesn't end the list.
+    # Headings that usually come after the references count anywhere
+    SECTION_HEADING_PATTERN = re.compile(r'^\s*(?:\d+(?:\.\d+)*\.?\s+|[IVX]+\.\s+)?[A-Z][A-Za-z\'\-]*(?:\s+[A-Za-z][A-Za-z\'\-]*){0,7}\s*:?\s*$')
+    NUMBERED_HEADING_PATTERN = re.compile(r'^\s*(?:\d+(?:\.\d+)*\.?|[IVX]+\.)\s+[A-Z]')
+    AFTER_REFERENCES_PATTERN = re.compile(
+        r'^\s*(?:\d+(?:\.\d+)*\.?\s+)?(?:appendix|appendices|acknowledge?ments?|supplementary|about the authors?)\b',
+        re.IGNORECASE
+    )
+    CITATION_PATTERN = re.compile(
+        r'^\s*(?:\[\d+\]|\d+\.\s+[A-Z][\w\-]+,\s+[A-Z]\.)'      # [12] ... or 12. Smith, J.
+        r'|^\s*[A-Z][\w\-]+,\s+(?:[A-Z]\.\s*)+.*\(\d{4}[a-z]?\)'  # Smith, J. A. (2020)
+        r'|\bdoi:\s*10\.\d{4,}|\bdoi\.org/10\.\d{4,}'
+    )
+    URL_PATTERN = re.compile(r'(?:https?://|www\.)\S+', re.IGNORECASE)
+    # A line that finishes a sentence (closing quotes and brackets allowed after the punctuation)
+    SENTENCE_END_PATTERN = re.compile(r'[.!?:;][\'"\u2019\u201d)\]]*\s*$')
+    DIGIT_PATTERN = re.compile(r'\d')
+
+    def filter_text(self, text):
+        # Blank out non-prose lines. Returns (filtered_text, report)
+        # filtered_text has the same length as text, so offsets stay valid
+        lines = text.splitlines(keepends=True)
+        state = self._new_state(self._count_repeated_lines(lines), count_online=False)
+        filtered = self._filter_lines(lines, state)
+        return filtered, self._build_report(state['segments'])
+
+    def filter_stream(self, chunks, report):
+        # Streaming version of filter_text: yields filtered chunks as they come in.
+        # The report dict is filled in once the stream is exhausted.
+        state = self._new_state(Counter(), count_online=True)
+        carry = []
+        for chunk in chunks:
+            lines = (''.join(carry) + chunk).splitlines(keepends=True)
+            # Hold back an unfinished last line until we see the rest of it,
+            # and the last finished line until we see the line after it
+            held = 1 if lines and not lines[-1].endswith(('\n', '\r')) else 0
+            held = min(len(lines), held + 1)
+            carry = lines[len(lines) - held:]
+            lines = lines[:len(lines) - held]
+            if lines:
+                yield self._filter_lines(lines, state, next_line=carry[0])
+        if carry:
+            yield self._filter_lines(carry, state)
+        report.update(self._build_report(state['segments']))
+
+    def _new_state(self, header_counts, count_online):
+        # Filtering state carried from line to line (and chunk to chunk when streaming)
+        return {
+            'offset': 0,
+            'in_references': False,
+            'after_blank': True,  # The previous line was empty (or there wasn't one)
+            'after_skipped': False,  # The previous line was blanked out
+            'after_numeric': False,  # The previous line was mostly numbers (whether it was blanked or not)
+            'sentence_open': False,  # The last prose line kept didn't finish its sentence
+            'segments': [],
+            'header_counts': header_counts,
+            'count_online': count_online
+        }
+
+    def _filter_lines(self, lines, state, next_line=None):
+        # Classify and blank lines, updating state. Returns the filtered text for these lines
+        # next_line is the line after the last of these, if it's already known (None at the end of the text)
+        kept = []
+        header_counts = state['header_counts']
+
+        for position, line in enumerate(lines):
+            content = line.rstrip('\r\n')
+            reason = None
+
+            if content.strip():
+                if state['count_online'] and len(content.strip()) <= self.HEADER_MAX_LENGTH:
+                    header_counts[self._header_key(content.strip())] += 1
+
+                if state['in_references'] and self._ends_references(content, state['after_blank']):
+                    state['in_references'] = False
+
+                if state['in_references']:
+                    reason = 'references'
+                elif self.REFERENCES_HEADING_PATTERN.match(content):
+                    state['in_references'] = True
+                    reason = 'references'
+                else:
+                    reason = self.classify_line(content, header_counts)
+
+                numeric = self.is_numeric_line(content)
+                if reason is None and numeric:
+                    following = lines[position + 1] if position + 1 < len(lines) else next_line
+                    if self._in_table(state, following, header_counts):
+                        reason = 'numeric'
+
+                state['after_skipped'] = reason is not None
+                state['after_numeric'] = numeric
+                if reason is None:
+                    state['sentence_open'] = not self.SENTENCE_END_PATTERN.search(content)
+            else:
+                state['after_skipped'] = state['after_numeric'] = state['sentence_open'] = False
+            state['after_blank'] = not content.strip()
+
+            if reason:
+                state['segments'].append((reason, state['offset'], len(content), content.strip()))
+                # Same length as the original line, newline kept so paragraph breaks survive
+                kept.append(' ' * len(content) + line[len(content):])
+            else:
+                kept.append(line)
+            state['offset'] += len(line)
+
+        return ''.join(kept)
+
+    def classify_line(self, line, header_counts=None):
+        # Return why a line is not prose, or None if it looks like prose
+        stripped = line.strip()
+
+        if self.PAGE_NUMBER_PATTERN.match(stripped):
+            return 'page_number'
+
+        if header_counts and len(stripped) <= self.HEADER_MAX_LENGTH:
+            if header_counts.get(self._header_key(stripped), 0) >= self.HEADER_MIN_REPEATS:
+                return 'running_header'
+
+        if self.CITATION_PATTERN.search(stripped):
+            return 'references'
+
+        url_characters = sum(len(match) for match in self.URL_PATTERN.findall(stripped))
+        if url_characters and url_characters * 2 >= len(stripped.replace(' ', '')):
+            return 'url'
+
+        # Lines of numbers ('numeric') depend on the lines around them, see _in_table
+        return None
+
+    def is_numeric_line(self, line):
+        # Mostly digits and symbols across several numbers, e.g. a table row "12.4  45%  3,200".
+        # A lone "2019)." at the end of a wrapped sentence doesn't count.
+        stripped = line.strip()
+        non_space = [char for char in stripped if not char.isspace()]
+        if not non_space:
+            return False
+        letters = sum(1 for char in non_space if char.isalpha())
+        numbers = sum(1 for token in stripped.split() if self.DIGIT_PATTERN.search(token))
+        return numbers >= 2 and letters / len(non_space) < self.MIN_LETTER_RATIO
+
+    def _in_table(self, state, following, header_counts):
+        # Whether a numeric line is a table row rather than the wrapped end of a sentence ("by 12.5% to 3,400 in 2021.").
+        # The sentence before it has to be finished (or the line before it is another row)...
+        if state['sentence_open'] and not state['after_numeric']:
+            return False
+        # ...and a line next to it has to be non-prose too: another row, a blank or skipped line, or the end of the text
+        if state['after_numeric'] or state['after_blank'] or state['after_skipped'] or following is None:
+            return True
+        following = following.rstrip('\r\n')
+        return (not following.strip() or self.is_numeric_line(following)
+                or self.classify_line(following, header_counts) is not None)
+
+    def _ends_references(self, line, after_blank):
+        # Whether a line inside a reference list is the heading of the next section
+        if self.AFTER_REFERENCES_PATTERN.match(line):
+            return True
+        if self.REFERENCES_HEADING_PATTERN.match(line) or not self.SECTION_HEADING_PATTERN.match(line):
+            return False
+        return after_blank or bool(self.NUMBERED_HEADING_PATTERN.match(line))
+
+    def _header_key(self, line):
+        # Normalise a line for header detection: digits ignored, case and spacing ignored
+        return self.DIGIT_PATTERN.sub('#', ' '.join(line.lower().split()))
+
+    def _count_repeated_lines(self, lines):
+        # Count how often each short line appears (after normalisation)
+        counts = Counter()
+        for line in lines:
+            stripped = line.strip()
+            if stripped and len(stripped) <= self.HEADER_MAX_LENGTH:
+                counts[self._header_key(stripped)] += 1
+        return counts
+
+    def _build_report(self, segments):
+        # Summarise skipped segments for the API response
+        by_reason = Counter(reason for reason, _, _, _ in segments)
+        return {
+            'count': len(segments),
+            'characters': sum(length for _, _, length, _ in segments),
+            'by_reason': dict(by_reason),
+            'segments': [
+                {
+                    'reason': reason,
+                    'offset': offset,
+                    'length': length,
+                    'preview': content[:80] + ('...' if len(content) > 80 else '')
+                }
+                for reason, offset, length, content in segments[:self.MAX_REPORTED_SEGMENTS]
+            ]
+        }
+
+
+# Create a global instance that other files can use
+prose_filter = ProseFilter()
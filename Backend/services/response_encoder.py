@@ -0,0 +1,161 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+This file builds the optional compact response format for /api/detect and handles
+content negotiation and compression of API responses.
+
+Why a Compact Format:
+    The default response repeats each sentence as 'sentence' and 'sentence_preview' inside a dict per sentence.
+    For long documents most of the payload is text the client already has, so serialising it is wasted work.
+
+The Compact Format:
+    No echoed text: only offsets and lengths into the submitted text are returned.
+    Columnar arrays: one array per field instead of one dict per sentence, e.g.
+        "sentences": {"offset": [0, 58], "length": [57, 61], "ai_probability": [0.91, 0.12], "confidence": [0.91, 0.88]}
+    human_probability and classification are left out since they follow from ai_probability (1 - p and p > 0.5).
+    Sentences that failed analysis have null probabilities.
+
+How a Client Asks For It:
+    Accept: application/vnd.aicd.compact+json   -> compact JSON
+    Accept: application/msgpack                 -> compact MessagePack (only if msgpack is installed)
+    ?format=compact / ?format=msgpack           -> same thing, for clients that can't set headers
+    Anything else (including */*) keeps the original JSON response so the frontend is unaffected.
+    ?format=msgpack without msgpack installed raises FormatNotAvailableError (app.py answers 406) rather than
+    quietly sending JSON to a client that asked for MessagePack by name. In the Accept header it's just not offered.
+
+Compression:
+    Responses above COMPRESSION_MIN_SIZE are compressed with brotli (if installed) or gzip,
+    depending on what the client lists in Accept-Encoding.
+"""
+
+import gzip
+import json
+
+try:
+    import msgpack  # Optional: binary encoding for the compact format
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli  # Optional: better compression ratio than gzip
+except ImportError:
+    brotli = None
+
+
+class FormatNotAvailableError(Exception):
+    # The client asked for a format by name (?format=) that this server can't produce
+    pass
+
+
+class ResponseEncoder:
+    # Handles choosing, building and compressing response bodies
+
+    JSON_MIMETYPE = 'application/json'
+    COMPACT_JSON_MIMETYPE = 'application/vnd.aicd.compact+json'
+    MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+    # Don't bother compressing small responses, the headers cost more than we'd save
+    COMPRESSION_MIN_SIZE = 1024
+    GZIP_LEVEL = 6
+    BROTLI_QUALITY = 5
+
+    # Probabilities in the compact format are rounded to this many decimals
+    COMPACT_PRECISION = 4
+
+    def negotiate_format(self, accept_mimetypes, format_param=None):
+        # Decide which format to respond with: 'json', 'compact_json' or 'msgpack'
+        # An explicit ?format= query parameter wins over the Accept header
+        if format_param:
+            format_param = format_param.lower()
+            if format_param == 'msgpack':
+                if msgpack is None:
+                    raise FormatNotAvailableError('format=msgpack is not available on this server (msgpack is not installed)')
+                return 'msgpack'
+            if format_param == 'compact':
+                return 'compact_json'
+            return 'json'
+
+        offered = [self.JSON_MIMETYPE, self.COMPACT_JSON_MIMETYPE]
+        if msgpack is not None:
+            offered.extend(self.MSGPACK_MIMETYPES)
+
+        # Only switch formats if the client explicitly names one of ours.
+        # Wildcards (*/*) keep the original JSON response.
+        explicit = [mimetype for mimetype in offered if mimetype in accept_mimetypes.values()]
+        if not explicit:
+            return 'json'
+
+        best = accept_mimetypes.best_match(explicit, default=self.JSON_MIMETYPE)
+        if best == self.COMPACT_JSON_MIMETYPE:
+            return 'compact_json'
+        if best in self.MSGPACK_MIMETYPES:
+            return 'msgpack'
+        return 'json'
+
+    def to_compact(self, response_data):
+        # Convert a standard /api/detect response into the compact columnar form
+        compact = {key: value for key, value in response_data.items() if key != 'sentence_results'}
+        compact['format'] = 'compact'
+
+        sentence_results = response_data.get('sentence_results')
+        if sentence_results is None:
+            return compact
+
+        precision = self.COMPACT_PRECISION
+        offsets = []
+        lengths = []
+        ai_probabilities = []
+        confidences = []
+
+        for item in sentence_results:
+            offsets.append(item.get('offset'))
+            lengths.append(item.get('sentence_length'))
+            result = item.get('result')
+            if result:
+                ai_probabilities.append(round(result['ai_probability'], precision))
+                confidences.append(round(result['confidence'], precision))
+            else:
+                # Sentence failed analysis, keep the columns aligned
+                ai_probabilities.append(None)
+                confidences.append(None)
+
+        compact['sentences'] = {
+            'offset': offsets,
+            'length': lengths,
+            'ai_probability': ai_probabilities,
+            'confidence': confidences
+        }
+        return compact
+
+    def encode(self, payload, response_format):
+        # Serialise the payload. Returns (body_bytes, mimetype)
+        if response_format == 'msgpack':
+            return msgpack.packb(payload, use_bin_type=True, default=str), self.MSGPACK_MIMETYPES[0]
+
+        # separators without spaces... no pretty printing for machine clients
+        body = json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')
+        if response_format == 'compact_json':
+            return body, self.COMPACT_JSON_MIMETYPE
+        return body, self.JSON_MIMETYPE
+
+    def choose_encoding(self, accept_encodings):
+        # Pick the best compression the client supports, or None
+        if brotli is not None and accept_encodings['br']:
+            return 'br'
+        if accept_encodings['gzip']:
+            return 'gzip'
+        return None
+
+    def compress(self, body, encoding):
+        # Compress a response body with the given content encoding
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.BROTLI_QUALITY)
+        if encoding == 'gzip':
+            return gzip.compress(body, compresslevel=self.GZIP_LEVEL)
+        return body
+
+
+# Create a global instance that other files can use
+response_encoder = ResponseEncoder()
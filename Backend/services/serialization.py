@@ -0,0 +1,160 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+This file turns sessions and analyses into the blobs SQLiteManager stores, and back.
+
+Why We Need It:
+    SQLiteManager used to walk every record it wrote to turn datetimes into strings, and walk every record it read
+    calling datetime.fromisoformat on every string it found, including every sentence of every analysis.
+    On a session with a long history that walk took more time than the JSON itself.
+    It also guessed: any string that happened to parse as a date (a filename like "20240301", a sentence that
+    was just a date) came back as a datetime object instead of the text that was stored.
+
+How It Works:
+    Schema: we know which fields hold datetimes. SESSION_TIMESTAMPS on a session (created_at) and
+        ANALYSIS_TIMESTAMPS on an analysis (timestamp), both top-level fields. Only those are parsed when reading,
+        everything else comes back exactly as it was stored.
+    Writing: datetimes anywhere in a record are written as ISO strings by the encoder itself (a default hook),
+        so there's no separate pass over the record first.
+    Encoder: orjson if it's installed (several times faster than the json module for both dumps and loads),
+        otherwise the standard json module. Both write the same JSON, so either can read what the other stored.
+    Storage format (SQLITE_STORAGE_FORMAT):
+        json (default): JSON text, readable with any SQLite tool
+        msgpack: MessagePack blobs, smaller and quicker to decode (needs `pip install msgpack`, falls back to json)
+        Reading looks at what the column holds (TEXT is JSON, BLOB is MessagePack), so both kinds of rows can sit
+        in the same table and switching the setting only affects new writes.
+    Sentence details: an analysis's per-sentence results are most of its size and only read when someone opens
+        that analysis, so pack_details compresses them (zlib, level SQLITE_DETAILS_COMPRESSION) on top of the
+        storage format. The blob starts with one byte saying which format is inside (b'j' JSON, b'm' MessagePack),
+        so like the rows above, details written under either setting can be read.
+"""
+
+import datetime
+import json
+import os
+import zlib
+
+try:
+    import orjson  # Optional: much faster JSON encoding and decoding
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack  # Optional: compact binary storage format
+except ImportError:
+    msgpack = None
+
+
+class RecordSerializer:
+    # Encodes session and analysis records for storage, knowing which of their fields are datetimes
+
+    # Top-level fields that hold datetimes
+    SESSION_TIMESTAMPS = ('created_at',)
+    ANALYSIS_TIMESTAMPS = ('timestamp',)
+
+    STORAGE_FORMATS = ('json', 'msgpack')
+    STORAGE_FORMAT = os.environ.get('SQLITE_STORAGE_FORMAT', 'json').lower()
+
+    # zlib level for sentence details: 1 is fastest, 9 smallest
+    DETAILS_COMPRESSION = int(os.environ.get('SQLITE_DETAILS_COMPRESSION', '6'))
+
+    def __init__(self, storage_format=None, use_orjson=None):
+        storage_format = self.STORAGE_FORMAT if storage_format is None else storage_format
+        if storage_format not in self.STORAGE_FORMATS:
+            print(f"Unknown storage format '{storage_format}', using json")
+            storage_format = 'json'
+        if storage_format == 'msgpack' and msgpack is None:
+            print("msgpack is not installed, storing records as json")
+            storage_format = 'json'
+        self.storage_format = storage_format
+        # use_orjson=False forces the json module (the serialization benchmark compares both)
+        self.use_orjson = orjson is not None and use_orjson is not False
+
+    def _default(self, obj):
+        # Called by the encoders for values they can't write themselves
+        if isinstance(obj, (datetime.datetime, datetime.date)):
+            return obj.isoformat()
+        raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+    def encode(self, record):
+        """A record as a storage blob (str for JSON, bytes for MessagePack). Datetimes become ISO strings"""
+        if self.storage_format == 'msgpack':
+            return msgpack.packb(record, default=self._default, use_bin_type=True)
+        if self.use_orjson:
+            try:
+                return orjson.dumps(record, default=self._default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+            except TypeError:
+                # Something orjson can't write but json can (e.g. an integer over 64 bits)
+                pass
+        return json.dumps(record, default=self._default, separators=(',', ':'))
+
+    def decode(self, data):
+        """A stored blob back into plain values (datetimes are still ISO strings)"""
+        if isinstance(data, (bytes, memoryview)):
+            if msgpack is None:
+                raise ValueError('This record is stored as MessagePack, install msgpack to read it')
+            return msgpack.unpackb(data, raw=False, strict_map_key=False)
+        if self.use_orjson:
+            return orjson.loads(data)
+        return json.loads(data)
+
+    def pack_details(self, details):
+        """Sentence details as a compressed blob: a format byte, then the encoded record compressed with zlib"""
+        data = self.encode(details)
+        if isinstance(data, str):
+            return b'j' + zlib.compress(data.encode('utf-8'), self.DETAILS_COMPRESSION)
+        return b'm' + zlib.compress(data, self.DETAILS_COMPRESSION)
+
+    def unpack_details(self, blob):
+        """The details pack_details stored"""
+        blob = bytes(blob)
+        data = zlib.decompress(blob[1:])
+        if blob[:1] == b'm':
+            return self.decode(data)
+        # JSON is decoded from str, decode() takes bytes for MessagePack
+        return self.decode(data.decode('utf-8'))
+
+    def snapshot(self, record):
+        """A deep copy of a record as it will be stored (datetimes as ISO strings)"""
+        return self.decode(self.encode(record))
+
+    def timestamp_string(self, value):
+        """A datetime field as the ISO string it's stored (and indexed) as"""
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        return str(value)
+
+    def _with_datetimes(self, record, fields):
+        # Shallow copy with the datetime fields parsed, so records shared with the write-behind queue aren't changed
+        record = dict(record)
+        for field in fields:
+            value = record.get(field)
+            if isinstance(value, str):
+                try:
+                    record[field] = datetime.datetime.fromisoformat(value)
+                except ValueError:
+                    pass
+        return record
+
+    def analysis_datetimes(self, analysis):
+        return self._with_datetimes(analysis, self.ANALYSIS_TIMESTAMPS)
+
+    def session_datetimes(self, session_data):
+        """A session's datetime fields parsed, and those of its analyses if it has them"""
+        session_data = self._with_datetimes(session_data, self.SESSION_TIMESTAMPS)
+        if isinstance(session_data.get('analyses'), list):
+            session_data['analyses'] = [self.analysis_datetimes(analysis) for analysis in session_data['analyses']]
+        return session_data
+
+    def get_stats(self):
+        return {
+            'storage_format': self.storage_format,
+            'encoder': 'msgpack' if self.storage_format == 'msgpack' else ('orjson' if self.use_orjson else 'json'),
+            'details_compression': f'zlib-{self.DETAILS_COMPRESSION}'
+        }
+
+
+# Create a global instance that other files can use
+record_serializer = RecordSerializer()
@@ -0,0 +1,118 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+This file is a small in-process cache of session records, kept in front of SQLite by SQLiteManager.
+
+Why We Need It:
+    Every API request goes through ensure_session, which looks the session up in SQLite and parses its JSON,
+    even though the session rarely changes between two requests a few seconds apart.
+    With the cache a request that finds its session here doesn't touch the database at all.
+
+How It Works:
+    LRU: up to MAX_ENTRIES sessions (SESSION_CACHE_SIZE), the least recently used is dropped when it's full.
+        0 turns the cache off.
+    Read-through: get_or_load(key, loader) returns the cached value, or calls loader() (the SQLite read),
+        caches what it returns and returns it. None (no such session) isn't cached.
+    Write-through: when SQLiteManager changes a session it either updates the cached value in place (update)
+        or drops it (invalidate), right after the database write, so the cache never serves an older version.
+    Threads: one lock around the LRU. Loading happens outside the lock, so a slow read doesn't block other sessions.
+        If a session is changed while it's being loaded, that load is already out of date, so it isn't cached
+        (the next read loads it again) instead of overwriting the newer state.
+    Stats: hits, misses, hit rate, evictions, invalidations, reported by /api/health under database_session_cache.
+
+Cached values are shared between threads, so callers must copy them before changing anything.
+"""
+
+import collections
+import os
+import threading
+
+
+class SessionCache:
+    # Thread-safe LRU cache with read-through loading and write-through updates
+
+    MAX_ENTRIES = int(os.environ.get('SESSION_CACHE_SIZE', '1024'))
+
+    def __init__(self, max_entries=None):
+        self.max_entries = self.MAX_ENTRIES if max_entries is None else max_entries
+        self._entries = collections.OrderedDict()   # key -> value, least recently used first
+        self._loading = {}                          # key -> [loads in progress, changed since they started]
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'stale_loads': 0}
+
+    def get_or_load(self, key, loader):
+        # The cached value for key, or loader()'s result (cached unless it's None or went stale while loading)
+        if self.max_entries <= 0:
+            return loader()
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._entries[key]
+            self.stats['misses'] += 1
+            loading = self._loading.setdefault(key, [0, False])
+            loading[0] += 1
+
+        value = None
+        try:
+            value = loader()
+            return value
+        finally:
+            with self._lock:
+                loading[0] -= 1
+                if not loading[0]:
+                    del self._loading[key]
+                if loading[1]:
+                    self.stats['stale_loads'] += 1
+                elif value is not None:
+                    self._store(key, value)
+
+    def _store(self, key, value):
+        # Caller holds the lock
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _changed(self, key):
+        # Caller holds the lock. Loads of this key that are still running have read the old state
+        loading = self._loading.get(key)
+        if loading:
+            loading[1] = True
+
+    def update(self, key, change):
+        # Replace a cached value with change(value), after the database has been changed the same way
+        with self._lock:
+            self._changed(key)
+            if key in self._entries:
+                self._entries[key] = change(self._entries[key])
+
+    def invalidate(self, *keys):
+        # Drop these keys, after the database has been changed in a way update() can't follow
+        with self._lock:
+            for key in keys:
+                self._changed(key)
+                if self._entries.pop(key, None) is not None:
+                    self.stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            for key in self._loading:
+                self._changed(key)
+            self.stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'max_entries': self.max_entries,
+            'hit_rate': round(stats['hits'] / lookups, 3) if lookups else None
+        })
+        return stats
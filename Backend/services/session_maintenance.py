@@ -0,0 +1,165 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+This file is the background task that keeps sessions.db from growing forever.
+
+Why We Need It:
+    Nothing ever deleted a session. The session cookie is gone after a day, but its row and every analysis in it
+    stayed in sessions.db, and one session's history could grow without limit. On a server that runs for months
+    the database only ever got bigger.
+
+How It Works:
+    Expiry: sessions not used for SESSION_TTL_HOURS (24, like the session cookie) are deleted with their analyses.
+        "Used" means an analysis was added or the session made a request (ensure_session refreshes updated_at,
+        at most every few minutes).
+    History limit: a session keeps its newest SESSION_MAX_HISTORY analyses, older ones are deleted.
+        Only sessions that got new analyses since the last pass are checked (the first pass checks them all),
+        so a session can briefly go over the limit until the next pass.
+    Small batches: every delete is its own short transaction of at most MAINTENANCE_BATCH_SIZE rows, with a pause
+        between them, so requests waiting for the write lock never wait long. There's no big cleanup transaction.
+    Incremental vacuum: deleted rows leave free pages behind. PRAGMA incremental_vacuum hands them back to the
+        filesystem MAINTENANCE_VACUUM_PAGES at a time, so the file actually shrinks (only for databases created with
+        auto_vacuum=INCREMENTAL, which new ones are; `python migrate_sessions.py --compact` converts an old one).
+        A passive checkpoint afterwards moves the changes out of the -wal file, which is then cut back to
+        SQLITE_WAL_LIMIT_MB (it never waits for readers, so if some are busy the next pass catches up).
+    Schedule: a daemon thread runs a pass every MAINTENANCE_INTERVAL seconds, starting with the first request.
+    Metrics: rows reclaimed (totals and last pass), pages vacuumed, how long the last pass took, and the database size,
+        reported by /api/health under database_maintenance.
+"""
+
+import datetime
+import os
+import threading
+import time
+
+from services.sqlite_manager import sqlite_manager
+
+
+class SessionMaintenance:
+    # Expires old sessions, trims long histories and vacuums, in the background
+
+    ENABLED = os.environ.get('SESSION_MAINTENANCE', '1') != '0'
+    SESSION_TTL_HOURS = float(os.environ.get('SESSION_TTL_HOURS', '24'))   # 0 keeps sessions forever
+    MAX_HISTORY = int(os.environ.get('SESSION_MAX_HISTORY', '1000'))       # 0 keeps every analysis
+    INTERVAL = float(os.environ.get('MAINTENANCE_INTERVAL', '300'))
+    BATCH_SIZE = int(os.environ.get('MAINTENANCE_BATCH_SIZE', '500'))
+    VACUUM_PAGES = int(os.environ.get('MAINTENANCE_VACUUM_PAGES', '1000'))
+    BATCH_PAUSE = 0.01  # Seconds between batches, so waiting requests get the write lock
+
+    def __init__(self, manager, ttl_hours=None, max_history=None, interval=None, batch_size=None):
+        self.manager = manager
+        self.ttl_hours = self.SESSION_TTL_HOURS if ttl_hours is None else ttl_hours
+        self.max_history = self.MAX_HISTORY if max_history is None else max_history
+        self.interval = self.INTERVAL if interval is None else interval
+        self.batch_size = max(1, self.BATCH_SIZE if batch_size is None else batch_size)
+
+        self._first_pass = True
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.stats = {
+            'passes': 0, 'errors': 0, 'sessions_expired': 0, 'analyses_expired': 0, 'analyses_trimmed': 0,
+            'pages_vacuumed': 0, 'last_pass': None
+        }
+
+    def start(self):
+        # Start the background thread (once). Called on every request, so the common case is a quick check
+        if self._thread is not None or not self.ENABLED:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='session-maintenance', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        # A pass straight away, then one every interval
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                with self._lock:
+                    self.stats['errors'] += 1
+                print(f"Session maintenance pass failed: {e}")
+            self._stop.wait(self.interval)
+
+    def run_once(self):
+        # One maintenance pass. Returns what it reclaimed
+        start = time.perf_counter()
+        reclaimed = {'sessions_expired': 0, 'analyses_expired': 0, 'analyses_trimmed': 0, 'pages_vacuumed': 0}
+
+        if self.ttl_hours > 0:
+            # updated_at is stored in UTC
+            cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=self.ttl_hours)
+            while True:
+                sessions, analyses = self.manager.expire_sessions(cutoff, self.batch_size)
+                if not sessions and not analyses:
+                    break
+                reclaimed['sessions_expired'] += sessions
+                reclaimed['analyses_expired'] += analyses
+                time.sleep(self.BATCH_PAUSE)
+
+        if self.max_history > 0:
+            # Start tracking new analyses before the full check, so none slip through in between
+            grown = self.manager.take_grown_sessions()
+            if self._first_pass:
+                grown.update(self.manager.sessions_over_limit(self.max_history))
+            for session_id in grown:
+                while True:
+                    trimmed = self.manager.trim_history(session_id, self.max_history, self.batch_size)
+                    reclaimed['analyses_trimmed'] += trimmed
+                    if trimmed < self.batch_size:
+                        break
+                    time.sleep(self.BATCH_PAUSE)
+        self._first_pass = False
+
+        while True:
+            freed = self.manager.incremental_vacuum(self.VACUUM_PAGES)
+            reclaimed['pages_vacuumed'] += freed
+            if freed < self.VACUUM_PAGES:
+                break
+            time.sleep(self.BATCH_PAUSE)
+        if any(reclaimed.values()):
+            # Without a checkpoint the deletes and the vacuum only grow the -wal file
+            self.manager.checkpoint()
+
+        with self._lock:
+            self.stats['passes'] += 1
+            for key, value in reclaimed.items():
+                self.stats[key] += value
+            self.stats['last_pass'] = {
+                'finished_at': datetime.datetime.now().isoformat(),
+                'seconds': round(time.perf_counter() - start, 3),
+                **reclaimed
+            }
+        if any(reclaimed.values()):
+            print(f"Session maintenance: expired {reclaimed['sessions_expired']} sessions "
+                  f"({reclaimed['analyses_expired']} analyses), trimmed {reclaimed['analyses_trimmed']} analyses, "
+                  f"vacuumed {reclaimed['pages_vacuumed']} pages")
+        return reclaimed
+
+    def get_stats(self):
+        # Counters and database size for the health endpoint
+        with self._lock:
+            stats = dict(self.stats)
+        stats.update({
+            'enabled': self.ENABLED,
+            'running': self._thread is not None and self._thread.is_alive(),
+            'ttl_hours': self.ttl_hours,
+            'max_history': self.max_history,
+            'interval_seconds': self.interval
+        })
+        try:
+            stats['database'] = self.manager.get_storage_stats()
+        except Exception as e:
+            print(f"Error reading database size: {e}")
+            stats['database'] = None
+        return stats
+
+
+# Create a global instance that other files can use
+session_maintenance = SessionMaintenance(sqlite_manager)
@@ -3,18 +3,127 @@ CSC3003S Capstone Project - AI Content Detector
 Year: 2025
 Author: Meekaaeel Booley
 
+This file stores sessions and their analysis history in SQLite.
+
+Schema (SCHEMA_VERSION 4):
+    sessions: one row per session. session_data holds the session's own fields (created_at...) as JSON.
+    analyses: one row per analysis, with session_id, analysis_id, timestamp and the analysis as JSON, without its
+        per-sentence results (DETAIL_FIELDS), which is all the history list needs.
+        Indexed on (session_id, timestamp) for a session's history in order, and on analysis_id (unique).
+    analysis_details (version 4): the per-sentence results, compressed (RecordSerializer.pack_details),
+        keyed by the analysis's seq. A trigger deletes them with their analysis.
+
+Why Sentence Details Have Their Own Table:
+    The sentence results (every sentence's text, preview and scores) are most of an analysis, but only
+    get_analysis and get_session return them. While they sat in the analyses row, every row took several pages,
+    and the history page and expiry queries read past them. In their own table the analyses rows stay small,
+    only the two reads that return them ever decompress them, and they take a fraction of the space.
+
+History Pages:
+    get_history_page reads one page of a session's summaries, newest first, with keyset pagination:
+    the cursor is the (timestamp, seq) of the last row on the previous page, and the next page is the rows
+    just below it in the (session_id, timestamp) index. A page costs the same whether it's the first or the
+    hundredth, and however long the history is (unlike LIMIT/OFFSET, which walks past every skipped row).
+    A session's write-behind analyses are committed first (flush for that session only), so they page like any row.
+    Analyses that aren't in the table (still queued after that, or in the fallback store) are merged into every page
+    at (their timestamp, UNSTORED_SEQ), so the cursor steps through them too and total_analyses is the same on every page.
+
+Why Analyses Have Their Own Table:
+    Version 1 kept a session's whole history as one JSON list inside sessions.session_data, so adding an analysis
+    meant reading, parsing, appending to, re-serialising and rewriting every analysis the session ever had.
+    Writes got slower the longer a session was used. Now adding an analysis is a single INSERT, whatever the history size.
+
+Migration:
+    Older databases are converted the first time SQLiteManager opens them (SQLITE_AUTO_MIGRATE=0 turns that off),
+    or ahead of time with `python migrate_sessions.py sessions.db`. The schema version is kept in PRAGMA user_version.
+    Version 1: each history list is moved into the analyses table in its original order and removed from session_data.
+    Versions 2 and 3: each analysis's sentence details move to analysis_details and analysis_data keeps the rest.
+    The version 3 summary_data copy isn't needed any more and is cleared (rows that still have one use it until then).
+    All in one transaction, so an interrupted migration leaves the old data untouched.
+
+The methods still take and return whole session dicts ({'created_at': ..., 'analyses': [...]}),
+so callers didn't have to change.
+
+Connections come from the shared pool in services/sqlite_pool.py (WAL mode, kept open between requests,
+retried when the database is busy). Every write runs as one transaction through pool.run(..., write=True).
+
+Expiry and History Limits:
+    expire_sessions, trim_history and incremental_vacuum delete old data one small transaction at a time.
+    services/session_maintenance.py decides when and how much (SESSION_TTL_HOURS, SESSION_MAX_HISTORY).
+    updated_at is the last time a session was used: adding an analysis sets it, and so does get_session_info(touch=True)
+    if it's older than TOUCH_INTERVAL. It's indexed so expiry can find the oldest sessions.
+    It's always UTC in CURRENT_TIMESTAMP's format ('YYYY-MM-DD HH:MM:SS', see _db_timestamp), like the column default
+    writes, so the string comparisons against it (touch, expiry) don't depend on the server's time zone.
+
+Session Cache:
+    get_session_info (read by every request) is served from an in-process LRU cache (services/session_cache.py).
+    Every method that changes a session updates or drops its cached entry right after its write commits.
+    The cache only sees this process's writes, so it assumes one server process owns the database file
+    (SESSION_CACHE_SIZE=0 turns it off when several processes share one).
+
+Records are encoded and decoded by services/serialization.py, which only parses the fields that are datetimes
+(created_at, timestamp) back into datetimes and can store MessagePack blobs instead of JSON (SQLITE_STORAGE_FORMAT).
+
+Write-Behind (SQLITE_WRITE_BEHIND=1, off by default):
+    update_session_analyses only queues the analysis (services/write_behind.py) and returns, and a background
+    thread commits queued analyses in batches. get_session adds a session's still-queued analyses to what it reads,
+    so the history is complete straight away. Anything that replaces or deletes history (store_session,
+    clear_session_analyses, delete_session) first waits for the queue to drain, so it can't be undone by a late write.
 """
 
-import sqlite3
+import base64
 import json
 import datetime
 import os
+import threading
+import uuid
 from typing import Optional, Dict, Any, List
 
+from services.serialization import record_serializer
+from services.session_cache import SessionCache
+from services.sqlite_pool import get_pool
+from services.write_behind import WriteBehindQueue
+
 class SQLiteManager:
-    def __init__(self, db_path='sessions.db'):
+    # Current layout of the database (stored in PRAGMA user_version)
+    SCHEMA_VERSION = 4
+
+    # Per-sentence fields kept in analysis_details instead of the analyses row (the bulk of a long document's analysis)
+    DETAIL_FIELDS = ('sentence_analysis', 'skipped_segments')
+
+    # Convert older databases automatically when they're opened
+    AUTO_MIGRATE = os.environ.get('SQLITE_AUTO_MIGRATE', '1') != '0'
+
+    # Reading a session refreshes its updated_at (what expiry goes by) at most this often, in seconds,
+    # so an active session isn't written to on every request
+    TOUCH_INTERVAL = 300
+
+    # History position (seq) of an analysis that isn't in the table, above any real seq
+    UNSTORED_SEQ = 2 ** 62
+
+    # Rows read at a time while migrating, so a big database isn't loaded into memory at once
+    MIGRATION_CHUNK = 500
+
+    def __init__(self, db_path='sessions.db', auto_migrate=None, pool=None, write_behind=None, serializer=None,
+                 session_cache=None):
         self.db_path = db_path
         self.connected = True
+        self.auto_migrate = self.AUTO_MIGRATE if auto_migrate is None else auto_migrate
+        # Encodes records for storage and knows which of their fields are datetimes (services/serialization.py)
+        self._serializer = serializer or record_serializer
+        # Normally the shared pool for db_path, the storage benchmark passes its own
+        self._pool = pool
+        if write_behind is None:
+            write_behind = WriteBehindQueue.ENABLED
+        self._write_behind = WriteBehindQueue(self._commit_analyses) if write_behind else None
+        # Sessions that got new analyses since the maintenance task last asked (None until it first asks)
+        self._grown_sessions = None
+        self._grown_lock = threading.Lock()
+        # session_id -> (get_session_info result, updated_at), see services/session_cache.py.
+        # The load benchmark passes its own (e.g. SessionCache(0) to measure without it)
+        self._session_cache = session_cache or SessionCache()
+        # Whether rows from before version 4 (full analyses in analysis_data) may still be there, until migrated
+        self._legacy_rows = True
         self._init_db()
         print(f"SQLiteManager initialized with database: {db_path}")
     
@@ -22,86 +131,253 @@ class SQLiteManager:
         """Initialize database and tables"""
         try:
             os.makedirs(os.path.dirname(self.db_path) if os.path.dirname(self.db_path) else '.', exist_ok=True)
-            
-            conn = self._get_connection()
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS sessions (
-                    session_id TEXT PRIMARY KEY,
-                    session_data TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            conn.commit()
-            conn.close()
+            if self._pool is None:
+                self._pool = get_pool(self.db_path)
+            self._pool.run(self._create_tables, write=True)
+
+            version = self._pool.run(self._schema_version)
+            self._legacy_rows = version < self.SCHEMA_VERSION
+            if version < self.SCHEMA_VERSION:
+                if self.auto_migrate:
+                    stats = self._pool.run(self._migrate, write=True)
+                    self._legacy_rows = False
+                    if stats['analyses']:
+                        print(f"Migrated {stats['analyses']} analyses from {stats['sessions']} sessions to the analyses table")
+                    if stats['details']:
+                        print(f"Moved the sentence details of {stats['details']} analyses to analysis_details")
+                else:
+                    print(f"SQLite database is at schema version {version}, run migrate_sessions.py to upgrade it")
             print("SQLite database initialized successfully")
         except Exception as e:
             print(f"Error initializing SQLite database: {e}")
-    
-    def _get_connection(self):
-        """Get a new database connection"""
-        return sqlite3.connect(self.db_path)
+
+    def _create_tables(self, conn):
+        """Create the tables and indexes if they don't exist yet"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                session_data TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # seq keeps analyses with the same timestamp in the order they were added
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS analyses (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                analysis_id TEXT NOT NULL UNIQUE,
+                session_id TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                analysis_data TEXT NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_analyses_session_timestamp
+            ON analyses (session_id, timestamp)
+        ''')
+        # Expiry finds the least recently used sessions through this
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at)')
+        # Added in version 3, only used by rows stored before version 4 (NULL since).
+        # Created here rather than in _migrate so reads work even before the migration has run
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(analyses)')}
+        if 'summary_data' not in columns:
+            conn.execute('ALTER TABLE analyses ADD COLUMN summary_data TEXT')
+        # Version 4: compressed sentence details, one row per analysis that has any
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS analysis_details (
+                seq INTEGER PRIMARY KEY,
+                details BLOB NOT NULL
+            )
+        ''')
+        # Every way an analysis is deleted (clear, expiry, history limit...) takes its details with it
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS analyses_delete_details AFTER DELETE ON analyses
+            BEGIN
+                DELETE FROM analysis_details WHERE seq = OLD.seq;
+            END
+        ''')
+
+    def _schema_version(self, conn):
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+
+    def _migrate(self, conn):
+        """Upgrade an older database to the current schema (run as one transaction)"""
+        stats = {'sessions': 0, 'analyses': 0, 'duplicates': 0, 'details': 0}
+
+        # Version 1: move history lists out of sessions.session_data into the analyses table
+        rows = conn.execute('SELECT session_id, session_data FROM sessions').fetchall()
+        for session_id, session_data_json in rows:
+            try:
+                session_data = self._serializer.decode(session_data_json)
+            except ValueError:
+                print(f"Skipping session {session_id} during migration: session_data is not valid JSON")
+                continue
+            if not isinstance(session_data, dict) or 'analyses' not in session_data:
+                continue
+
+            analyses = session_data.pop('analyses') or []
+            for analysis in analyses:
+                if self._insert_analysis(conn, session_id, analysis):
+                    stats['analyses'] += 1
+                else:
+                    stats['duplicates'] += 1
+            conn.execute(
+                'UPDATE sessions SET session_data = ? WHERE session_id = ?',
+                (self._serializer.encode(session_data), session_id)
+            )
+            stats['sessions'] += 1
+
+        # Versions 2 and 3: move sentence details out of the analyses rows, a chunk at a time so a big
+        # database isn't all in memory. Rows written by this version already look right and are left alone
+        last_seq = 0
+        while True:
+            rows = conn.execute('''
+                SELECT seq, analysis_data, summary_data IS NOT NULL FROM analyses
+                WHERE seq > ? ORDER BY seq LIMIT ?
+            ''', (last_seq, self.MIGRATION_CHUNK)).fetchall()
+            if not rows:
+                break
+            last_seq = rows[-1][0]
+            for seq, analysis_data, has_summary in rows:
+                summary, details = self._split(self._serializer.decode(analysis_data))
+                if details:
+                    conn.execute(
+                        'INSERT OR REPLACE INTO analysis_details (seq, details) VALUES (?, ?)',
+                        (seq, self._serializer.pack_details(details))
+                    )
+                    stats['details'] += 1
+                if details or has_summary:
+                    conn.execute(
+                        'UPDATE analyses SET analysis_data = ?, summary_data = NULL WHERE seq = ?',
+                        (self._serializer.encode(summary), seq)
+                    )
+
+        conn.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+        return stats
+
+    def migrate(self) -> Dict[str, int]:
+        """Upgrade the database to the current schema. Returns counts of migrated sessions and analyses"""
+        def migrate(conn):
+            if self._schema_version(conn) >= self.SCHEMA_VERSION:
+                return {'sessions': 0, 'analyses': 0, 'duplicates': 0, 'details': 0}
+            return self._migrate(conn)
+        stats = self._pool.run(migrate, write=True)
+        self._legacy_rows = False
+        return stats
+
+    def _insert_analysis(self, conn, session_id, analysis):
+        """Insert one analysis row. Returns False if an analysis with the same ID is already stored"""
+        analysis_id = analysis.get('id') or str(uuid.uuid4())
+        timestamp = analysis.get('timestamp') or datetime.datetime.now()
+        summary, details = self._split(analysis)
+        cursor = conn.execute('''
+            INSERT OR IGNORE INTO analyses (analysis_id, session_id, timestamp, analysis_data)
+            VALUES (?, ?, ?, ?)
+        ''', (analysis_id, session_id, self._serializer.timestamp_string(timestamp), self._serializer.encode(summary)))
+        if cursor.rowcount and details:
+            conn.execute(
+                'INSERT INTO analysis_details (seq, details) VALUES (?, ?)',
+                (cursor.lastrowid, self._serializer.pack_details(details))
+            )
+        if self._grown_sessions is not None:
+            with self._grown_lock:
+                self._grown_sessions.add(session_id)
+        return cursor.rowcount > 0
+
+    def _db_timestamp(self, value: Optional[datetime.datetime] = None) -> str:
+        """A time (default now) as updated_at stores it: UTC, formatted like SQLite's CURRENT_TIMESTAMP.
+        Naive datetimes are taken to be UTC already"""
+        if value is None:
+            value = datetime.datetime.now(datetime.timezone.utc)
+        elif value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc)
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+
+    def _summarise(self, analysis):
+        """The analysis without its per-sentence details (what a history list shows)"""
+        return {key: value for key, value in analysis.items() if key not in self.DETAIL_FIELDS}
+
+    def _split(self, analysis):
+        """(the analysis without its per-sentence details, the details on their own)"""
+        details = {key: analysis[key] for key in self.DETAIL_FIELDS if key in analysis}
+        return self._summarise(analysis), details
+
+    def _join(self, analysis_data, details):
+        """A whole analysis from its analyses row and its analysis_details blob (None if it has none).
+        Rows stored before version 4 still have their details inline"""
+        analysis = self._serializer.decode(analysis_data)
+        if details is not None:
+            analysis.update(self._serializer.unpack_details(details))
+        return analysis
+
+    def _load_analyses(self, conn, session_id):
+        """All analyses of a session, oldest first (still with ISO strings for datetimes)"""
+        cursor = conn.execute('''
+            SELECT a.analysis_data, d.details FROM analyses a LEFT JOIN analysis_details d ON d.seq = a.seq
+            WHERE a.session_id = ? ORDER BY a.timestamp, a.seq
+        ''', (session_id,))
+        return [self._join(analysis_data, details) for analysis_data, details in cursor]
     
     def is_connected(self):
         return True
-    
-    def _convert_datetime_to_string(self, obj):
-        """Recursively convert datetime objects to ISO format strings"""
-        if isinstance(obj, dict):
-            return {k: self._convert_datetime_to_string(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [self._convert_datetime_to_string(item) for item in obj]
-        elif isinstance(obj, datetime.datetime):
-            return obj.isoformat()
-        else:
-            return obj
-    
-    def _convert_string_to_datetime(self, obj):
-        """Recursively convert ISO format strings back to datetime objects"""
-        if isinstance(obj, dict):
-            return {k: self._convert_string_to_datetime(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [self._convert_string_to_datetime(item) for item in obj]
-        elif isinstance(obj, str):
-            try:
-                return datetime.datetime.fromisoformat(obj)
-            except (ValueError, TypeError):
-                return obj
-        else:
-            return obj
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Connection pool counters (connections opened/reused, busy retries...) for /api/health"""
+        return self._pool.get_stats() if self._pool else {}
+
+    def get_session_cache_stats(self) -> Dict[str, Any]:
+        """Session cache hits, misses and size for /api/health"""
+        return self._session_cache.get_stats()
+
+    def get_write_behind_stats(self) -> Optional[Dict[str, Any]]:
+        """Write-behind queue counters for /api/health, None when it's off"""
+        return self._write_behind.get_stats() if self._write_behind else None
+
+    def set_write_failure_handler(self, handler) -> None:
+        """handler(session_id, analysis) gets write-behind analyses that couldn't be committed
+        (the fallback store registers itself here). Nothing to do when write-behind is off"""
+        if self._write_behind:
+            self._write_behind.on_failure = handler
+
+    def flush_writes(self, timeout: Optional[float] = None, session_id: Optional[str] = None) -> bool:
+        """Wait (up to WRITE_BEHIND_FLUSH_TIMEOUT by default) until every queued analysis is committed,
+        or only those of session_id"""
+        if not self._write_behind:
+            return True
+        return self._write_behind.flush(self._write_behind.FLUSH_TIMEOUT if timeout is None else timeout, session_id)
     
     def store_session(self, session_id: str, session_data: Dict[str, Any]) -> bool:
         """Save session data to SQLite with comprehensive debugging"""
         try:
             print(f"DEBUG STORE: Storing session {session_id}")
             
-            # Convert datetime objects to strings for JSON serialization
-            session_data_serializable = self._convert_datetime_to_string(session_data)
+            # The history goes in the analyses table, the rest of the session in session_data
+            session_fields = dict(session_data)
+            analyses = session_fields.pop('analyses', None)
             
             # Debug: check what we're storing
-            if 'analyses' in session_data_serializable:
-                print(f"DEBUG STORE: Storing {len(session_data_serializable['analyses'])} analyses")
-                if session_data_serializable['analyses']:
-                    print(f"DEBUG STORE: First analysis ID: {session_data_serializable['analyses'][0].get('id', 'No ID')}")
+            if analyses is not None:
+                print(f"DEBUG STORE: Storing {len(analyses)} analyses")
             
-            conn = self._get_connection()
-            conn.execute('''
-                INSERT OR REPLACE INTO sessions (session_id, session_data, updated_at)
-                VALUES (?, ?, ?)
-            ''', (session_id, json.dumps(session_data_serializable), datetime.datetime.now()))
-            conn.commit()
-            conn.close()
-            
-            # Verify storage worked
-            verified = self.get_session(session_id)
-            if verified:
-                print(f"DEBUG STORE: Successfully stored and verified session {session_id}")
-                if 'analyses' in verified:
-                    print(f"DEBUG STORE: Verified {len(verified['analyses'])} analyses in storage")
-                return True
-            else:
-                print(f"DEBUG STORE: Failed to verify storage for session {session_id}")
-                return False
+            def store(conn):
+                conn.execute('''
+                    INSERT INTO sessions (session_id, session_data, updated_at) VALUES (?, ?, ?)
+                    ON CONFLICT(session_id) DO UPDATE SET
+                        session_data = excluded.session_data,
+                        updated_at = excluded.updated_at
+                ''', (session_id, self._serializer.encode(session_fields), self._db_timestamp()))
+                if analyses is not None:
+                    # A whole session dict replaces the session's history
+                    conn.execute('DELETE FROM analyses WHERE session_id = ?', (session_id,))
+                    for analysis in analyses:
+                        self._insert_analysis(conn, session_id, analysis)
+            if analyses is not None:
+                self.flush_writes()
+            self._pool.run(store, write=True)
+            self._session_cache.invalidate(session_id)
+            # The transaction committed, so there's no need to read the session back to check
+            print(f"DEBUG STORE: Successfully stored session {session_id}")
+            return True
             
         except Exception as e:
             print(f"Error storing session in SQLite: {e}")
@@ -114,22 +390,32 @@ class SQLiteManager:
         try:
             print(f"DEBUG GET: Retrieving session {session_id}")
             
-            conn = self._get_connection()
-            cursor = conn.execute('SELECT session_data FROM sessions WHERE session_id = ?', (session_id,))
-            row = cursor.fetchone()
-            conn.close()
+            # Queued analyses are read first: one committed in between then shows up twice (skipped below)
+            # rather than not at all
+            pending = self._write_behind.pending(session_id) if self._write_behind else []
+
+            def load(conn):
+                row = conn.execute('SELECT session_data FROM sessions WHERE session_id = ?', (session_id,)).fetchone()
+                return row, (self._load_analyses(conn, session_id) if row else None)
+            row, analyses = self._pool.run(load)
+
+            session_data = self._serializer.decode(row[0]) if row else None
+            if pending:
+                if not row:
+                    # The analysis that creates this session is still queued
+                    session_data, analyses = {'created_at': pending[0]['timestamp']}, []
+                stored_ids = {analysis.get('id') for analysis in analyses}
+                analyses.extend(analysis for analysis in pending if analysis['id'] not in stored_ids)
             
-            if row:
-                session_data = json.loads(row[0])
-                converted_data = self._convert_string_to_datetime(session_data)
+            if session_data is not None:
+                session_data['analyses'] = analyses
+                # Only the known datetime fields are parsed, the rest comes back exactly as stored
+                converted_data = self._serializer.session_datetimes(session_data)
                 
                 # Debug: check what we retrieved
-                if 'analyses' in converted_data:
-                    print(f"DEBUG GET: Retrieved {len(converted_data['analyses'])} analyses for session {session_id}")
-                    if converted_data['analyses']:
-                        print(f"DEBUG GET: First analysis ID: {converted_data['analyses'][0].get('id', 'No ID')}")
-                else:
-                    print(f"DEBUG GET: No analyses key in session data for {session_id}")
+                print(f"DEBUG GET: Retrieved {len(converted_data['analyses'])} analyses for session {session_id}")
+                if converted_data['analyses']:
+                    print(f"DEBUG GET: First analysis ID: {converted_data['analyses'][0].get('id', 'No ID')}")
                 
                 return converted_data
             else:
@@ -142,38 +428,157 @@ class SQLiteManager:
             traceback.print_exc()
             return None
     
+    def get_session_info(self, session_id: str, touch: bool = False) -> Optional[Dict[str, Any]]:
+        """The session's own fields plus 'total_analyses', without loading any analyses (None if it doesn't exist).
+        touch=True counts this as activity, so the session doesn't expire while it's being used.
+        Served from the session cache when it can be"""
+        try:
+            cached = self._session_cache.get_or_load(session_id, lambda: self._load_session_info(session_id))
+            if cached is None:
+                return None
+            session_info, updated_at = cached
+
+            if touch and updated_at is not None:
+                now = datetime.datetime.now(datetime.timezone.utc)
+                if updated_at < self._db_timestamp(now - datetime.timedelta(seconds=self.TOUCH_INTERVAL)):
+                    updated_at = self._db_timestamp(now)
+                    self._pool.run(lambda conn: conn.execute(
+                        'UPDATE sessions SET updated_at = ? WHERE session_id = ?', (updated_at, session_id)
+                    ), write=True)
+                    self._session_cache.update(session_id, lambda entry: (entry[0], updated_at))
+
+            # The cached dict is shared, the caller gets its own copy
+            return dict(session_info)
+        except Exception as e:
+            print(f"Error getting session info from SQLite: {e}")
+            return None
+
+    def _load_session_info(self, session_id):
+        """(session info, updated_at) read from the database, None if there's no such session"""
+        pending = self._write_behind.pending(session_id) if self._write_behind else []
+
+        def load(conn):
+            row = conn.execute(
+                'SELECT session_data, updated_at FROM sessions WHERE session_id = ?', (session_id,)
+            ).fetchone()
+            if not row:
+                return None, 0, set()
+            # Counted from the (session_id, timestamp) index, the analyses themselves aren't read
+            total = conn.execute('SELECT COUNT(*) FROM analyses WHERE session_id = ?', (session_id,)).fetchone()[0]
+            return row, total, self._stored_ids(conn, pending)
+        row, total, stored_ids = self._pool.run(load)
+
+        if not row and not pending:
+            return None
+        session_info = self._serializer.decode(row[0]) if row else {'created_at': pending[0]['timestamp']}
+        session_info['total_analyses'] = total + sum(1 for analysis in pending if analysis['id'] not in stored_ids)
+        # A session that only exists in the write-behind queue has no updated_at to refresh yet
+        return self._serializer.session_datetimes(session_info), (str(row[1]) if row else None)
+
+    def _stored_ids(self, conn, analyses):
+        """Which of these (write-behind) analyses have been committed in the meantime"""
+        if not analyses:
+            return set()
+        ids = [analysis['id'] for analysis in analyses]
+        placeholders = ','.join('?' * len(ids))
+        cursor = conn.execute(f'SELECT analysis_id FROM analyses WHERE analysis_id IN ({placeholders})', ids)
+        return {row[0] for row in cursor}
+
+    def encode_cursor(self, timestamp: str, seq: int) -> str:
+        """Opaque history cursor for the row at (timestamp, seq)"""
+        return base64.urlsafe_b64encode(json.dumps([timestamp, seq]).encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, cursor: str):
+        """(timestamp, seq) from a history cursor. Raises ValueError if it isn't one of ours"""
+        try:
+            timestamp, seq = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except Exception:
+            raise ValueError('Invalid history cursor')
+        if not isinstance(timestamp, str) or not isinstance(seq, int):
+            raise ValueError('Invalid history cursor')
+        return timestamp, seq
+
+    def get_history_page(self, session_id: str, limit: int, cursor: Optional[str] = None,
+                         unstored: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """One page of a session's analysis summaries, newest first.
+        unstored: the session's analyses that aren't in SQLite (the fallback store's), paged along with the rest.
+        Returns {'analyses': [...], 'next_cursor': cursor for the next page or None, 'total_analyses': n}"""
+        position = self.decode_cursor(cursor) if cursor else None
+
+        # Wait for this session's queued analyses, so they have their place in the table like every other row.
+        # Whatever is still queued after that (the database is struggling) is paged like the unstored ones
+        if self._write_behind and self._write_behind.pending(session_id):
+            self.flush_writes(session_id=session_id)
+        extra = (self._write_behind.pending(session_id) if self._write_behind else []) + list(unstored or [])
+
+        def load(conn):
+            # analysis_data is already the summary, except in rows stored before version 4 was migrated
+            query = '''
+                SELECT seq, timestamp, COALESCE(summary_data, analysis_data) FROM analyses WHERE session_id = ?
+            '''
+            params = [session_id]
+            if position:
+                query += ' AND (timestamp, seq) < (?, ?)'
+                params.extend(position)
+            # One extra row tells us whether there's another page
+            query += ' ORDER BY timestamp DESC, seq DESC LIMIT ?'
+            params.append(limit + 1)
+            rows = conn.execute(query, params).fetchall()
+            total = conn.execute('SELECT COUNT(*) FROM analyses WHERE session_id = ?', (session_id,)).fetchone()[0]
+            return rows, total, self._stored_ids(conn, extra)
+        rows, total, stored_ids = self._pool.run(load)
+
+        entries = []
+        for seq, timestamp, summary_data in rows:
+            summary = self._serializer.decode(summary_data)
+            if self._legacy_rows:
+                # Version 2 rows are still the whole analysis
+                summary = self._summarise(summary)
+            entries.append((timestamp, seq, summary))
+
+        # Analyses that aren't in the table count on every page, and each gets a position the cursor can step past:
+        # its timestamp, above every stored row with the same timestamp
+        seen = set(stored_ids)
+        for analysis in extra:
+            if analysis.get('id') in seen:
+                continue
+            seen.add(analysis.get('id'))
+            total += 1
+            entry_position = (self._serializer.timestamp_string(analysis.get('timestamp')), self.UNSTORED_SEQ)
+            if not position or entry_position < tuple(position):
+                entries.append((*entry_position, self._summarise(analysis)))
+        entries.sort(key=lambda entry: (entry[0], entry[1]), reverse=True)
+
+        page = entries[:limit]
+        next_cursor = self.encode_cursor(page[-1][0], page[-1][1]) if len(entries) > limit else None
+        return {
+            'analyses': [self._serializer.analysis_datetimes(summary) for _, _, summary in page],
+            'next_cursor': next_cursor,
+            'total_analyses': total
+        }
+
     def update_session_analyses(self, session_id: str, analysis: Dict[str, Any]) -> bool:
-        """Add a new analysis to an existing session with comprehensive debugging"""
+        """Add a new analysis to a session (one INSERT, the existing history isn't read or rewritten)"""
         try:
             print(f"DEBUG UPDATE: Adding analysis to session {session_id}")
             print(f"DEBUG UPDATE: Analysis ID: {analysis.get('id', 'No ID')}")
-            
-            session_data = self.get_session(session_id)
-            
-            # If session doesn't exist, create a new one
-            if not session_data:
-                print(f"DEBUG UPDATE: Creating new session for {session_id}")
-                session_data = {
-                    'created_at': datetime.datetime.now(),
-                    'analyses': []
-                }
-            
-            # Make sure analyses list exists
-            if 'analyses' not in session_data:
-                print(f"DEBUG UPDATE: Initializing analyses list for {session_id}")
-                session_data['analyses'] = []
-            
-            print(f"DEBUG UPDATE: Current analyses count: {len(session_data['analyses'])}")
-            
-            # Add the new analysis to the list
-            session_data['analyses'].append(analysis)
-            print(f"DEBUG UPDATE: New analyses count: {len(session_data['analyses'])}")
-            
-            # Save updated session back to SQLite
-            result = self.store_session(session_id, session_data)
-            print(f"DEBUG UPDATE: Store session result: {result}")
-            
-            return result
+
+            if self._write_behind:
+                # Queue a serialisable copy with its ID and timestamp fixed now, so the caller can't change it
+                # and get_session can return it before it's written
+                queued = self._serializer.snapshot(analysis)
+                queued.setdefault('id', str(uuid.uuid4()))
+                queued.setdefault('timestamp', datetime.datetime.now().isoformat())
+                if self._write_behind.put(session_id, queued):
+                    # Already counted by get_session_info (it adds the session's pending analyses)
+                    self._session_cache.update(session_id, self._count_added)
+                    return True
+                print("DEBUG UPDATE: Write-behind queue full, writing synchronously")
+
+            updated_at = self._db_timestamp()
+            if self._pool.run(lambda conn: self._add_analysis(conn, session_id, analysis, updated_at), write=True):
+                self._session_cache.update(session_id, lambda entry: (self._count_added(entry)[0], updated_at))
+            return True
             
         except Exception as e:
             print(f"Error updating session analyses in SQLite: {e}")
@@ -181,28 +586,64 @@ class SQLiteManager:
             traceback.print_exc()
             return False
     
+    def _add_analysis(self, conn, session_id, analysis, updated_at):
+        """Add one analysis, creating the session if it doesn't exist yet. Returns False if it was already stored"""
+        conn.execute(
+            'INSERT OR IGNORE INTO sessions (session_id, session_data, updated_at) VALUES (?, ?, ?)',
+            (session_id, self._serializer.encode({'created_at': datetime.datetime.now()}), updated_at)
+        )
+        inserted = self._insert_analysis(conn, session_id, analysis)
+        if not inserted:
+            print(f"DEBUG UPDATE: Analysis {analysis.get('id')} was already stored")
+        conn.execute('UPDATE sessions SET updated_at = ? WHERE session_id = ?', (updated_at, session_id))
+        return inserted
+
+    def _count_added(self, entry):
+        """A cached (session info, updated_at) with one more analysis"""
+        session_info, updated_at = entry
+        return {**session_info, 'total_analyses': session_info['total_analyses'] + 1}, updated_at
+
+    def _commit_analyses(self, batch):
+        """Write a batch of queued (session_id, analysis) pairs in one transaction (write-behind thread)"""
+        updated_at = self._db_timestamp()
+
+        def add_all(conn):
+            for session_id, analysis in batch:
+                self._add_analysis(conn, session_id, analysis, updated_at)
+        self._pool.run(add_all, write=True)
+
+    def add_analyses(self, batch: List[tuple]) -> None:
+        """Store (session_id, analysis) pairs in one transaction, skipping any that are already stored (so it's safe
+        to repeat). Raises if the database can't take them, for the fallback store to retry later"""
+        self._commit_analyses(batch)
+        self._session_cache.invalidate(*{session_id for session_id, _ in batch})
+
     def clear_session_analyses(self, session_id: str) -> bool:
-        """Remove all analyses from a session"""
+        """Remove all analyses from a session (the session itself is kept)"""
         try:
-            session_data = self.get_session(session_id)
-            if session_data:
-                # Empty the analyses list but keep the session metadata
-                session_data['analyses'] = []
-                return self.store_session(session_id, session_data)
+            self.flush_writes()
+            self._pool.run(
+                lambda conn: conn.execute('DELETE FROM analyses WHERE session_id = ?', (session_id,)),
+                write=True
+            )
+            # Dropped rather than set to 0: a write-behind analysis queued during the clear still counts
+            self._session_cache.invalidate(session_id)
             return True
         except Exception as e:
             print(f"Error clearing session analyses in SQLite: {e}")
             return False
     
     def delete_session(self, session_id: str) -> bool:
-        """Completely remove a session from SQLite"""
+        """Completely remove a session and its analyses from SQLite"""
         try:
-            conn = self._get_connection()
-            cursor = conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
-            success = cursor.rowcount > 0
-            conn.commit()
-            conn.close()
-            return success
+            self.flush_writes()
+            def delete(conn):
+                conn.execute('DELETE FROM analyses WHERE session_id = ?', (session_id,))
+                cursor = conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+                return cursor.rowcount > 0
+            deleted = self._pool.run(delete, write=True)
+            self._session_cache.invalidate(session_id)
+            return deleted
         except Exception as e:
             print(f"Error deleting session from SQLite: {e}")
             return False
@@ -210,64 +651,137 @@ class SQLiteManager:
     def get_all_sessions(self) -> List[Dict[str, Any]]:
         """Get all sessions (mainly for debugging)"""
         try:
-            sessions = []
-            conn = self._get_connection()
-            cursor = conn.execute('SELECT session_id, session_data FROM sessions')
-            
-            for row in cursor.fetchall():
-                session_id, session_data_json = row
-                session_data = json.loads(session_data_json)
-                sessions.append({
-                    'session_id': session_id,
-                    'data': self._convert_string_to_datetime(session_data)
-                })
-            
-            conn.close()
-            return sessions
+            self.flush_writes()
+            def load_all(conn):
+                sessions = []
+                cursor = conn.execute('SELECT session_id, session_data FROM sessions')
+
+                for row in cursor.fetchall():
+                    session_id, session_data_json = row
+                    session_data = self._serializer.decode(session_data_json)
+                    session_data['analyses'] = self._load_analyses(conn, session_id)
+                    sessions.append({
+                        'session_id': session_id,
+                        'data': self._serializer.session_datetimes(session_data)
+                    })
+                return sessions
+            return self._pool.run(load_all)
         except Exception as e:
             print(f"Error getting all sessions from SQLite: {e}")
             return []
     
-    def store_analysis_result(self, analysis_id: str, result: Dict[str, Any]) -> bool:
-        """Store a single analysis result"""
-        try:
-            conn = self._get_connection()
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS analysis_results (
-                    analysis_id TEXT PRIMARY KEY,
-                    result_data TEXT NOT NULL,
-                    stored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            conn.execute(
-                'INSERT OR REPLACE INTO analysis_results (analysis_id, result_data) VALUES (?, ?)',
-                (analysis_id, json.dumps(result))
-            )
-            conn.commit()
-            conn.close()
-            return True
-        except Exception as e:
-            print(f"Error storing analysis result in SQLite: {e}")
-            return False
-    
-    def get_analysis_result(self, analysis_id: str) -> Optional[Dict[str, Any]]:
-        """Get a single analysis result"""
+    def get_analysis(self, session_id: str, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """One full analysis, only if it belongs to this session (None otherwise).
+        A lookup on the unique analysis_id index, so it costs the same however long the session's history is"""
         try:
-            conn = self._get_connection()
-            cursor = conn.execute(
-                'SELECT result_data FROM analysis_results WHERE analysis_id = ?', 
-                (analysis_id,)
-            )
-            row = cursor.fetchone()
-            conn.close()
-            
+            if self._write_behind:
+                for analysis in self._write_behind.pending(session_id):
+                    if analysis['id'] == analysis_id:
+                        return self._serializer.analysis_datetimes(analysis)
+
+            row = self._pool.run(lambda conn: conn.execute('''
+                SELECT a.analysis_data, d.details FROM analyses a LEFT JOIN analysis_details d ON d.seq = a.seq
+                WHERE a.analysis_id = ? AND a.session_id = ?
+            ''', (analysis_id, session_id)).fetchone())
+
             if row:
-                return json.loads(row[0])
+                return self._serializer.analysis_datetimes(self._join(*row))
             return None
         except Exception as e:
-            print(f"Error getting analysis result from SQLite: {e}")
+            print(f"Error getting analysis from SQLite: {e}")
             return None
 
+    def expire_sessions(self, cutoff: datetime.datetime, batch_size: int):
+        """Delete up to batch_size rows belonging to sessions not used since cutoff (timezone-aware, or naive UTC),
+        in one short transaction. A session's analyses go first and the session row once none are left.
+        Returns (sessions, analyses) deleted"""
+        cutoff = self._db_timestamp(cutoff)
+
+        def expire(conn):
+            ids = [row[0] for row in conn.execute(
+                'SELECT session_id FROM sessions WHERE updated_at < ? ORDER BY updated_at LIMIT ?', (cutoff, batch_size)
+            )]
+            if not ids:
+                return [], 0, 0
+            placeholders = ','.join('?' * len(ids))
+            analyses = conn.execute(f'''
+                DELETE FROM analyses WHERE seq IN (
+                    SELECT seq FROM analyses WHERE session_id IN ({placeholders}) LIMIT ?
+                )
+            ''', ids + [batch_size]).rowcount
+            sessions = 0
+            if analyses < batch_size:
+                sessions = conn.execute(f'DELETE FROM sessions WHERE session_id IN ({placeholders})', ids).rowcount
+            return ids, sessions, analyses
+        ids, sessions, analyses = self._pool.run(expire, write=True)
+        self._session_cache.invalidate(*ids)
+        return sessions, analyses
+
+    def trim_history(self, session_id: str, max_history: int, batch_size: int) -> int:
+        """Delete up to batch_size of a session's oldest analyses beyond its newest max_history. Returns how many"""
+        def trim(conn):
+            # The oldest analysis that's kept, everything before it goes
+            oldest_kept = conn.execute('''
+                SELECT timestamp, seq FROM analyses WHERE session_id = ?
+                ORDER BY timestamp DESC, seq DESC LIMIT 1 OFFSET ?
+            ''', (session_id, max_history - 1)).fetchone()
+            if not oldest_kept:
+                return 0
+            return conn.execute('''
+                DELETE FROM analyses WHERE seq IN (
+                    SELECT seq FROM analyses WHERE session_id = ? AND (timestamp, seq) < (?, ?)
+                    ORDER BY timestamp, seq LIMIT ?
+                )
+            ''', (session_id, *oldest_kept, batch_size)).rowcount
+        trimmed = self._pool.run(trim, write=True)
+        if trimmed:
+            self._session_cache.invalidate(session_id)
+        return trimmed
+
+    def sessions_over_limit(self, max_history: int) -> List[str]:
+        """Sessions with more than max_history analyses (reads the whole analyses index, so only used occasionally)"""
+        return [row[0] for row in self._pool.run(lambda conn: conn.execute(
+            'SELECT session_id FROM analyses GROUP BY session_id HAVING COUNT(*) > ?', (max_history,)
+        ).fetchall())]
+
+    def take_grown_sessions(self) -> set:
+        """Sessions that got new analyses since the last call (the first call starts keeping track)"""
+        with self._grown_lock:
+            grown = self._grown_sessions or set()
+            self._grown_sessions = set()
+        return grown
+
+    def incremental_vacuum(self, pages: int) -> int:
+        """Give up to this many free pages back to the filesystem. Returns how many were freed
+        (always 0 unless the database uses auto_vacuum=INCREMENTAL)"""
+        def vacuum(conn):
+            before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            # executescript steps the pragma to completion (execute() would free a single page)
+            conn.executescript(f'PRAGMA incremental_vacuum({int(pages)})')
+            return before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+        return self._pool.run(vacuum)
+
+    def checkpoint(self) -> None:
+        """Copy the WAL back into the database file without waiting for readers (PASSIVE), so it can be cut back"""
+        if self._pool.wal:
+            self._pool.run(lambda conn: conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone())
+
+    def get_storage_stats(self) -> Dict[str, Any]:
+        """Size of the database: pages in use and free, and the files on disk"""
+        def read(conn):
+            return {
+                'page_size': conn.execute('PRAGMA page_size').fetchone()[0],
+                'page_count': conn.execute('PRAGMA page_count').fetchone()[0],
+                'free_pages': conn.execute('PRAGMA freelist_count').fetchone()[0],
+                'auto_vacuum': {0: 'none', 1: 'full', 2: 'incremental'}.get(
+                    conn.execute('PRAGMA auto_vacuum').fetchone()[0], 'unknown')
+            }
+        stats = self._pool.run(read)
+        stats['size_bytes'] = stats['page_size'] * stats['page_count']
+        stats['file_bytes'] = sum(
+            os.path.getsize(path) for path in (self.db_path, self.db_path + '-wal') if os.path.exists(path)
+        )
+        return stats
 
 # Create a global instance that other files can use
 sqlite_manager = SQLiteManager()
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+This file keeps SQLite connections open and shares them between requests.
+
+Why We Need It:
+    Every SQLiteManager and AnalysisCache method used to open a new sqlite3 connection and close it again,
+    and one /api/detect calls several of them. Opening a connection means opening the file, reading the schema
+    and starting with a cold page cache, every time.
+    The database also ran in the default rollback journal mode, where a writer locks out every reader,
+    so concurrent requests queued up behind each other.
+
+How It Works:
+    Connections: a pool of up to POOL_SIZE idle connections per database file (get_pool(db_path)).
+        A thread borrows one for the duration of an operation and gives it back afterwards.
+        While a thread holds a connection, nested borrows in the same thread get that same connection,
+        so an operation that calls another one shares its connection (and transaction).
+        We don't simply keep one connection per thread forever: the Flask dev server starts a new thread
+        for every request, so thread-local connections would never be reused and would pile up.
+    Pragmas, set on every new connection:
+        journal_mode=WAL: readers never block the writer and the writer never blocks readers
+            (the setting is stored in the database file, SQLITE_WAL=0 leaves the journal mode alone)
+        synchronous=NORMAL: in WAL mode this is still corruption-safe, a power cut can only lose
+            the last few commits, and commits no longer wait for an fsync each
+        cache_size (SQLITE_CACHE_MB) and mmap_size (SQLITE_MMAP_MB): hot pages stay in memory across requests
+        auto_vacuum=INCREMENTAL: a new database file is created so that services/session_maintenance.py can give
+            freed pages back to the filesystem a few at a time (no effect on an existing file, see migrate_sessions.py --compact)
+        temp_store=MEMORY: sorting and temporary tables don't touch disk
+        journal_size_limit (SQLITE_WAL_LIMIT_MB): the -wal file shrinks back after a checkpoint
+    Writes: run(operation, write=True) starts the transaction with BEGIN IMMEDIATE, so the write lock is taken
+        up front and SQLite's busy timeout (SQLITE_BUSY_TIMEOUT) handles waiting for it.
+    Busy retries: if SQLite still reports "database is locked"/"busy" (e.g. the timeout ran out under heavy load),
+        the whole operation is retried up to BUSY_RETRIES times with a short backoff.
+        Retries and final failures are counted, and reported by /api/health with the other pool counters.
+"""
+
+import contextlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+
+class SQLitePool:
+    # Pool of configured connections to one SQLite database file
+
+    POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', '8'))
+    BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', '5'))
+    BUSY_RETRIES = int(os.environ.get('SQLITE_BUSY_RETRIES', '3'))
+    BUSY_BACKOFF = 0.05  # Seconds before the first retry, doubled for each one after that
+    CACHE_MB = int(os.environ.get('SQLITE_CACHE_MB', '8'))
+    MMAP_MB = int(os.environ.get('SQLITE_MMAP_MB', '64'))
+    WAL = os.environ.get('SQLITE_WAL', '1') != '0'
+    WAL_LIMIT_MB = int(os.environ.get('SQLITE_WAL_LIMIT_MB', '16'))
+
+    def __init__(self, db_path, pool_size=None, wal=None):
+        self.db_path = db_path
+        # 0 disables pooling: a new connection for every borrow, closed afterwards (the old behaviour)
+        self.pool_size = self.POOL_SIZE if pool_size is None else pool_size
+        self.wal = self.WAL if wal is None else wal
+
+        self._idle = queue.LifoQueue()
+        self._local = threading.local()     # The connection this thread is holding, and how many times it borrowed it
+        self._lock = threading.Lock()
+        self.stats = {
+            'connections_opened': 0, 'connections_closed': 0, 'borrows': 0, 'reused': 0,
+            'busy_retries': 0, 'busy_failures': 0
+        }
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _open(self):
+        # New connection with our pragmas. isolation_level=None: we start transactions ourselves (see run)
+        conn = sqlite3.connect(
+            self.db_path, timeout=self.BUSY_TIMEOUT, isolation_level=None, check_same_thread=False
+        )
+        # Has to come before journal_mode, which writes the header of a new file
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        if self.wal:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            # The -wal file is cut back to this size after a checkpoint, instead of staying as big as it ever got
+            conn.execute(f'PRAGMA journal_size_limit={self.WAL_LIMIT_MB * 1024 * 1024}')
+        conn.execute(f'PRAGMA cache_size=-{self.CACHE_MB * 1024}')
+        conn.execute(f'PRAGMA mmap_size={self.MMAP_MB * 1024 * 1024}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        self._count('connections_opened')
+        return conn
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception as e:
+            print(f"Error closing SQLite connection: {e}")
+        self._count('connections_closed')
+
+    @contextlib.contextmanager
+    def connection(self):
+        # Borrow a connection for the duration of a with block (the same one if this thread already has one)
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        self._count('borrows')
+        try:
+            conn = self._idle.get_nowait()
+            self._count('reused')
+        except queue.Empty:
+            conn = self._open()
+
+        self._local.conn = conn
+        self._local.depth = 1
+        healthy = True
+        try:
+            yield conn
+        except sqlite3.DatabaseError:
+            # Don't hand a connection in an unknown state to the next request
+            healthy = not conn.in_transaction
+            raise
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            if conn.in_transaction:
+                conn.rollback()
+            if healthy and self._idle.qsize() < self.pool_size:
+                self._idle.put(conn)
+            else:
+                self._close(conn)
+
+    def run(self, operation, write=False):
+        # Call operation(conn) and return its result, retrying if the database is busy.
+        # write=True wraps it in a transaction (BEGIN IMMEDIATE ... COMMIT, rolled back if it raises).
+        # Inside another write on the same thread it simply joins that transaction.
+        attempt = 0
+        while True:
+            try:
+                with self.connection() as conn:
+                    if not write or conn.in_transaction:
+                        return operation(conn)
+                    conn.execute('BEGIN IMMEDIATE')
+                    try:
+                        result = operation(conn)
+                        conn.execute('COMMIT')
+                        return result
+                    except BaseException:
+                        if conn.in_transaction:
+                            conn.rollback()
+                        raise
+            except sqlite3.OperationalError as e:
+                if not self._is_busy(e) or getattr(self._local, 'conn', None) is not None:
+                    # Not a lock problem, or we're nested inside an outer operation (which retries as a whole)
+                    raise
+                if attempt >= self.BUSY_RETRIES:
+                    self._count('busy_failures')
+                    raise
+                self._count('busy_retries')
+                time.sleep(self.BUSY_BACKOFF * (2 ** attempt))
+                attempt += 1
+
+    def _is_busy(self, error):
+        message = str(error).lower()
+        return 'locked' in message or 'busy' in message
+
+    def close_all(self):
+        # Close every idle connection (borrowed ones are closed when they come back and the pool is full)
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(conn)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats.update({
+            'pool_size': self.pool_size,
+            'idle': self._idle.qsize(),
+            'journal_mode': 'wal' if self.wal else 'default'
+        })
+        return stats
+
+
+# One pool per database file, shared by everything that uses that file
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path):
+    # The shared pool for a database file, created on first use
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = SQLitePool(db_path)
+        return pool
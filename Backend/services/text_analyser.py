@@ -40,11 +40,53 @@ When Each Analysis Type is Used:
 
 Performance Consideration:
     Sentence-level analysis is slower (makes multiple model calls) but more accurate for long texts. The trade-off is worth it for better results!
+
+Time Budgets (Partial Results):
+    A maximum-size document can take longer than the gateway in front of us will wait.
+    analyse_text accepts a time_budget (seconds), or uses the default passed to TextAnalyser().
+    Once the budget runs out we stop scoring new sentences and return what we have, marked 'partial'
+    with 'covered_sentences' out of 'total_sentences'.
+    Sentences are scored in coverage order (first, middle, quarters, eighths...) rather than start to end,
+    so a partial result is spread across the whole document instead of only describing its first page.
+
+Non-Prose Prefilter:
+    For uploaded files, page numbers, running headers, reference lists, URLs and number tables are blanked out
+    by services/prose_filter.py before sentence splitting. They cost a model call each and skew the scores.
+    What was skipped is reported in 'skipped_segments'. Pass prefilter=True/False to override the default.
+
+Streaming (Uploaded Files):
+    analyse_stream takes the text as an iterator of chunks (e.g. one per PDF page) instead of a string.
+    A background thread pulls chunks from the extractor while this thread splits finished sentences off
+    the front of the buffer and scores them, so inference on page 1 overlaps extraction of page 2.
+    Time budgets and sampling need the full sentence list up front, so those requests use analyse_text.
+
+Lazy Model Loading:
+    The model isn't loaded when a TextAnalyser is created but on the first analysis (or load_model()).
+    Health checks and history requests never touch it.
+
+Sampling Mode (Very Long Documents):
+    With sampling=True we don't score every sentence. Sentences are grouped by paragraph (or into equal sections
+    when the text has no paragraph breaks) and we score one random sentence per group per round.
+    After each batch we bootstrap a 95% confidence interval for overall_ai_probability and ai_percentage,
+    and stop as soon as the interval is narrower than SAMPLING_TARGET_WIDTH (or everything has been scored).
+    Latency then depends on how consistent the document is, not on how long it is.
+    Every group gets the same number of samples whatever its size, so the estimate weights each group's mean
+    by its share of the document's sentences, and the bootstrap resamples within each group.
+    A group with only one scored sentence can't vary when resampled, so it is pooled with the other such groups,
+    or merged into the nearest group if it's the only one.
+    A sampled result is only marked 'partial' if the time budget ran out before the interval was narrow enough.
 """
 
+import collections
+import math
+import queue
+import random
 import re
 import statistics
+import threading
+import time
 from services.model import AIDetectionModel  # Our AI detection model
+from services.prose_filter import prose_filter
 
 class SecurityError(Exception):
     # Custom exception for security-related issues
@@ -59,10 +101,52 @@ class TextAnalyser:
     
     # Maximum total text length to prevent extremely long processing
     MAX_TEXT_LENGTH = 100000
+
+    # Sampling mode settings
+    SAMPLING_TARGET_WIDTH = 0.1    # Stop once the 95% interval for overall_ai_probability is narrower than this
+    SAMPLING_MIN_SAMPLE = 12       # Never estimate from fewer sentences than this
+    BOOTSTRAP_RESAMPLES = 500      # Resamples per confidence interval
+    CONFIDENCE_LEVEL = 0.95
+    SAMPLING_SEED = 3003           # Fixed seed so the same document gives the same sample
+
+    # Enhanced sentence splitting pattern. This regex is smart about abbreviations
+    # It looks for sentence endings (. ! ?) but avoids splitting on things like "Mr." or "U.S.A."
+    SENTENCE_PATTERN = re.compile(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\!|\?)\s+')
+
+    # How many extracted chunks (pages) may be waiting for the analyser when streaming
+    STREAM_QUEUE_SIZE = 8
     
-    def __init__(self):
-        # Initialize the AI detection model that does the actual classification
-        self.model = AIDetectionModel()
+    def __init__(self, time_budget=None):
+        # The AI detection model that does the actual classification is loaded on first use (see the model property),
+        # so processes that never analyse anything don't pay for torch
+        self._model = None
+        self._model_version = None
+        self._model_lock = threading.Lock()
+        # Default time budget in seconds for analyse_text (None = no limit)
+        self.time_budget = time_budget
+
+    @property
+    def model(self):
+        # Load the model the first time it's needed. The lock stops two concurrent first requests loading it twice
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    print("Loading AI detection model...")
+                    self._model = AIDetectionModel()
+        return self._model
+
+    @property
+    def model_version(self):
+        # Version of the model files, without loading the model (the analysis cache needs it before it decides to)
+        if self._model is not None:
+            return self._model.model_version
+        if self._model_version is None:
+            self._model_version = AIDetectionModel.compute_model_version(AIDetectionModel.MODEL_PATH)
+        return self._model_version
+
+    def load_model(self):
+        # Load the model now instead of on the first request (e.g. at server startup)
+        return self.model
         
     def validate_input_length(self, text, max_length=None):
         # Basic validation to ensure text is within reasonable limits
@@ -85,12 +169,8 @@ class TextAnalyser:
         # Split text into sentences. Returns a list of sentences with their positions in the original text.
         # This uses regex to find sentence boundaries while avoiding false positives like "Dr. Smith"
         
-        # Enhanced sentence splitting pattern. This regex is smart about abbreviations
-        # It looks for sentence endings (. ! ?) but avoids splitting on things like "Mr." or "U.S.A."
-        sentence_pattern = r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\!|\?)\s+'
-        
-        # Split the text using our pattern
-        sentences = re.split(sentence_pattern, text.strip())
+        # Split the text using our pattern (see SENTENCE_PATTERN)
+        sentences = self.SENTENCE_PATTERN.split(text.strip())
         
         # Filter out empty sentences and very short ones (they're not reliable for AI detection)
         valid_sentences = []
@@ -100,7 +180,183 @@ class TextAnalyser:
                 valid_sentences.append(sentence)
         
         return valid_sentences
+
+    def iter_sentences(self, chunks):
+        # Streaming version of split_into_sentences + locate_sentences.
+        # Takes text in chunks and yields (sentence, offset) as soon as each sentence is known to be complete,
+        # i.e. once a sentence boundary has been seen after it. Offsets are into the concatenated chunks.
+        buffer = ''
+        buffer_start = 0  # Offset of buffer[0] in the full text
+
+        for chunk in chunks:
+            buffer += chunk
+            position = 0
+            for match in self.SENTENCE_PATTERN.finditer(buffer):
+                yield from self._emit_sentence(buffer[position:match.start()], buffer_start + position)
+                position = match.end()
+            # Keep the unfinished tail (it starts at a sentence boundary so the regex context is intact)
+            buffer = buffer[position:]
+            buffer_start += position
+
+        # Whatever is left is the last sentence
+        yield from self._emit_sentence(buffer, buffer_start)
+
+    def _emit_sentence(self, piece, offset):
+        # Strip a piece of text and yield it (with its real offset) if it's long enough to analyse
+        sentence = piece.strip()
+        if len(sentence) >= self.MIN_SENTENCE_LENGTH:
+            yield sentence, offset + (len(piece) - len(piece.lstrip()))
+
+    def split_into_strata(self, text):
+        # Split text into sentences and remember which paragraph (stratum) each one came from.
+        # Used by sampling mode so the sample covers every part of the document.
+        sentences = []
+        strata = []
+        for paragraph_idx, paragraph in enumerate(re.split(r'\n\s*\n', text.strip())):
+            for sentence in self.split_into_sentences(paragraph):
+                sentences.append(sentence)
+                strata.append(paragraph_idx)
+
+        # No paragraph breaks (e.g. pasted text): fall back to equal-sized sections of about sqrt(n) sentences
+        if sentences and len(set(strata)) == 1:
+            section_size = max(1, math.isqrt(len(sentences)))
+            strata = [idx // section_size for idx in range(len(sentences))]
+
+        return sentences, strata
+
+    def locate_sentences(self, text, sentences):
+        # Find where each sentence starts in the original text (character offsets).
+        # Lets clients highlight sentences without us sending the sentence text back.
+        offsets = []
+        position = 0
+        for sentence in sentences:
+            offset = text.find(sentence, position)
+            if offset == -1:
+                # Shouldn't happen since sentences come from the text, but don't lose our place
+                offsets.append(None)
+                continue
+            offsets.append(offset)
+            position = offset + len(sentence)
+        return offsets
     
+    def coverage_order(self, count):
+        # Order sentence indices so that any prefix of the order is spread evenly over the document:
+        # 0, n/2, n/4, 3n/4, n/8, ... then everything in between.
+        # Used when we might run out of time, so the sentences we did score are representative.
+        step = 1
+        while step < count:
+            step *= 2
+
+        order = []
+        seen = set()
+        while step >= 1:
+            for idx in range(0, count, step):
+                if idx not in seen:
+                    seen.add(idx)
+                    order.append(idx)
+            step //= 2
+        return order
+
+    def stratified_order(self, strata, rng):
+        # Order sentence indices round-robin over strata: one random sentence from every paragraph,
+        # then a second from every paragraph, and so on. Paragraphs themselves are visited in coverage order.
+        groups = {}
+        for idx, stratum in enumerate(strata):
+            groups.setdefault(stratum, []).append(idx)
+        for members in groups.values():
+            rng.shuffle(members)
+
+        keys = sorted(groups)
+        keys = [keys[i] for i in self.coverage_order(len(keys))]
+
+        order = []
+        depth = 0
+        while len(order) < len(strata):
+            for key in keys:
+                if depth < len(groups[key]):
+                    order.append(groups[key][depth])
+            depth += 1
+        return order
+
+    def group_by_stratum(self, sentence_results, strata):
+        # Successful sentence results grouped by stratum, with each stratum's share of the document's sentences.
+        # Shares are only over strata that have results, so strata not sampled yet don't pull the estimate to 0
+        groups = {}
+        for item in sentence_results:
+            if 'error' not in item:
+                groups.setdefault(strata[item['index']], []).append(item['result'])
+        sizes = collections.Counter(strata)
+        sampled_size = sum(sizes[stratum] for stratum in groups)
+        weights = {stratum: sizes[stratum] / sampled_size for stratum in groups}
+        return groups, weights
+
+    def stratified_mean(self, values, weights):
+        # Mean of each stratum's values, weighted by the stratum's share of the document
+        return sum(weights[stratum] * sum(items) / len(items) for stratum, items in values.items())
+
+    def bootstrap_interval(self, values, weights, rng):
+        # Percentile bootstrap confidence interval for the stratified mean of values ({stratum: [value]}).
+        # Each resample draws within every stratum as many values as it has. Returns (low, high)
+        means = sorted(
+            self.stratified_mean({stratum: rng.choices(items, k=len(items)) for stratum, items in values.items()}, weights)
+            for _ in range(self.BOOTSTRAP_RESAMPLES)
+        )
+        alpha = (1 - self.CONFIDENCE_LEVEL) / 2
+        low = means[int(alpha * (len(means) - 1))]
+        high = means[int(math.ceil((1 - alpha) * (len(means) - 1)))]
+        return low, high
+
+    def calculate_confidence_intervals(self, sentence_results, strata, rng):
+        # Bootstrap intervals for overall_ai_probability and ai_percentage from the sentences scored so far
+        groups, weights = self.group_by_stratum(sentence_results, strata)
+        if sum(len(results) for results in groups.values()) < 2:
+            return None
+
+        # A stratum with one sampled sentence would resample to the same value every time and look certain,
+        # so those are pooled into one stratum for the bootstrap (the usual "collapsed strata" approach).
+        # A lone singleton has nothing to pool with, so it joins the nearest stratum in the document instead
+        singletons = [stratum for stratum, results in groups.items() if len(results) < 2]
+        if len(singletons) > 1:
+            groups[None] = [result for stratum in singletons for result in groups.pop(stratum)]
+            weights[None] = sum(weights.pop(stratum) for stratum in singletons)
+        elif singletons:
+            singleton = singletons[0]
+            neighbour = min((stratum for stratum in groups if stratum != singleton),
+                            key=lambda stratum: (abs(stratum - singleton), stratum))
+            groups[neighbour] = groups[neighbour] + groups.pop(singleton)
+            weights[neighbour] += weights.pop(singleton)
+
+        ai_probabilities = {stratum: [r['ai_probability'] for r in results] for stratum, results in groups.items()}
+        probability_low, probability_high = self.bootstrap_interval(ai_probabilities, weights, rng)
+        percentage_low, percentage_high = self.bootstrap_interval(
+            {stratum: [100.0 if p > 0.5 else 0.0 for p in items] for stratum, items in ai_probabilities.items()},
+            weights, rng
+        )
+        return {
+            'level': self.CONFIDENCE_LEVEL,
+            'overall_ai_probability': [round(probability_low, 4), round(probability_high, 4)],
+            'ai_percentage': [round(percentage_low, 1), round(percentage_high, 1)]
+        }
+
+    def calculate_stratified_estimate(self, sentence_results, strata):
+        # Document-level estimates from a stratified sample (see Sampling Mode above).
+        # Replaces the plain averages in calculate_overall_confidence, which would over-weight short paragraphs
+        groups, weights = self.group_by_stratum(sentence_results, strata)
+        if not groups:
+            return {}
+
+        def estimate(value):
+            return self.stratified_mean({stratum: [value(r) for r in results] for stratum, results in groups.items()}, weights)
+
+        overall_ai_prob = estimate(lambda r: r['ai_probability'])
+        return {
+            'overall_ai_probability': round(overall_ai_prob, 4),
+            'overall_human_probability': round(estimate(lambda r: r['human_probability']), 4),
+            'overall_confidence': round(estimate(lambda r: r['confidence']), 4),
+            'overall_classification': 'AI-generated' if overall_ai_prob > 0.5 else 'Human-written',
+            'ai_percentage': round(estimate(lambda r: 100.0 if r['ai_probability'] > 0.5 else 0.0), 1)
+        }
+
     def calculate_overall_confidence(self, sentence_results):
         # Calculate overall confidence metrics from individual sentence results.
         # This aggregates all the sentence-level predictions into one overall score
@@ -175,112 +431,354 @@ class TextAnalyser:
             }
         }
     
-    def analyse_sentences(self, sentences):
+    def analyse_sentences(self, sentences, offsets=None, deadline=None, order=None):
         # Analyse multiple sentences using AI detection. Returns results for each sentence.
         # This is where we actually call the AI model for each sentence
+        # offsets (optional) are the start positions of each sentence in the original text
+        # deadline (optional, time.monotonic() value): stop scoring new sentences once it passes.
+        # order (optional): which sentence indices to score, in that order (default: all of them)
+        # Results are always returned in document order, even if fewer than len(sentences).
         
         results = []
+        if offsets is None:
+            offsets = [None] * len(sentences)
+
+        if order is None:
+            order = range(len(sentences)) if deadline is None else self.coverage_order(len(sentences))
         
-        for idx, sentence in enumerate(sentences):
-            try:
-                # Removed length checks. Process all sentences regardless of length
-                # (The filtering already happened in split_into_sentences)
-                
-                # AI model prediction for this sentence. This is the expensive part!
-                prediction = self.model.predict(sentence)
-                
-                # Package the result with metadata
-                results.append({
-                    'index': idx,  # Position in the original text
-                    'sentence': sentence,  # Full sentence text
-                    'sentence_preview': sentence[:100] + ('...' if len(sentence) > 100 else ''),  # Short preview
-                    'sentence_length': len(sentence),
-                    'result': {
-                        'ai_probability': prediction['ai_probability'],
-                        'human_probability': prediction['human_probability'],
-                        'confidence': prediction['confidence'],
-                        'classification': 'AI-generated' if prediction['ai_probability'] > 0.5 else 'Human-written'
-                    }
-                })
-            
-            except Exception as e:
-                # If analysis fails for a sentence, record the error but continue with others
-                results.append({
-                    'index': idx,
-                    'sentence_preview': sentence[:100] + ('...' if len(sentence) > 100 else ''),
-                    'error': str(e)  # Store error message for debugging
-                })
+        for idx in order:
+            # Always score at least one sentence so there is something to report
+            if deadline is not None and results and time.monotonic() >= deadline:
+                break
+            results.append(self.analyse_sentence(idx, sentences[idx], offsets[idx]))
+
+        results.sort(key=lambda item: item['index'])
         
         return results
+
+    def analyse_sentence(self, idx, sentence, offset=None):
+        # Score one sentence and package the result with its metadata
+        try:
+            # Removed length checks. Process all sentences regardless of length
+            # (The filtering already happened in split_into_sentences)
+            
+            # AI model prediction for this sentence. This is the expensive part!
+            prediction = self.model.predict(sentence)
+            
+            # Package the result with metadata
+            return {
+                'index': idx,  # Position in the original text
+                'offset': offset,  # Character offset in the original text
+                'sentence': sentence,  # Full sentence text
+                'sentence_preview': sentence[:100] + ('...' if len(sentence) > 100 else ''),  # Short preview
+                'sentence_length': len(sentence),
+                'result': {
+                    'ai_probability': prediction['ai_probability'],
+                    'human_probability': prediction['human_probability'],
+                    'confidence': prediction['confidence'],
+                    'classification': 'AI-generated' if prediction['ai_probability'] > 0.5 else 'Human-written'
+                }
+            }
+        
+        except Exception as e:
+            # If analysis fails for a sentence, record the error but continue with others
+            return {
+                'index': idx,
+                'offset': offset,
+                'sentence_length': len(sentence),
+                'sentence_preview': sentence[:100] + ('...' if len(sentence) > 100 else ''),
+                'error': str(e)  # Store error message for debugging
+            }
+
+    def analyse_sampled(self, sentences, strata, offsets, deadline=None, target_width=None):
+        # Score a growing stratified sample until the confidence interval is narrow enough.
+        # Returns (sentence_results, confidence_intervals, partial) for the sentences that were scored,
+        # partial being True if the deadline stopped us first.
+        if target_width is None:
+            target_width = self.SAMPLING_TARGET_WIDTH
+
+        rng = random.Random(self.SAMPLING_SEED)
+        order = self.stratified_order(strata, rng)
+
+        results = []
+        intervals = None
+        partial = False
+        position = 0
+        while position < len(order):
+            # First batch is the minimum sample, then grow by a quarter each round so we
+            # don't bootstrap after every single sentence
+            batch_size = self.SAMPLING_MIN_SAMPLE if position == 0 else max(4, position // 4)
+            batch = order[position:position + batch_size]
+            position += len(batch)
+
+            results.extend(self.analyse_sentences(sentences, offsets, deadline=deadline, order=batch))
+            intervals = self.calculate_confidence_intervals(results, strata, rng)
+
+            if intervals:
+                low, high = intervals['overall_ai_probability']
+                if high - low <= target_width:
+                    break
+            if deadline is not None and time.monotonic() >= deadline:
+                partial = len(results) < len(sentences)
+                break
+
+        results.sort(key=lambda item: item['index'])
+        return results, intervals, partial
     
-    def analyse_text(self, text, source_type='text', filename=None, force_single_analysis=False):
+    def build_sentence_level_result(self, text, total_sentences, sentence_results, source_type, filename,
+                                    skipped_segments=None, sampled=False, confidence_intervals=None, strata=None,
+                                    partial=None):
+        # Package sentence results into the API/session format used by app.py
+        # sampled: sentence_results are a stratified sample (strata gives each sentence's stratum)
+        # partial: whether the time budget ran out (default: fewer results than sentences, right unless sampled)
+
+        # Calculate overall metrics from individual sentence results
+        overall_metrics = self.calculate_overall_confidence(sentence_results)
+        if sampled:
+            overall_metrics.update(self.calculate_stratified_estimate(sentence_results, strata))
+
+        # Record how much of the document we covered before the time budget ran out
+        overall_metrics['total_sentences'] = total_sentences
+        overall_metrics['covered_sentences'] = len(sentence_results)
+        overall_metrics['partial'] = len(sentence_results) < total_sentences if partial is None else partial
+        overall_metrics['sampled'] = sampled
+        if sampled:
+            overall_metrics['confidence_intervals'] = confidence_intervals
+        if skipped_segments is not None:
+            overall_metrics['skipped_segments'] = skipped_segments
+        
+        # Return structured results for API response
+        return {
+            'analysis_type': 'sentence_level',
+            'result': {
+                'overall_ai_probability': overall_metrics['overall_ai_probability'],
+                'overall_human_probability': overall_metrics['overall_human_probability'],
+                'overall_confidence': overall_metrics['overall_confidence'],
+                'overall_classification': overall_metrics['overall_classification'],
+                'sentence_count': overall_metrics['sentence_count'],
+                'analyzed_sentences': overall_metrics['analyzed_sentences'],
+                'ai_sentence_count': overall_metrics['ai_sentence_count'],
+                'human_sentence_count': overall_metrics['human_sentence_count'],
+                'ai_percentage': overall_metrics['ai_percentage'],
+                'confidence_range': overall_metrics['confidence_range'],
+                'partial': overall_metrics['partial'],
+                'covered_sentences': overall_metrics['covered_sentences'],
+                'total_sentences': overall_metrics['total_sentences'],
+                'sampled': overall_metrics['sampled'],
+                'confidence_intervals': overall_metrics.get('confidence_intervals'),
+                'skipped_segments': skipped_segments,
+                'text_length': len(text),
+                'source_type': source_type,
+                'filename': filename
+            },
+            'sentence_results': sentence_results,  # Detailed per-sentence results
+            # Data for session storage (slightly different format)
+            'session_data': {
+                'sentence_analysis': sentence_results,
+                'overall_result': overall_metrics,
+                'analysis_type': 'sentence_level'
+            }
+        }
+
+    def build_single_text_result(self, text, prediction, source_type, filename, skipped_segments=None):
+        # Package a whole-text prediction into the API/session format used by app.py
+        return {
+            'analysis_type': 'single_text',
+            'result': {
+                'ai_probability': prediction['ai_probability'],
+                'human_probability': prediction['human_probability'],
+                'confidence': prediction['confidence'],
+                'classification': 'AI-generated' if prediction['ai_probability'] > 0.5 else 'Human-written',
+                'skipped_segments': skipped_segments,
+                'text_length': len(text),
+                'source_type': source_type,
+                'filename': filename
+            },
+            # Data for session storage
+            'session_data': {
+                'result': prediction,
+                'skipped_segments': skipped_segments,
+                'analysis_type': 'single_text'
+            }
+        }
+
+    def analyse_text(self, text, source_type='text', filename=None, force_single_analysis=False, time_budget=None,
+                     sampling=False, target_interval_width=None, prefilter=None):
         # Main analysis method that automatically detects whether to use single-text or sentence-level analysis and returns API-ready JSON.
         # This is the method that app.py calls. It's the entry point for text analysis
+        # time_budget: seconds we're allowed to spend (defaults to self.time_budget, None = unlimited)
+        # sampling: score a stratified sample and report confidence intervals instead of scoring every sentence
+        # prefilter: skip non-prose lines before splitting (defaults to on for uploaded files)
+
+        if time_budget is None:
+            time_budget = self.time_budget
+        deadline = time.monotonic() + time_budget if time_budget is not None else None
 
         try:
             # Perform basic length check only (security validation)
             text = self.perform_security_checks(text)
 
+            # Blank out non-prose lines (offsets stay the same, so sentence positions still match the original text)
+            if prefilter is None:
+                prefilter = source_type == 'file'
+            analysis_text = text
+            skipped_segments = None
+            if prefilter:
+                filtered_text, skipped_segments = prose_filter.filter_text(text)
+                # If almost nothing is left it's safer to analyse the original than to guess from scraps
+                if len(filtered_text.split()) >= 10:
+                    analysis_text = filtered_text
+                    skipped_segments['applied'] = True
+                else:
+                    skipped_segments = {'applied': False, 'count': 0, 'characters': 0, 'by_reason': {}, 'segments': []}
+
             # Detect if multiple sentences are present
-            sentences = self.split_into_sentences(text)
+            if sampling:
+                sentences, strata = self.split_into_strata(analysis_text)
+            else:
+                sentences = self.split_into_sentences(analysis_text)
+                strata = None
             
             # Decision point: use sentence-level analysis for multi-sentence text unless forced otherwise
             enable_sentence_analysis = len(sentences) > 1 and not force_single_analysis
             
             if enable_sentence_analysis:
                 # Analyse each sentence individually (more accurate for long texts)
-                sentence_results = self.analyse_sentences(sentences)
+                offsets = self.locate_sentences(analysis_text, sentences)
+                confidence_intervals = None
+                partial = None
+                if sampling:
+                    sentence_results, confidence_intervals, partial = self.analyse_sampled(
+                        sentences, strata, offsets, deadline=deadline, target_width=target_interval_width
+                    )
+                else:
+                    sentence_results = self.analyse_sentences(sentences, offsets, deadline=deadline)
 
-                # Calculate overall metrics from individual sentence results
-                overall_metrics = self.calculate_overall_confidence(sentence_results)
-                
-                # Return structured results for API response
-                return {
-                    'analysis_type': 'sentence_level',
-                    'result': {
-                        'overall_ai_probability': overall_metrics['overall_ai_probability'],
-                        'overall_human_probability': overall_metrics['overall_human_probability'],
-                        'overall_confidence': overall_metrics['overall_confidence'],
-                        'overall_classification': overall_metrics['overall_classification'],
-                        'sentence_count': overall_metrics['sentence_count'],
-                        'analyzed_sentences': overall_metrics['analyzed_sentences'],
-                        'ai_sentence_count': overall_metrics['ai_sentence_count'],
-                        'human_sentence_count': overall_metrics['human_sentence_count'],
-                        'ai_percentage': overall_metrics['ai_percentage'],
-                        'confidence_range': overall_metrics['confidence_range'],
-                        'text_length': len(text),
-                        'source_type': source_type,
-                        'filename': filename
-                    },
-                    'sentence_results': sentence_results,  # Detailed per-sentence results
-                    # Data for session storage (slightly different format)
-                    'session_data': {
-                        'sentence_analysis': sentence_results,
-                        'overall_result': overall_metrics,
-                        'analysis_type': 'sentence_level'
-                    }
-                }
+                return self.build_sentence_level_result(
+                    text, len(sentences), sentence_results, source_type, filename,
+                    skipped_segments=skipped_segments, sampled=sampling, confidence_intervals=confidence_intervals,
+                    strata=strata, partial=partial
+                )
             else:
                 # Single text analysis (for short texts or when forced)
-                prediction = self.model.predict(text)
-                
-                return {
-                    'analysis_type': 'single_text',
-                    'result': {
-                        'ai_probability': prediction['ai_probability'],
-                        'human_probability': prediction['human_probability'],
-                        'confidence': prediction['confidence'],
-                        'classification': 'AI-generated' if prediction['ai_probability'] > 0.5 else 'Human-written',
-                        'text_length': len(text),
-                        'source_type': source_type,
-                        'filename': filename
-                    },
-                    # Data for session storage
-                    'session_data': {
-                        'result': prediction,
-                        'analysis_type': 'single_text'
-                    }
-                }
+                prediction = self.model.predict(' '.join(analysis_text.split()) if prefilter else text)
+                return self.build_single_text_result(text, prediction, source_type, filename, skipped_segments)
+        except Exception as e:
+            # Catch any unexpected errors and re-raise with helpful message
+            raise Exception(f'Analysis failed: {str(e)}')
+
+    def analyse_stream(self, chunks, source_type='file', filename=None, force_single_analysis=False, prefilter=None):
+        # Analyse text that arrives in chunks (e.g. PDF pages from FileProcessor.stream_file).
+        # Sentences are scored while later chunks are still being extracted.
+        # Returns (text, analysis) where text is the full extracted text and analysis matches analyse_text.
+
+        if force_single_analysis:
+            # Nothing to overlap: the whole text goes to the model in one call
+            text = ''.join(chunks).strip()
+            if not text:
+                raise ValueError('No text content found')
+            # Validate here so length errors reach the client as a ValueError, not a wrapped analysis failure
+            self.validate_input_length(text)
+            return text, self.analyse_text(text, source_type=source_type, filename=filename,
+                                           force_single_analysis=True, prefilter=prefilter)
+
+        if prefilter is None:
+            prefilter = source_type == 'file'
+
+        collected = []  # Raw chunks, to rebuild the full text at the end
+        filtered_words = 0
+        stop = threading.Event()
+        pending = queue.Queue(maxsize=self.STREAM_QUEUE_SIZE)
+        end_of_stream = object()
+
+        def put(item):
+            # Blocking put that gives up if the consumer has stopped (e.g. text too long)
+            while not stop.is_set():
+                try:
+                    pending.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            # Background thread: run the extractor and hand chunks over
+            try:
+                for chunk in chunks:
+                    if not put(chunk):
+                        return
+            except Exception as e:
+                put(e)
+            finally:
+                put(end_of_stream)
+
+        def consume():
+            # Yield chunks from the producer, enforcing the text length limit as we go
+            total_length = 0
+            while True:
+                item = pending.get()
+                if item is end_of_stream:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                collected.append(item)
+                total_length += len(item)
+                if total_length > self.MAX_TEXT_LENGTH:
+                    raise ValueError(f'Text exceeds maximum length of {self.MAX_TEXT_LENGTH} characters')
+                yield item
+
+        def count_words(stream):
+            # Track how many words survive the prefilter (for the same fallback as analyse_text)
+            nonlocal filtered_words
+            for chunk in stream:
+                filtered_words += len(chunk.split())
+                yield chunk
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+
+        try:
+            skipped_segments = {}
+            stream = consume()
+            if prefilter:
+                stream = prose_filter.filter_stream(stream, skipped_segments)
+            stream = count_words(stream)
+
+            # Sentences are held back until we know this isn't a short document (more than one sentence, and
+            # at least 10 words left after the prefilter), which analyse_text handles as a whole instead.
+            # Word counts only grow, so once that's true it stays true and nothing we've scored is wasted
+            sentence_results = []
+            held = []
+            sentence_count = 0
+            for sentence, offset in self.iter_sentences(stream):
+                held.append((sentence_count, sentence, offset))
+                sentence_count += 1
+                if sentence_count > 1 and (not prefilter or filtered_words >= 10):
+                    sentence_results.extend(self.analyse_sentence(*item) for item in held)
+                    held = []
+
+            text = ''.join(collected).rstrip()
+            if not text.strip():
+                raise ValueError('No text content found')
+            self.perform_security_checks(text)
+
+            # One sentence, or the prefilter left almost nothing: same handling as analyse_text (nothing has
+            # been scored yet in that case)
+            if sentence_count <= 1 or (prefilter and filtered_words < 10):
+                return text, self.analyse_text(text, source_type=source_type, filename=filename, prefilter=prefilter)
+
+            if prefilter:
+                skipped_segments['applied'] = True
+            else:
+                skipped_segments = None
+
+            return text, self.build_sentence_level_result(
+                text, sentence_count, sentence_results, source_type, filename, skipped_segments=skipped_segments
+            )
+        except ValueError:
+            raise
         except Exception as e:
             # Catch any unexpected errors and re-raise with helpful message
-            raise Exception(f'Analysis failed: {str(e)}')
\ No newline at end of file
+            raise Exception(f'Analysis failed: {str(e)}')
+        finally:
+            stop.set()
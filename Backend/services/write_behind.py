@@ -0,0 +1,202 @@
+"""
+CSC3003S Capstone Project - AI Content Detector
+Year: 2025
+Author: Meekaaeel Booley
+
+This file is the optional write-behind queue for analysis records (SQLITE_WRITE_BEHIND=1).
+
+Why We Need It:
+    /api/detect used to write each analysis to SQLite and wait for the commit before it answered.
+    A commit is the slowest thing the database does, and it was on the critical path of every request.
+    With write-behind the request only puts the analysis on a queue, and a background thread writes it.
+
+How It Works:
+    put(key, item): queues an item and returns straight away. key is the session ID.
+        If MAX_PENDING items are already waiting, put() returns False and the caller writes synchronously,
+        so a stuck database can't make the queue grow forever.
+    Group commit: the writer thread waits up to MAX_DELAY_MS for more items to arrive, then hands up to
+        BATCH_SIZE of them to the commit function together, which writes them in one transaction.
+        Under load many requests share one commit instead of paying for one each.
+    Reads: pending(key) returns the items for a key that aren't committed yet, so a session's history
+        includes its own analyses straight away (read-your-writes). flush(key=...) waits for just one key's items.
+    Failures: if a batch fails, its items are retried one at a time, so one bad record can't lose the rest.
+        An item that still can't be committed goes to on_failure(key, item) (the fallback store, which keeps it
+        on disk and replays it into SQLite later), because the request that queued it has already reported success.
+    Shutdown: close() (also registered with atexit) stops taking new items and waits up to FLUSH_TIMEOUT
+        seconds for the queue to drain. flush() does the same without closing, e.g. before a delete.
+
+The queue lives in this process's memory, so a crash (not a normal shutdown) loses whatever was still pending,
+at most about MAX_DELAY_MS of analyses under normal load. That is the trade-off for taking the commit off the request.
+"""
+
+import atexit
+import collections
+import os
+import threading
+import time
+
+
+class WriteBehindQueue:
+    # In-process queue of writes, committed in batches by a background thread
+
+    ENABLED = os.environ.get('SQLITE_WRITE_BEHIND', '0') != '0'
+    BATCH_SIZE = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', '100'))
+    MAX_DELAY_MS = float(os.environ.get('WRITE_BEHIND_MAX_DELAY_MS', '20'))
+    MAX_PENDING = int(os.environ.get('WRITE_BEHIND_MAX_PENDING', '10000'))
+    FLUSH_TIMEOUT = float(os.environ.get('WRITE_BEHIND_FLUSH_TIMEOUT', '10'))
+
+    def __init__(self, commit, batch_size=None, max_delay_ms=None, max_pending=None):
+        # commit(batch) gets a list of (key, item) pairs and must write them all or raise
+        self._commit = commit
+        # on_failure(key, item) takes items that couldn't be committed, returns False if it couldn't keep them either.
+        # Set by services/fallback_store.py through SQLiteManager.set_write_failure_handler
+        self.on_failure = None
+        self.batch_size = max(1, self.BATCH_SIZE if batch_size is None else batch_size)
+        self.max_delay = (self.MAX_DELAY_MS if max_delay_ms is None else max_delay_ms) / 1000
+        self.max_pending = self.MAX_PENDING if max_pending is None else max_pending
+
+        self._queue = collections.deque()   # (key, item) not yet picked up by the writer
+        self._pending = {}                  # key -> items not yet committed (queued or being written)
+        self._pending_count = 0
+        self._flushing = 0                  # Threads waiting in flush(), the writer skips the batching delay for them
+        self._closed = False
+        self._writer = None
+        self._cond = threading.Condition()
+        self.stats = {
+            'queued': 0, 'written': 0, 'batches': 0, 'largest_batch': 0,
+            'failed': 0, 'handed_off': 0, 'lost': 0, 'sync_fallbacks': 0
+        }
+        atexit.register(self.close)
+
+    def put(self, key, item):
+        # Queue an item. Returns False if it wasn't queued (queue full or closed), then the caller must write it
+        with self._cond:
+            if self._closed or self._pending_count >= self.max_pending:
+                self.stats['sync_fallbacks'] += 1
+                return False
+            self._queue.append((key, item))
+            self._pending.setdefault(key, []).append(item)
+            self._pending_count += 1
+            self.stats['queued'] += 1
+            if self._writer is None:
+                # Started on first use, so importing the module doesn't start threads
+                self._writer = threading.Thread(target=self._run, name='sqlite-write-behind', daemon=True)
+                self._writer.start()
+            self._cond.notify_all()
+        return True
+
+    def pending(self, key):
+        # Items for a key that aren't committed yet, oldest first
+        with self._cond:
+            return list(self._pending.get(key, ()))
+
+    def _run(self):
+        # Writer thread: take a batch, commit it, repeat
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+
+                # Give other requests a moment to join this commit (not when someone is waiting for a flush)
+                deadline = time.monotonic() + self.max_delay
+                while len(self._queue) < self.batch_size and not self._closed and not self._flushing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+
+            self._write(batch)
+
+            with self._cond:
+                for key, item in batch:
+                    items = self._pending[key]
+                    # Remove this exact item (two analyses can be equal but still both need storing)
+                    for index, pending_item in enumerate(items):
+                        if pending_item is item:
+                            del items[index]
+                            break
+                    if not items:
+                        del self._pending[key]
+                self._pending_count -= len(batch)
+                self._cond.notify_all()
+
+    def _write(self, batch):
+        try:
+            self._commit(batch)
+            self._count_batch(len(batch))
+            return
+        except Exception as e:
+            print(f"Write-behind batch of {len(batch)} failed ({e}), retrying one at a time")
+
+        for entry in batch:
+            try:
+                self._commit([entry])
+                self._count_batch(1)
+            except Exception as e:
+                with self._cond:
+                    self.stats['failed'] += 1
+                print(f"Write-behind could not store an item for {entry[0]}: {e}")
+                self._hand_off(entry)
+
+    def _hand_off(self, entry):
+        # Give an item we couldn't commit to on_failure, so an analysis the API already confirmed isn't dropped
+        kept = False
+        if self.on_failure is not None:
+            try:
+                kept = self.on_failure(*entry)
+            except Exception as e:
+                print(f"Write-behind failure handler raised: {e}")
+        with self._cond:
+            self.stats['handed_off' if kept else 'lost'] += 1
+        if not kept:
+            print(f"Write-behind: an item for {entry[0]} was lost")
+
+    def _count_batch(self, size):
+        with self._cond:
+            self.stats['written'] += size
+            self.stats['batches'] += 1
+            self.stats['largest_batch'] = max(self.stats['largest_batch'], size)
+
+    def flush(self, timeout=None, key=None):
+        # Wait until everything queued so far (or only key's items) is committed. Returns False if it timed out
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                while (key in self._pending) if key is not None else self._pending_count:
+                    if self._writer is None or not self._writer.is_alive():
+                        return False
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._flushing -= 1
+
+    def close(self, timeout=None):
+        # Stop queueing (later puts are written synchronously by the caller) and drain what's left
+        with self._cond:
+            if self._closed:
+                return True
+            self._closed = True
+            self._cond.notify_all()
+        drained = self.flush(self.FLUSH_TIMEOUT if timeout is None else timeout)
+        if not drained:
+            print(f"Write-behind: {self._pending_count} writes were still pending at shutdown and were lost")
+        return drained
+
+    def get_stats(self):
+        with self._cond:
+            stats = dict(self.stats)
+            stats.update({
+                'pending': self._pending_count,
+                'batch_size': self.batch_size,
+                'max_delay_ms': self.max_delay * 1000
+            })
+        return stats
@@ -5,7 +5,7 @@ import time
 
 print("=== API Functionality Test ===")
 passed = 0
-total = 16
+total = 19
 
 BASE_URL = "http://localhost:5000"
 API_KEY = "jackboys25"
@@ -198,6 +198,34 @@ try:
         return response.status_code == 405
     test_case("Wrong HTTP method handling", test_wrong_method)
 
+    # Test 17: HTML upload (one of the formats from the extractor registry)
+    def test_html_upload():
+        html = (b"<!DOCTYPE html><html><head><style>p {}</style></head><body>"
+                b"<p>This essay was written for the file upload test. It has a few sentences of real text.</p>"
+                b"</body></html>")
+        files = {"file": ("essay.html", html, "text/html")}
+        response = session.post(f"{BASE_URL}/api/detect", files=files)
+        return response.status_code == 200 and response.json().get('success')
+    test_case("HTML file upload", test_html_upload)
+
+    # Test 18: A file whose content doesn't match its extension (should fail)
+    def test_mislabelled_file():
+        files = {"file": ("report.pdf", b"This is plain text pretending to be a PDF file.", "application/pdf")}
+        response = session.post(f"{BASE_URL}/api/detect", files=files)
+        return response.status_code == 400
+    test_case("Mislabelled file rejection", test_mislabelled_file)
+
+    # Test 19: History pages (the form data and HTML tests each added an analysis since the history was cleared)
+    def test_history_pagination():
+        first = session.get(f"{BASE_URL}/api/history", params={"limit": 1}).json()
+        cursor = first.get('next_cursor')
+        if len(first.get('analyses', [])) != 1 or not cursor:
+            return False
+        second = session.get(f"{BASE_URL}/api/history", params={"limit": 1, "cursor": cursor}).json()
+        print(f"  Pages: {first['analyses'][0]['id']} then {second['analyses'][0]['id']}")
+        return second['analyses'][0]['id'] != first['analyses'][0]['id']
+    test_case("History pagination", test_history_pagination)
+
 except Exception as e:
     print(f"TESTING FAILED: Test suite failed with exception: {e}")
 
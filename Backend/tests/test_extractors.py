@@ -0,0 +1,260 @@
+"""
+Test Suite for the Document Extractors
+Tests the RTF, ODT, HTML and Markdown extractors (services/document_extractors.py) and content sniffing
+(services/extractor_registry.py) on small documents built in memory
+
+Every document is also extracted with tiny read and chunk sizes, so tokens, tags and lines that are split
+across reads have to come out the same. No model, database or server is needed.
+
+Usage: python tests/test_extractors.py
+"""
+
+import io
+import sys
+import zipfile
+from pathlib import Path
+
+# Add the project root to Python path so we can import the services
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from services.document_extractors import OdtExtractor, RtfExtractor
+    from services.file_processor import FileProcessor
+except ImportError as e:
+    print(f"Error importing extractors: {e}")
+    sys.exit(1)
+
+TEST_FILES = project_root / 'tests' / 'TestFiles'
+
+ODT_NAMESPACES = (
+    'xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+    'xmlns:style="urn:oasis:names:tc:opendocument:xmlns:style:1.0" '
+    'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"'
+)
+
+
+def make_odt(body, master_page=''):
+    """An OpenDocument text file: mimetype first and uncompressed (that's what sniffing looks for)"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('mimetype', 'application/vnd.oasis.opendocument.text', compress_type=zipfile.ZIP_STORED)
+        archive.writestr('content.xml', (
+            f'<?xml version="1.0" encoding="UTF-8"?><office:document-content {ODT_NAMESPACES}>'
+            f'<office:body><office:text>{body}</office:text></office:body></office:document-content>'
+        ), compress_type=zipfile.ZIP_DEFLATED)
+        archive.writestr('styles.xml', (
+            f'<?xml version="1.0" encoding="UTF-8"?><office:document-styles {ODT_NAMESPACES}>'
+            f'<office:styles><style:style style:name="Standard"/></office:styles>'
+            f'<office:master-styles><style:master-page style:name="Standard">{master_page}</style:master-page>'
+            f'</office:master-styles></office:document-styles>'
+        ), compress_type=zipfile.ZIP_DEFLATED)
+    return buffer.getvalue()
+
+
+class ExtractorTester:
+    def __init__(self):
+        self.passed = 0
+        self.total = 0
+
+    def test_case(self, name, test_func, *args):
+        """Run a test case and track results"""
+        self.total += 1
+        try:
+            if test_func(*args):
+                print(f"pass: {name}")
+                self.passed += 1
+                return True
+            else:
+                print(f"FAIL: {name}")
+                return False
+        except Exception as e:
+            print(f"Failed {name} : Exception: {e}")
+            return False
+
+    def extract(self, filename, data):
+        """(detected format, text) the way an upload is read: sniffed, then extracted in this process.
+        Raises if the text differs when read a few bytes at a time"""
+        file_processor = FileProcessor(sandbox=False)
+        file_type = file_processor.detect_format(io.BytesIO(data), filename)
+        text = ''.join(file_processor.iter_text(io.BytesIO(data), file_type))
+
+        # The same with tiny reads and chunks
+        small = FileProcessor(sandbox=False)
+        small.TEXT_CHUNK_SIZE = 5
+        extractor = {'rtf': RtfExtractor, 'odt': OdtExtractor}.get(file_type)
+        if extractor is not None:
+            extractor = extractor()
+            extractor.READ_SIZE = 3
+            small_text = ''.join(extractor.iter_chunks(small, io.BytesIO(data)))
+        else:
+            small_text = ''.join(small.iter_text(io.BytesIO(data), file_type))
+        if small_text != text:
+            raise AssertionError(f"Small reads gave {small_text!r} instead of {text!r}")
+        return file_type, text
+
+    def check(self, filename, data, expected_type, expected_text):
+        file_type, text = self.extract(filename, data)
+        if file_type != expected_type or text != expected_text:
+            print(f"  Got {file_type}: {text!r}")
+            print(f"  Expected {expected_type}: {expected_text!r}")
+            return False
+        print(f"  {file_type}: {text!r}")
+        return True
+
+    def test_rtf_text_and_groups(self):
+        """Control words that stand for text become text, fonts, colours and \\* groups don't"""
+        data = (
+            rb'{\rtf1\ansi\deff0{\fonttbl{\f0 Arial;}}{\colortbl;\red0\green0\blue0;}'
+            rb'{\*\generator Writer 1.0;}\f0 First\tab line\par '
+            rb'Braces \{ and \} and a back\\slash\emdash done.\par}'
+        )
+        # The space after a control word ends it and isn't text
+        return self.check('essay.rtf', data, 'rtf', 'First\tline\nBraces { and } and a back\\slash—done.\n')
+
+    def test_rtf_binary_data(self):
+        """\\binN skips N raw bytes, even when they look like braces and backslashes or span two reads"""
+        data = (
+            rb'{\rtf1 Before {\pict\wmetafile8\bin6 ' + b'}}{{\\\x00' + rb'}'
+            rb'{\object\bin4 ' + b'\\par' + rb'}after.\bin3 ' + b'{{{' + rb' End\par}'
+        )
+        return self.check('essay.rtf', data, 'rtf', 'Before after. End\n')
+
+    def test_rtf_unicode(self):
+        """\\uN with its fallback dropped (\\ucN), negative values and surrogate pairs"""
+        data = (
+            rb'{\rtf1\ansi It\u8217?s \u-10179?\u-8704? done.\par'
+            rb'{\uc0 No fallback caf\u233  here.} \uc2 Two \u8364XX left.\par}'
+        )
+        return self.check('essay.rtf', data, 'rtf', 'It’s \U0001F600 done.\nNo fallback café here. Two € left.\n')
+
+    def test_rtf_code_pages(self):
+        """\\'hh bytes are decoded in the document's code page, multi-byte code pages included"""
+        cyrillic = rb"{\rtf1\ansi\ansicpg1251 \'cf\'f0\'e8\'e2\'e5\'f2.\par}"
+        japanese = rb"{\rtf1\ansi\ansicpg932 \'82\'a0\'82\'a2.\par}"
+        default = rb"{\rtf1\ansi Caf\'e9.\par}"
+        return (self.check('a.rtf', cyrillic, 'rtf', 'Привет.\n')
+                and self.check('b.rtf', japanese, 'rtf', 'あい.\n')
+                and self.check('c.rtf', default, 'rtf', 'Café.\n'))
+
+    def test_rtf_notes_and_headers(self):
+        """Footnotes, headers and footers come after the body"""
+        data = (
+            rb'{\rtf1 {\header Running head\par}Body text.{\super\chftn}'
+            rb'{\footnote\pard A note.\par}\par More body.\par{\footer Page footer\par}}'
+        )
+        return self.check('essay.rtf', data, 'rtf', 'Body text.\nMore body.\nRunning head\nA note.\nPage footer\n')
+
+    def test_odt(self):
+        """Paragraphs in order with spacing, tabs and line breaks, then notes, then headers and footers"""
+        data = make_odt(
+            '<text:h>A Heading</text:h>'
+            '<text:p>First<text:s text:c="3"/>paragraph<text:note><text:note-citation>1</text:note-citation>'
+            '<text:note-body><text:p>The footnote.</text:p></text:note-body></text:note>.</text:p>'
+            '<office:annotation><text:p>A comment nobody should see.</text:p></office:annotation>'
+            '<text:p>Second<text:tab/>line<text:line-break/>broken.</text:p>',
+            '<style:header><text:p>Page header</text:p></style:header>'
+            '<style:footer-left><text:p>Left footer</text:p></style:footer-left>'
+        )
+        return self.check('essay.odt', data, 'odt', (
+            'A Heading\nFirst   paragraph.\nSecond\tline\nbroken.\nThe footnote.\nPage header\nLeft footer\n'
+        ))
+
+    def test_html(self):
+        """Visible text only, entities decoded, block elements on their own lines, whitespace collapsed"""
+        data = (
+            b'<!DOCTYPE html>\n<html><head><title>Not text</title><style>p { color: red; }</style></head>\n'
+            b'<body><script>var html = "<p>not text</p>";</script><h1>The Title</h1>\n'
+            b'<p>Caf&eacute; &amp; the   owner&#8217;s\n   dog.</p><ul><li>One</li><li>Two</li></ul>'
+            b'<pre>keep   this   spacing</pre>Line<br/>break</body></html>'
+        )
+        return self.check('page.html', data, 'html', (
+            'The Title\n\nCafé & the owner’s dog.\n\nOne\n\nTwo\n\nkeep   this   spacing\nLine\nbreak\n'
+        ))
+
+    def test_markdown(self):
+        """Markdown syntax removed and the words kept, front matter, code blocks and link targets dropped"""
+        data = (
+            b'---\ntitle: My Essay\n---\n'
+            b'# The *Title* #\n\n'
+            b'Some **bold**, _italic_ and `code` with a [link](https://example.com) and snake_case_name.\n'
+            b'![A picture](image.png) and an escaped \\*star\\*.\n\n'
+            b'```python\nprint("not prose")\n```\n'
+            b'- [x] A task\n1. A numbered item\n> A quote\n\n'
+            b'| Name | Value |\n|------|-------|\n| a | 1 |\n\n'
+            b'[ref]: https://example.com\n'
+        )
+        return self.check('essay.md', data, 'md', (
+            'The Title\n\n'
+            'Some bold, italic and code with a link and snake_case_name.\n'
+            'A picture and an escaped *star*.\n\n'
+            'A task\nA numbered item\nA quote\n\n'
+            'Name\tValue\na\t1\n\n'
+        ))
+
+    def test_sniffing(self):
+        """A file is read as what its content is, and rejected if its content can't be what its name says"""
+        file_processor = FileProcessor(sandbox=False)
+        odt = make_odt('<text:p>An ODT document.</text:p>')
+        docx = (TEST_FILES / 'BatchTest.docx').read_bytes()
+        detected = [
+            file_processor.detect_format(io.BytesIO(odt), 'renamed.docx'),
+            file_processor.detect_format(io.BytesIO(docx), 'renamed.odt'),
+            file_processor.detect_format(io.BytesIO(rb'{\rtf1 Text.\par}'), 'notes.txt'),
+            file_processor.detect_format(io.BytesIO(b'<!DOCTYPE html><p>Text.</p>'), 'notes.txt'),
+            file_processor.detect_format(io.BytesIO(b'Just <b>text</b> with a tag.'), 'notes.md'),
+        ]
+        print(f"  Detected: {detected}")
+        if detected != ['odt', 'docx', 'rtf', 'html', 'md']:
+            return False
+
+        rejected = []
+        for filename, data in (('essay.pdf', b'Plain text with a .pdf name'), ('essay.docx', b'PK\x03\x04 not a zip'),
+                               ('essay.md', b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR')):
+            try:
+                file_processor.detect_format(io.BytesIO(data), filename)
+            except ValueError as e:
+                rejected.append(str(e))
+        print(f"  Rejected: {rejected}")
+        return rejected == [
+            'File content is not a valid PDF document',
+            'File content is not a valid DOCX document',
+            "File content doesn't look like a Markdown file",
+        ]
+
+    def run_all_tests(self):
+        """Run all extractor tests"""
+        print("=== Document Extractor Tests ===\n")
+
+        print("--- RTF ---")
+        self.test_case("Text, control symbols and skipped groups", self.test_rtf_text_and_groups)
+        self.test_case("Binary data (\\binN)", self.test_rtf_binary_data)
+        self.test_case("Unicode characters and surrogate pairs", self.test_rtf_unicode)
+        self.test_case("Code pages", self.test_rtf_code_pages)
+        self.test_case("Footnotes, headers and footers", self.test_rtf_notes_and_headers)
+
+        print("\n--- ODT, HTML and Markdown ---")
+        self.test_case("ODT paragraphs, notes, headers and footers", self.test_odt)
+        self.test_case("HTML visible text", self.test_html)
+        self.test_case("Markdown without its syntax", self.test_markdown)
+
+        print("\n--- Content Sniffing ---")
+        self.test_case("Formats detected from content, mislabelled files rejected", self.test_sniffing)
+
+        # Results
+        print(f"\n=== Test Results ===")
+        print(f"Passed: {self.passed}/{self.total}")
+        print(f"Success Rate: {(self.passed/self.total)*100:.1f}%")
+
+        if self.passed == self.total:
+            print("All tests passed!")
+        else:
+            print("Some tests failed... check the output above")
+
+        return self.passed == self.total
+
+
+if __name__ == "__main__":
+    tester = ExtractorTester()
+    success = tester.run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,196 @@
+"""
+Test Suite for the Non-Prose Prefilter
+Tests which lines of extracted text services/prose_filter.py blanks out, and which it has to leave alone
+
+No model, database or server is needed.
+
+Usage: python tests/test_prose_filter.py
+"""
+
+import sys
+from pathlib import Path
+
+# Add the project root to Python path so we can import the services
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from services.prose_filter import ProseFilter
+except ImportError as e:
+    print(f"Error importing prose filter: {e}")
+    sys.exit(1)
+
+
+class ProseFilterTester:
+    def __init__(self):
+        self.passed = 0
+        self.total = 0
+        self.prose_filter = ProseFilter()
+
+    def test_case(self, name, test_func, *args):
+        """Run a test case and track results"""
+        self.total += 1
+        try:
+            if test_func(*args):
+                print(f"pass: {name}")
+                self.passed += 1
+                return True
+            else:
+                print(f"FAIL: {name}")
+                return False
+        except Exception as e:
+            print(f"Failed {name} : Exception: {e}")
+            return False
+
+    def skipped_lines(self, text):
+        """(filtered text, {stripped line: reason} for every line that was blanked)"""
+        filtered, report = self.prose_filter.filter_text(text)
+        if len(filtered) != len(text):
+            raise AssertionError("Filtering changed the length of the text, offsets would be wrong")
+        reasons = {}
+        for segment in report['segments']:
+            line = text[segment['offset']:segment['offset'] + segment['length']]
+            if filtered[segment['offset']:segment['offset'] + segment['length']].strip():
+                raise AssertionError(f"Segment {line!r} is reported but wasn't blanked")
+            reasons[line.strip()] = segment['reason']
+        return filtered, reasons
+
+    def check(self, text, expected_skipped):
+        """Exactly the lines in expected_skipped ({line: reason}) are blanked, for whole and streamed text"""
+        filtered, reasons = self.skipped_lines(text)
+        if reasons != expected_skipped:
+            print(f"  Skipped {reasons}")
+            print(f"  Expected {expected_skipped}")
+            return False
+        # Streamed in small pieces (lines split across chunks) the result is the same
+        for size in (1, 7, 64):
+            report = {}
+            streamed = ''.join(self.prose_filter.filter_stream((text[i:i + size] for i in range(0, len(text), size)), report))
+            if streamed != filtered or report['count'] != len(expected_skipped):
+                print(f"  Streaming in {size} character chunks gave a different result")
+                return False
+        print(f"  {len(reasons)} lines skipped: {sorted(set(reasons.values()))}")
+        return True
+
+    def test_page_numbers(self):
+        """Bare page numbers are skipped, sentences with numbers in them aren't"""
+        text = (
+            "The survey ran over three weeks in March.\n"
+            "12\n"
+            "Page 3\n"
+            "- 4 -\n"
+            "5 of 12\n"
+            "There were 12 questions in total.\n"
+        )
+        return self.check(text, {'12': 'page_number', 'Page 3': 'page_number', '- 4 -': 'page_number',
+                                 '5 of 12': 'page_number'})
+
+    def test_running_headers(self):
+        """A short line repeated on every page is skipped, whatever its page number"""
+        sentences = ["The study began with a survey.", "Most answers came in the first week.",
+                     "A few students answered twice.", "Those duplicates were removed."]
+        pages = [f"Thesis Title - {number}\n{sentence}\n" for number, sentence in enumerate(sentences, 1)]
+        filtered, reasons = self.skipped_lines(''.join(pages))
+        headers = [line for line, reason in reasons.items() if reason == 'running_header']
+        print(f"  Running headers: {headers}")
+        return headers == [f"Thesis Title - {number}" for number in range(1, 5)] and all(sentence in filtered for sentence in sentences)
+
+    def test_references(self):
+        """A reference list is skipped up to the next section heading, wrapped entries included"""
+        text = (
+            "The conclusion is written in prose.\n"
+            "\n"
+            "References\n"
+            "Smith, J. (2020). A study of things. Journal of\n"
+            "Stuff, 12(3), 45-67.\n"
+            "Press\n"
+            "\n"
+            "Appendix A\n"
+            "The appendix has prose that should be kept for analysis.\n"
+        )
+        return self.check(text, {'References': 'references', 'Smith, J. (2020). A study of things. Journal of': 'references',
+                                 'Stuff, 12(3), 45-67.': 'references', 'Press': 'references'})
+
+    def test_citations_and_urls(self):
+        """Citation-looking lines and lines that are mostly a link are skipped outside a reference list too"""
+        text = (
+            "Earlier work looked at the same question.\n"
+            "[4] A. Author. A title of a paper.\n"
+            "https://example.com/a/long/path/to/the/dataset\n"
+            "We used the same method as they did.\n"
+        )
+        return self.check(text, {'[4] A. Author. A title of a paper.': 'references',
+                                 'https://example.com/a/long/path/to/the/dataset': 'url'})
+
+    def test_numeric_table(self):
+        """Rows of a table after a finished sentence are skipped (shaped differently, or they'd be running headers)"""
+        text = (
+            "The results for each year are shown below.\n"
+            "2019  45.2  3.1%\n"
+            "2020  147.9  15.9%\n"
+            "2021  51  6.5%\n"
+            "The trend is clear over the period.\n"
+        )
+        return self.check(text, {'2019  45.2  3.1%': 'numeric', '2020  147.9  15.9%': 'numeric',
+                                 '2021  51  6.5%': 'numeric'})
+
+    def test_numeric_wrapped_sentence(self):
+        """The wrapped end of a sentence that is mostly numbers stays, so the sentence keeps its full stop"""
+        text = (
+            "Over the five years the number of students grew\n"
+            "by 12.5% to 3,400 in 2021.\n"
+            "Most of them studied part time.\n"
+        )
+        filtered, reasons = self.skipped_lines(text)
+        print(f"  Skipped: {reasons}")
+        return not reasons and filtered == text and self.check(text, {})
+
+    def test_numeric_needs_neighbours(self):
+        """A single numeric line between two sentences is left alone, in its own paragraph it's skipped"""
+        between = (
+            "The figures for the first quarter were these.\n"
+            "45.2  3.1%  12\n"
+            "They were higher than expected.\n"
+        )
+        alone = (
+            "The figures for the first quarter were these.\n"
+            "45.2  3.1%  12\n"
+            "\n"
+            "They were higher than expected.\n"
+        )
+        return self.check(between, {}) and self.check(alone, {'45.2  3.1%  12': 'numeric'})
+
+    def run_all_tests(self):
+        """Run all prose filter tests"""
+        print("=== Prose Filter Tests ===\n")
+
+        print("--- Page Numbers and Headers ---")
+        self.test_case("Page numbers", self.test_page_numbers)
+        self.test_case("Running headers", self.test_running_headers)
+
+        print("\n--- References ---")
+        self.test_case("Reference list ends at the next section", self.test_references)
+        self.test_case("Citations and URLs", self.test_citations_and_urls)
+
+        print("\n--- Numbers ---")
+        self.test_case("Table rows skipped", self.test_numeric_table)
+        self.test_case("Wrapped sentence kept", self.test_numeric_wrapped_sentence)
+        self.test_case("Lone numeric line depends on its neighbours", self.test_numeric_needs_neighbours)
+
+        # Results
+        print(f"\n=== Test Results ===")
+        print(f"Passed: {self.passed}/{self.total}")
+        print(f"Success Rate: {(self.passed/self.total)*100:.1f}%")
+
+        if self.passed == self.total:
+            print("All tests passed!")
+        else:
+            print("Some tests failed... check the output above")
+
+        return self.passed == self.total
+
+
+if __name__ == "__main__":
+    tester = ProseFilterTester()
+    success = tester.run_all_tests()
+    sys.exit(0 if success else 1)
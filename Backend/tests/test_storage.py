@@ -0,0 +1,592 @@
+"""
+Test Suite for Session Storage
+Tests SQLiteManager and the services around it (write-behind queue, fallback store) without the API or the model
+
+Everything runs against throwaway databases in a temporary folder, so sessions.db is never touched.
+
+Usage: python tests/test_storage.py
+"""
+
+import datetime
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the project root to Python path so we can import the services
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# The services open their default database (sessions.db) in the current folder when they're imported
+work_dir = tempfile.mkdtemp(prefix='storage-tests-')
+os.chdir(work_dir)
+
+try:
+    from benchmarks import sample_data
+    from services.fallback_store import FallbackStore
+    from services.serialization import RecordSerializer, msgpack
+    from services.session_cache import SessionCache
+    from services.session_maintenance import SessionMaintenance
+    from services.sqlite_manager import SQLiteManager
+    # Imported after the services: it turns SQLITE_AUTO_MIGRATE off, which the other tests rely on being on
+    import migrate_sessions
+except ImportError as e:
+    print(f"Error importing storage services: {e}")
+    sys.exit(1)
+
+
+def make_analysis(number, sentences=3):
+    """An analysis shaped like the ones /api/detect stores (benchmarks/sample_data.py), the same for the same number"""
+    return sample_data.make_analysis(
+        random.Random(number), sentences, datetime.datetime(2025, 1, 1) + datetime.timedelta(minutes=number)
+    )
+
+
+def make_v1_database(db_path, sessions):
+    """A database as it looked before the analyses table: each session's history is a JSON list in session_data"""
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE sessions (
+            session_id TEXT PRIMARY KEY,
+            session_data TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    for session_id, analyses in sessions.items():
+        session_data = {'created_at': datetime.datetime(2025, 1, 1), 'analyses': analyses}
+        conn.execute(
+            'INSERT INTO sessions (session_id, session_data) VALUES (?, ?)',
+            (session_id, json.dumps(session_data, default=lambda value: value.isoformat()))
+        )
+    conn.commit()
+    conn.close()
+
+
+def make_v3_database(db_path, session_id, analyses):
+    """A version 3 database: whole analyses in analysis_data, plus their summaries in summary_data
+    (left empty for every other analysis, like rows stored by version 2)"""
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE sessions (
+            session_id TEXT PRIMARY KEY,
+            session_data TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE analyses (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            analysis_id TEXT NOT NULL UNIQUE,
+            session_id TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            analysis_data TEXT NOT NULL,
+            summary_data TEXT
+        )
+    ''')
+    encode = lambda record: json.dumps(record, default=lambda value: value.isoformat())
+    conn.execute('INSERT INTO sessions (session_id, session_data) VALUES (?, ?)',
+                 (session_id, encode({'created_at': datetime.datetime(2025, 1, 1)})))
+    for number, analysis in enumerate(analyses):
+        summary = {key: value for key, value in analysis.items() if key not in SQLiteManager.DETAIL_FIELDS}
+        conn.execute('''
+            INSERT INTO analyses (analysis_id, session_id, timestamp, analysis_data, summary_data) VALUES (?, ?, ?, ?, ?)
+        ''', (analysis['id'], session_id, analysis['timestamp'].isoformat(), encode(analysis),
+              encode(summary) if number % 2 == 0 else None))
+    conn.execute('PRAGMA user_version = 3')
+    conn.commit()
+    conn.close()
+
+
+class StorageTester:
+    def __init__(self):
+        self.passed = 0
+        self.total = 0
+        self.databases = 0
+
+    def test_case(self, name, test_func, *args):
+        """Run a test case and track results"""
+        self.total += 1
+        try:
+            if test_func(*args):
+                print(f"pass: {name}")
+                self.passed += 1
+                return True
+            else:
+                print(f"FAIL: {name}")
+                return False
+        except Exception as e:
+            print(f"Failed {name} : Exception: {e}")
+            return False
+
+    def new_db_path(self):
+        """A fresh database file for one test"""
+        self.databases += 1
+        return os.path.join(work_dir, f"test{self.databases}.db")
+
+    def check_migrated(self, manager, sessions):
+        """Every session's history came across whole and in its original order"""
+        for session_id, analyses in sessions.items():
+            session = manager.get_session(session_id)
+            migrated = session['analyses'] if session else []
+            if [analysis['id'] for analysis in migrated] != [analysis['id'] for analysis in analyses]:
+                print(f"  Session {session_id} has {len(migrated)} of {len(analyses)} analyses, or in the wrong order")
+                return False
+            if any(a['sentence_analysis'] != b['sentence_analysis'] or a['timestamp'] != b['timestamp']
+                   for a, b in zip(migrated, analyses)):
+                print(f"  Session {session_id} changed during the migration")
+                return False
+            if not isinstance(session['created_at'], datetime.datetime):
+                return False
+        return True
+
+    def test_migration_on_open(self):
+        """A version 1 database is converted to the current schema when SQLiteManager opens it"""
+        db_path = self.new_db_path()
+        # Same timestamp twice: seq keeps them in the order they were in the list
+        analyses = [make_analysis(number) for number in (1, 2, 2, 3)]
+        sessions = {'first': analyses[:3], 'second': analyses[3:], 'empty': []}
+        make_v1_database(db_path, sessions)
+
+        manager = SQLiteManager(db_path)
+        conn = sqlite3.connect(db_path)
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        leftover = [row[0] for row in conn.execute('SELECT session_data FROM sessions') if 'analyses' in json.loads(row[0])]
+        conn.close()
+        print(f"  Schema version {version}, {len(leftover)} history lists left in session_data")
+        return version == SQLiteManager.SCHEMA_VERSION and not leftover and self.check_migrated(manager, sessions)
+
+    def test_migration_tool(self):
+        """migrate_sessions.py backs up a version 1 database, migrates it, and does nothing the second time"""
+        db_path = self.new_db_path()
+        sessions = {f"session{number}": [make_analysis(number * 10 + index) for index in range(5)] for number in range(4)}
+        # The same analysis in two sessions is stored once and reported as a duplicate
+        sessions['copy'] = [sessions['session0'][0]]
+        make_v1_database(db_path, sessions)
+
+        if migrate_sessions.main([db_path, '--dry-run']) != 0 or migrate_sessions.count_legacy_analyses(db_path)[1] != 5:
+            print("  The dry run changed the database")
+            return False
+        if migrate_sessions.main([db_path]) != 0:
+            return False
+        backup_sessions = migrate_sessions.count_legacy_analyses(f"{db_path}.v0-backup")[1]
+        if backup_sessions != 5:
+            print(f"  The backup has {backup_sessions} sessions in the old layout")
+            return False
+        if migrate_sessions.main([db_path]) != 0:
+            return False
+
+        del sessions['copy']
+        return self.check_migrated(SQLiteManager(db_path, auto_migrate=False), sessions)
+
+    def test_serializer_round_trip(self):
+        """Only the timestamp fields come back as datetimes, whichever encoder or storage format wrote the record"""
+        analysis = make_analysis(1)
+        # Strings that look like dates stay strings
+        analysis['filename'] = '20240301'
+        analysis['sentence_analysis'][0]['sentence'] = '2025-01-01T10:00:00'
+        session = {'created_at': datetime.datetime(2025, 1, 1, 9, 30), 'analyses': [analysis]}
+
+        serializers = [RecordSerializer('json'), RecordSerializer('json', use_orjson=False)]
+        if msgpack is not None:
+            serializers.append(RecordSerializer('msgpack'))
+        else:
+            print("  msgpack not installed, only checking json")
+        reader = serializers[-1]
+        for serializer in serializers:
+            # Any serializer reads what any other wrote
+            loaded = reader.session_datetimes(reader.decode(serializer.encode(session)))
+            if loaded != session:
+                print(f"  {serializer.get_stats()['encoder']} round trip changed the session: {loaded}")
+                return False
+            if serializer.snapshot(analysis)['timestamp'] != analysis['timestamp'].isoformat():
+                return False
+        return True
+
+    def test_stored_analysis_round_trip(self):
+        """An analysis read back from SQLite equals the one that was stored"""
+        manager = SQLiteManager(self.new_db_path())
+        analysis = make_analysis(1, sentences=50)
+        analysis['filename'] = '20240301'
+        manager.update_session_analyses('session', analysis)
+
+        stored = manager.get_analysis('session', analysis['id'])
+        from_session = manager.get_session('session')['analyses'][0]
+        summary = manager.get_history_page('session', 10)['analyses'][0]
+        expected_summary = {key: value for key, value in analysis.items() if key not in SQLiteManager.DETAIL_FIELDS}
+        return stored == analysis and from_session == analysis and summary == expected_summary
+
+    def test_session_cache_write_through(self):
+        """Every write updates or drops the cached session, so a cached read never returns an older state"""
+        cache = SessionCache(16)
+        manager = SQLiteManager(self.new_db_path(), session_cache=cache)
+        manager.update_session_analyses('session', make_analysis(1))
+
+        def total():
+            return manager.get_session_info('session')['total_analyses']
+
+        checks = [('first read', total(), 1)]
+        manager.update_session_analyses('session', make_analysis(2))
+        checks.append(('after adding', total(), 2))
+        misses = cache.get_stats()['misses']
+        manager.add_analyses([('session', make_analysis(3))])
+        checks.append(('after a batch', total(), 3))
+        manager.clear_session_analyses('session')
+        checks.append(('after clearing', total(), 0))
+        manager.store_session('session', {'created_at': datetime.datetime(2025, 1, 1), 'analyses': [make_analysis(4)]})
+        checks.append(('after replacing', total(), 1))
+        manager.delete_session('session')
+        checks.append(('after deleting', manager.get_session_info('session'), None))
+
+        stats = cache.get_stats()
+        for name, got, expected in checks:
+            if got != expected:
+                print(f"  {name}: {got}, expected {expected}")
+                return False
+        # Adding updated the cached entry in place; the batch, clear, replace and delete dropped it
+        print(f"  {stats['hits']} hits, {stats['misses']} misses, {stats['invalidations']} invalidations")
+        return misses == 1 and stats['invalidations'] == 4
+
+    def test_session_cache_stale_load(self):
+        """A load that read the database before a write isn't cached over the write"""
+        cache = SessionCache(16)
+
+        def stale_loader():
+            # The session changes while it's being read
+            cache.invalidate('session')
+            return 'old'
+        first = cache.get_or_load('session', stale_loader)
+        second = cache.get_or_load('session', lambda: 'new')
+        third = cache.get_or_load('session', lambda: 'newer')
+        return (first, second, third) == ('old', 'new', 'new') and cache.get_stats()['stale_loads'] == 1
+
+    def test_details_blob(self):
+        """pack_details compresses sentence details and unpack_details gives them back, whatever format wrote them"""
+        details = {'sentence_analysis': make_analysis(1, sentences=200)['sentence_analysis'], 'skipped_segments': None}
+        serializer = RecordSerializer('json')
+        blob = serializer.pack_details(details)
+        size = len(serializer.encode(details))
+        print(f"  {size} bytes of JSON packed into {len(blob)}")
+        if blob[:1] != b'j' or serializer.unpack_details(blob) != details or len(blob) * 4 > size:
+            return False
+        if msgpack is not None:
+            # Details written with SQLITE_STORAGE_FORMAT=msgpack can still be read after switching back to json
+            packed = RecordSerializer('msgpack').pack_details(details)
+            return packed[:1] == b'm' and serializer.unpack_details(packed) == details
+        print("  msgpack not installed, only checking json")
+        return True
+
+    def test_migration_v3_to_v4(self):
+        """A version 3 database reads correctly before it's migrated, and migrating moves the details out"""
+        db_path = self.new_db_path()
+        analyses = [make_analysis(number, sentences=20) for number in range(6)]
+        make_v3_database(db_path, 'session', analyses)
+        summaries = [{key: value for key, value in analysis.items() if key not in SQLiteManager.DETAIL_FIELDS}
+                     for analysis in reversed(analyses)]
+
+        def reads_correctly(manager):
+            whole = [manager.get_analysis('session', analysis['id']) for analysis in analyses]
+            return whole == analyses and manager.get_history_page('session', 10)['analyses'] == summaries
+
+        # SQLITE_AUTO_MIGRATE=0: the old rows are read as they are
+        if not reads_correctly(SQLiteManager(db_path, auto_migrate=False)):
+            print("  Unmigrated version 3 rows read wrong")
+            return False
+
+        manager = SQLiteManager(db_path, auto_migrate=True)
+        conn = sqlite3.connect(db_path)
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        summary_rows = conn.execute('SELECT COUNT(*) FROM analyses WHERE summary_data IS NOT NULL').fetchone()[0]
+        inline = sum(1 for (data,) in conn.execute('SELECT analysis_data FROM analyses') if 'sentence_analysis' in json.loads(data))
+        details = conn.execute('SELECT COUNT(*) FROM analysis_details').fetchone()[0]
+        conn.close()
+        print(f"  Version {version}: {details} detail blobs, {inline} rows with inline details, {summary_rows} summaries left")
+        if (version, details, inline, summary_rows) != (SQLiteManager.SCHEMA_VERSION, len(analyses), 0, 0):
+            return False
+        if not reads_correctly(manager):
+            print("  Migrated rows read wrong")
+            return False
+
+        # The trigger deletes the details with their analyses
+        manager.clear_session_analyses('session')
+        left = manager._pool.run(lambda conn: conn.execute('SELECT COUNT(*) FROM analysis_details').fetchone()[0])
+        return left == 0
+
+    def test_updated_at_is_utc(self):
+        """Touching and expiry compare updated_at in UTC, like the CURRENT_TIMESTAMP default, in any time zone"""
+        # Far from UTC, so a local time on either side of a comparison is off by hours
+        previous_tz = os.environ.get('TZ')
+        os.environ['TZ'] = 'Pacific/Kiritimati'  # UTC+14
+        time.tzset()
+        try:
+            manager = SQLiteManager(self.new_db_path(), session_cache=SessionCache(0))
+            def set_updated_at(session_id, sql_time):
+                manager._pool.run(lambda conn: conn.execute(
+                    f"UPDATE sessions SET updated_at = {sql_time} WHERE session_id = ?", (session_id,)
+                ), write=True)
+            def updated_at(session_id):
+                return manager._pool.run(lambda conn: conn.execute(
+                    'SELECT updated_at FROM sessions WHERE session_id = ?', (session_id,)
+                ).fetchone()[0])
+
+            # Written by this code and by the column default, both in UTC
+            manager.update_session_analyses('added', make_analysis(1))
+            manager._pool.run(lambda conn: conn.execute(
+                "INSERT INTO sessions (session_id, session_data) VALUES ('defaulted', '{}')"
+            ), write=True)
+            utc_now = manager._pool.run(lambda conn: conn.execute("SELECT datetime('now')").fetchone()[0])
+            if abs(time.mktime(time.strptime(updated_at('added'), '%Y-%m-%d %H:%M:%S')) -
+                   time.mktime(time.strptime(utc_now, '%Y-%m-%d %H:%M:%S'))) > 60:
+                print(f"  updated_at {updated_at('added')} isn't UTC (now is {utc_now} UTC)")
+                return False
+
+            # A recent session isn't rewritten on every request, one idle for longer than TOUCH_INTERVAL is
+            set_updated_at('defaulted', "datetime('now', '-1 minutes')")
+            recent = updated_at('defaulted')
+            manager.get_session_info('defaulted', touch=True)
+            set_updated_at('added', "datetime('now', '-10 minutes')")
+            idle = updated_at('added')
+            manager.get_session_info('added', touch=True)
+            print(f"  Touched: recent {updated_at('defaulted') != recent}, idle {updated_at('added') != idle}")
+            if updated_at('defaulted') != recent or updated_at('added') <= idle:
+                return False
+
+            # Only the session idle for longer than the TTL expires
+            set_updated_at('defaulted', "datetime('now', '-2 hours')")
+            set_updated_at('added', "datetime('now', '-30 minutes')")
+            reclaimed = SessionMaintenance(manager, ttl_hours=1, max_history=0).run_once()
+            left = [session['session_id'] for session in manager.get_all_sessions()]
+            print(f"  Expired {reclaimed['sessions_expired']}, left {left}")
+            return reclaimed['sessions_expired'] == 1 and left == ['added']
+        finally:
+            if previous_tz is None:
+                os.environ.pop('TZ', None)
+            else:
+                os.environ['TZ'] = previous_tz
+            time.tzset()
+
+    def test_write_behind_failure_goes_to_fallback(self):
+        """A write-behind analysis that can't be committed ends up in the fallback store, then in SQLite"""
+        db_path = self.new_db_path()
+        manager = SQLiteManager(db_path, write_behind=True)
+        store = FallbackStore(manager, log_path=db_path + '-fallback.log', replay_interval=3600)
+
+        # Make every insert fail, like a database that has stopped accepting writes
+        manager._pool.run(lambda conn: conn.execute('''
+            CREATE TRIGGER fail_inserts BEFORE INSERT ON analyses BEGIN SELECT RAISE(ABORT, 'disk full'); END
+        '''), write=True)
+        analysis = make_analysis(1)
+        if not manager.update_session_analyses('session', analysis):
+            print("  The analysis wasn't queued")
+            return False
+        manager.flush_writes(timeout=10)
+
+        stats = manager.get_write_behind_stats()
+        kept = [entry['id'] for entry in store.get_analyses('session')]
+        print(f"  Write-behind: failed {stats['failed']}, handed off {stats['handed_off']}, lost {stats['lost']}")
+        if kept != [analysis['id']] or stats['lost'] or not os.path.exists(store.log_path):
+            print(f"  Fallback store has {kept}")
+            return False
+
+        # Once the database takes writes again, the replay stores it
+        manager._pool.run(lambda conn: conn.execute('DROP TRIGGER fail_inserts'), write=True)
+        if not store.replay():
+            return False
+        stored = manager.get_analysis('session', analysis['id'])
+        return stored is not None and stored['sentence_analysis'] == analysis['sentence_analysis']
+
+    def read_all_pages(self, manager, session_id, limit, unstored=None):
+        """Every page of a session's history: (analysis IDs in page order, total_analyses of each page)"""
+        ids, totals, cursor = [], [], None
+        while True:
+            page = manager.get_history_page(session_id, limit, cursor, unstored)
+            ids.extend(analysis['id'] for analysis in page['analyses'])
+            totals.append(page['total_analyses'])
+            cursor = page['next_cursor']
+            if not cursor:
+                return ids, totals
+
+    def test_history_pages_with_pending(self):
+        """More queued write-behind analyses than fit on one page all show up, in order, with the same total"""
+        # A long batching delay keeps the analyses queued until the history read asks for them
+        manager = SQLiteManager(self.new_db_path(), write_behind=True)
+        manager._write_behind.max_delay = 5
+        analyses = [make_analysis(number) for number in range(25)]
+        manager.add_analyses([('session', analysis) for analysis in analyses[:5]])
+        for analysis in analyses[5:]:
+            manager.update_session_analyses('session', analysis)
+
+        ids, totals = self.read_all_pages(manager, 'session', 10)
+        expected = [analysis['id'] for analysis in reversed(analyses)]
+        print(f"  {len(ids)} analyses over {len(totals)} pages, totals {totals}")
+        return ids == expected and set(totals) == {25}
+
+    def test_history_pages_with_unstored(self):
+        """Analyses that aren't in SQLite (the fallback store's) are paged in timestamp order like stored ones"""
+        manager = SQLiteManager(self.new_db_path())
+        analyses = [make_analysis(number) for number in range(20)]
+        # Every third one "couldn't be stored"
+        unstored = [analysis for number, analysis in enumerate(analyses) if number % 3 == 0]
+        manager.add_analyses([('session', analysis) for number, analysis in enumerate(analyses) if number % 3])
+
+        ids, totals = self.read_all_pages(manager, 'session', 4, unstored)
+        expected = [analysis['id'] for analysis in reversed(analyses)]
+        print(f"  {len(ids)} analyses over {len(totals)} pages, totals {totals}")
+        return ids == expected and set(totals) == {20}
+
+    def test_discard_fallback_session(self):
+        """Discarding a session drops its fallback analyses from memory and the log, and leaves other sessions alone"""
+        db_path = self.new_db_path()
+        manager = SQLiteManager(db_path)
+        store = FallbackStore(manager, log_path=db_path + '-fallback.log', replay_interval=3600)
+        cleared = [make_analysis(number) for number in range(3)]
+        kept = make_analysis(3)
+        # The first add starts a replay, held off until the session has been cleared
+        with store.replay_paused():
+            for analysis in cleared:
+                store.add('cleared', analysis)
+            store.add('kept', kept)
+
+            # Like /api/clear-history
+            manager.clear_session_analyses('cleared')
+            discarded = store.discard('cleared')
+        print(f"  Discarded {discarded}, {store.get_stats()['analyses']} left in memory")
+        if discarded != 3 or store.get_analyses('cleared'):
+            return False
+
+        # The replay only writes the other session
+        if not store.replay():
+            return False
+        stored_cleared = manager.get_history_page('cleared', 10)['total_analyses']
+        stored_kept = [analysis['id'] for analysis in manager.get_history_page('kept', 10)['analyses']]
+        print(f"  After the replay: {stored_cleared} in the cleared session, {stored_kept == [kept['id']]} for the other")
+        return stored_cleared == 0 and stored_kept == [kept['id']] and not os.path.exists(store.log_path)
+
+    def test_replay_in_batches(self):
+        """Each batch is cut off the log once it's committed, so a failed replay only retries what's left"""
+        db_path = self.new_db_path()
+        manager = SQLiteManager(db_path)
+        store = FallbackStore(manager, log_path=db_path + '-fallback.log', replay_interval=3600)
+        store.REPLAY_BATCH_SIZE = 2
+        analyses = [make_analysis(number) for number in range(5)]
+        with store.replay_paused():
+            # What a crash in the middle of a write leaves behind
+            with open(store.log_path, 'wb') as log:
+                log.write(b'{"session_id": "cut')
+            for analysis in analyses:
+                store.add('session', analysis)
+
+            # The database gives out after the first batch
+            add_analyses = manager.add_analyses
+            calls = []
+
+            def failing_add_analyses(entries):
+                calls.append(len(entries))
+                if len(calls) > 1:
+                    raise sqlite3.OperationalError('disk full')
+                return add_analyses(entries)
+
+            manager.add_analyses = failing_add_analyses
+            if store.replay():
+                return False
+        stats = store.get_stats()
+        with open(store.log_path, 'rb') as log:
+            left = [json.loads(line)['analysis']['id'] for line in log]
+        stored = [analysis['id'] for analysis in reversed(manager.get_history_page('session', 10)['analyses'])]
+        print(f"  After the failure: {len(stored)} stored, {len(left)} left in the log, {stats['analyses']} in memory, "
+              f"{stats['bad_lines']} bad line")
+        # The cut-off line and the first analysis made up the first batch
+        expected = [analysis['id'] for analysis in analyses]
+        if stored != expected[:1] or left != expected[1:] or stats['analyses'] != 4 or stats['bad_lines'] != 1:
+            return False
+
+        # The next replay writes the rest and removes the log
+        manager.add_analyses = add_analyses
+        if not store.replay():
+            return False
+        stored = [analysis['id'] for analysis in reversed(manager.get_history_page('session', 10)['analyses'])]
+        print(f"  After the retry: {len(stored)} stored, {store.get_stats()['replayed']} replayed")
+        return stored == expected and not os.path.exists(store.log_path) and store.get_stats()['analyses'] == 0
+
+    def test_fallback_log_is_capped(self):
+        """Once the log is full, add() refuses analyses instead of growing it, and takes them again after a replay"""
+        db_path = self.new_db_path()
+        manager = SQLiteManager(db_path)
+        store = FallbackStore(manager, log_path=db_path + '-fallback.log', replay_interval=3600)
+        analyses = [make_analysis(number) for number in range(3)]
+        with store.replay_paused():
+            store.add('session', analyses[0])
+            store.add('session', analyses[1])
+            # Full with those two
+            store.max_log_bytes = os.path.getsize(store.log_path)
+            refused = not store.add('session', analyses[2])
+        stats = store.get_stats()
+        print(f"  Third analysis refused: {refused}, rejected {stats['rejected']}, "
+              f"{stats['log_bytes']} of {stats['max_log_bytes']} bytes, {stats['analyses']} in memory")
+        if not refused or stats['rejected'] != 1 or stats['log_bytes'] != store.max_log_bytes or stats['analyses'] != 2:
+            return False
+
+        # A replay empties the log, so there's room again
+        with store.replay_paused():
+            if not store.replay():
+                return False
+            return store.add('session', analyses[2]) and store.get_stats()['analyses'] == 1
+
+    def run_all_tests(self):
+        """Run all storage tests"""
+        print("=== Session Storage Tests ===")
+        print(f"Databases in: {work_dir}\n")
+
+        print("--- Migration ---")
+        self.test_case("Version 1 database migrated when opened", self.test_migration_on_open)
+        self.test_case("migrate_sessions.py on a version 1 database", self.test_migration_tool)
+
+        print("\n--- Serialization ---")
+        self.test_case("Serializer round trip (json, orjson, msgpack)", self.test_serializer_round_trip)
+        self.test_case("Stored analysis round trip", self.test_stored_analysis_round_trip)
+
+        print("\n--- Sentence Details ---")
+        self.test_case("Compressed details blob", self.test_details_blob)
+        self.test_case("Version 3 database read and migrated to version 4", self.test_migration_v3_to_v4)
+
+        print("\n--- Session Cache ---")
+        self.test_case("Writes update or drop the cached session", self.test_session_cache_write_through)
+        self.test_case("Loads that went stale aren't cached", self.test_session_cache_stale_load)
+
+        print("\n--- Session Expiry ---")
+        self.test_case("updated_at compared in UTC", self.test_updated_at_is_utc)
+
+        print("\n--- Write-Behind ---")
+        self.test_case("Failed write-behind commit goes to the fallback store", self.test_write_behind_failure_goes_to_fallback)
+
+        print("\n--- History Pages ---")
+        self.test_case("Pending write-behind analyses across pages", self.test_history_pages_with_pending)
+        self.test_case("Unstored analyses across pages", self.test_history_pages_with_unstored)
+
+        print("\n--- Fallback Store ---")
+        self.test_case("Clearing a session discards its fallback analyses", self.test_discard_fallback_session)
+        self.test_case("Replay cuts each committed batch off the log", self.test_replay_in_batches)
+        self.test_case("Full log refuses new analyses", self.test_fallback_log_is_capped)
+
+        # Results
+        print(f"\n=== Test Results ===")
+        print(f"Passed: {self.passed}/{self.total}")
+        print(f"Success Rate: {(self.passed/self.total)*100:.1f}%")
+
+        if self.passed == self.total:
+            print("All tests passed!")
+        else:
+            print("Some tests failed... check the output above")
+
+        return self.passed == self.total
+
+
+if __name__ == "__main__":
+    tester = StorageTester()
+    success = tester.run_all_tests()
+    sys.exit(0 if success else 1)
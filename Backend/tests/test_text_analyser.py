@@ -0,0 +1,192 @@
+"""
+Test Suite for Sampling Mode
+Tests TextAnalyser's stratified sample, its bootstrap confidence intervals and when it stops sampling
+
+The model is replaced by a scripted one (a probability per sentence), so no model files or torch are needed
+and every run gives the same numbers.
+
+Usage: python tests/test_text_analyser.py
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to Python path so we can import the services
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from services.text_analyser import TextAnalyser
+except ImportError as e:
+    print(f"Error importing text analyser: {e}")
+    sys.exit(1)
+
+
+class ScriptedModel:
+    """Stands in for AIDetectionModel: probability(sentence) decides each sentence's ai_probability"""
+    model_version = 'scripted'
+
+    def __init__(self, probability):
+        self.probability = probability
+
+    def predict(self, text):
+        ai_probability = self.probability(text)
+        return {'ai_probability': ai_probability, 'human_probability': 1 - ai_probability,
+                'confidence': max(ai_probability, 1 - ai_probability)}
+
+
+def make_analyser(probability):
+    analyser = TextAnalyser()
+    analyser._model = ScriptedModel(probability)
+    return analyser
+
+
+def make_document(paragraphs, sentences_per_paragraph):
+    """Paragraphs of numbered sentences: 'Sentence 7 of paragraph 2 is here.'"""
+    return '\n\n'.join(
+        ' '.join(f"Sentence {number} of paragraph {paragraph} is here." for number in range(sentences_per_paragraph))
+        for paragraph in range(paragraphs)
+    )
+
+
+def sentence_number(sentence):
+    return int(sentence.split()[1])
+
+
+def make_results(values):
+    """Sentence results (index, ai_probability) like analyse_sentence returns them"""
+    return [{'index': index, 'result': {'ai_probability': value}} for index, value in values]
+
+
+class TextAnalyserTester:
+    def __init__(self):
+        self.passed = 0
+        self.total = 0
+
+    def test_case(self, name, test_func, *args):
+        """Run a test case and track results"""
+        self.total += 1
+        try:
+            if test_func(*args):
+                print(f"pass: {name}")
+                self.passed += 1
+                return True
+            else:
+                print(f"FAIL: {name}")
+                return False
+        except Exception as e:
+            print(f"Failed {name} : Exception: {e}")
+            return False
+
+    def test_bootstrap_interval(self):
+        """A percentile bootstrap of [0, 1] spans [0, 1], of identical values is a single point, and is repeatable"""
+        analyser = TextAnalyser()
+        spread = analyser.bootstrap_interval({0: [0.0, 1.0]}, {0: 1.0}, random.Random(1))
+        same = analyser.bootstrap_interval({0: [0.5, 0.5, 0.5]}, {0: 1.0}, random.Random(1))
+        values = {0: [0.1, 0.4, 0.8], 1: [0.2, 0.9]}
+        weights = {0: 0.25, 1: 0.75}
+        first = analyser.bootstrap_interval(values, weights, random.Random(5))
+        second = analyser.bootstrap_interval(values, weights, random.Random(5))
+        estimate = analyser.stratified_mean(values, weights)
+        print(f"  [0, 1]: {spread}, identical: {same}, two strata: {first} around {estimate:.4f}")
+        return spread == (0.0, 1.0) and same == (0.5, 0.5) and first == second and first[0] <= estimate <= first[1]
+
+    def test_lone_singleton_merged(self):
+        """A stratum with one scored sentence joins its neighbour instead of counting as certain"""
+        analyser = TextAnalyser()
+        # Paragraph 0 has 2 sentences (both scored, the same value), paragraph 1 has 98 with one scored.
+        # Bootstrapped separately, neither stratum could vary and the interval would have no width at all
+        strata = [0] * 2 + [1] * 98
+        results = make_results([(0, 0.3), (1, 0.3), (2, 0.9)])
+        intervals = analyser.calculate_confidence_intervals(results, strata, random.Random(analyser.SAMPLING_SEED))
+        low, high = intervals['overall_ai_probability']
+        print(f"  overall_ai_probability interval: [{low}, {high}]")
+        return high - low > 0.3 and low <= 0.3 and high >= 0.9
+
+    def test_singletons_pooled(self):
+        """Several strata with one scored sentence each are pooled into one"""
+        analyser = TextAnalyser()
+        strata = [0, 1, 2, 3]
+        results = make_results([(0, 0.0), (1, 1.0), (2, 0.0), (3, 1.0)])
+        intervals = analyser.calculate_confidence_intervals(results, strata, random.Random(analyser.SAMPLING_SEED))
+        low, high = intervals['overall_ai_probability']
+        print(f"  overall_ai_probability interval: [{low}, {high}]")
+        return low < 0.5 < high
+
+    def test_stops_when_narrow(self):
+        """A consistent document stops after the first batch, with a zero-width interval and no partial flag"""
+        analyser = make_analyser(lambda sentence: 0.8)
+        text = make_document(paragraphs=10, sentences_per_paragraph=20)
+        sentences, strata = analyser.split_into_strata(text)
+        results, intervals, partial = analyser.analyse_sampled(sentences, strata, analyser.locate_sentences(text, sentences))
+        print(f"  Scored {len(results)} of {len(sentences)} sentences, interval {intervals['overall_ai_probability']}")
+        return (len(results) == analyser.SAMPLING_MIN_SAMPLE and intervals['overall_ai_probability'] == [0.8, 0.8]
+                and not partial and len({strata[result['index']] for result in results}) == 10)
+
+    def test_keeps_sampling_when_wide(self):
+        """A document that is half AI, half human never gets narrow enough, so every sentence is scored"""
+        analyser = make_analyser(lambda sentence: 1.0 if sentence_number(sentence) % 2 else 0.0)
+        text = make_document(paragraphs=5, sentences_per_paragraph=20)
+        sentences, strata = analyser.split_into_strata(text)
+        results, intervals, partial = analyser.analyse_sampled(sentences, strata, analyser.locate_sentences(text, sentences))
+        low, high = intervals['overall_ai_probability']
+        print(f"  Scored {len(results)} of {len(sentences)} sentences, interval [{low}, {high}]")
+        return len(results) == len(sentences) and high - low > analyser.SAMPLING_TARGET_WIDTH and not partial
+
+    def test_same_sample_every_time(self):
+        """The fixed seed gives the same sample and interval for the same document"""
+        text = make_document(paragraphs=8, sentences_per_paragraph=15)
+        runs = []
+        for _ in range(2):
+            analyser = make_analyser(lambda sentence: (sentence_number(sentence) % 5) / 4)
+            sentences, strata = analyser.split_into_strata(text)
+            results, intervals, _ = analyser.analyse_sampled(sentences, strata, analyser.locate_sentences(text, sentences))
+            runs.append(([result['index'] for result in results], intervals))
+        print(f"  {len(runs[0][0])} sentences scored, interval {runs[0][1]['overall_ai_probability']}")
+        return runs[0] == runs[1]
+
+    def test_deadline_marks_partial(self):
+        """Past the deadline sampling stops early and the result is partial"""
+        analyser = make_analyser(lambda sentence: 1.0 if sentence_number(sentence) % 2 else 0.0)
+        text = make_document(paragraphs=5, sentences_per_paragraph=20)
+        sentences, strata = analyser.split_into_strata(text)
+        results, _, partial = analyser.analyse_sampled(
+            sentences, strata, analyser.locate_sentences(text, sentences), deadline=time.monotonic() - 1
+        )
+        print(f"  Scored {len(results)} of {len(sentences)} sentences, partial: {partial}")
+        return partial and 0 < len(results) < len(sentences)
+
+    def run_all_tests(self):
+        """Run all sampling tests"""
+        print("=== Sampling Mode Tests ===\n")
+
+        print("--- Confidence Intervals ---")
+        self.test_case("Bootstrap interval", self.test_bootstrap_interval)
+        self.test_case("Lone singleton stratum merged into its neighbour", self.test_lone_singleton_merged)
+        self.test_case("Singleton strata pooled", self.test_singletons_pooled)
+
+        print("\n--- Stopping Rule ---")
+        self.test_case("Stops once the interval is narrow enough", self.test_stops_when_narrow)
+        self.test_case("Keeps sampling while the interval is wide", self.test_keeps_sampling_when_wide)
+        self.test_case("Same document, same sample", self.test_same_sample_every_time)
+        self.test_case("Deadline gives a partial result", self.test_deadline_marks_partial)
+
+        # Results
+        print(f"\n=== Test Results ===")
+        print(f"Passed: {self.passed}/{self.total}")
+        print(f"Success Rate: {(self.passed/self.total)*100:.1f}%")
+
+        if self.passed == self.total:
+            print("All tests passed!")
+        else:
+            print("Some tests failed... check the output above")
+
+        return self.passed == self.total
+
+
+if __name__ == "__main__":
+    tester = TextAnalyserTester()
+    success = tester.run_all_tests()
+    sys.exit(0 if success else 1)
@@ -10,7 +10,7 @@ const TextInput = function({ onSubmit, onFileAttach }) {
   
   // Limits for validation
   const maxChars = 100000; // Maximum characters allowed
-  const maxFileSize = 500 * 1024; // 500KB in bytes (1024 bytes = 1KB)
+  const maxFileSize = 20 * 1024 * 1024; // 20MB in bytes (matches the backend default)
 
   // Update text when user types in the textarea
   function handleChange(event) {
@@ -44,7 +44,7 @@ const TextInput = function({ onSubmit, onFileAttach }) {
     if (file && onFileAttach) {
       // Check if file is too big
       if (file.size > maxFileSize) {
-        alert("File is too big! Maximum size is 500KB.");
+        alert("File is too big! Maximum size is 20MB.");
         event.target.value = ''; // Reset file input
         return;
       }
@@ -53,15 +53,23 @@ const TextInput = function({ onSubmit, onFileAttach }) {
       const allowedTypes = [
         "application/pdf", // PDF files
         "application/vnd.openxmlformats-officedocument.wordprocessingml.document", // Word documents (.docx)
+        "application/vnd.oasis.opendocument.text", // LibreOffice documents (.odt)
+        "application/rtf", "text/rtf", // Rich text (.rtf)
+        "text/html", // Web pages (.html)
+        "text/markdown", // Markdown (.md)
         "text/plain", // Text files (.txt)
       ];
+      // Browsers don't always know the MIME type (Markdown especially), so the extension counts too.
+      // The server checks the content either way
+      const allowedExtensions = ["pdf", "docx", "odt", "rtf", "html", "htm", "md", "markdown", "txt"];
+      const extension = file.name.split(".").pop().toLowerCase();
       
       // Check if the selected file type is allowed
-      if (allowedTypes.includes(file.type)) {
+      if (allowedTypes.includes(file.type) || allowedExtensions.includes(extension)) {
         setAttachedFile(file); // Store the file in state
         onFileAttach(file); // Notify parent component
       } else {
-        alert("Please choose a PDF, Word document, or text file.");
+        alert("Please choose a PDF, Word, OpenDocument, RTF, HTML, Markdown or text file.");
       }
     }
     
@@ -138,7 +146,7 @@ const TextInput = function({ onSubmit, onFileAttach }) {
             </span>
           ) : (
             <span style={{ fontSize: "0.75rem", color: "#666", display: "block", marginTop: "2px" }}>
-              Max. File Size: 500KB
+              Max. File Size: 20MB
             </span>
           )}
         </div>
@@ -149,7 +157,7 @@ const TextInput = function({ onSubmit, onFileAttach }) {
           <label style={{ cursor: "pointer" }}>
             <input
               type="file"
-              accept=".docx,.pdf,.txt"
+              accept=".docx,.pdf,.txt,.odt,.rtf,.html,.htm,.md,.markdown"
               style={{ display: "none" }} // Hide ugly file input
               onChange={handleFileChange}
             />
@@ -68,7 +68,7 @@ const AITextDetectorPage = function() {
     setInputText(text); // Store the text user submitted
 
     const maxChars = 100000; // Character limit
-    const maxFileSize = 500 * 1024; // 500KB file size limit
+    const maxFileSize = 20 * 1024 * 1024; // 20MB file size limit (matches the backend default)
 
     // Check if text is too long
     if (text && text.length > maxChars) {
@@ -79,7 +79,7 @@ const AITextDetectorPage = function() {
 
     // Check if file is too big
     if (file && file.size > maxFileSize) {
-      setError("File is too big! Maximum size is 500KB.");
+      setError("File is too big! Maximum size is 20MB.");
       setIsProcessing(false);
       return;
     }
@@ -16,6 +16,8 @@ const HistoryPage = function() {
   const [error, setError] = useState(null); // Error messages
   const [selectedAnalysis, setSelectedAnalysis] = useState(null); // Which analysis is clicked
   const [showAnalysisDetail, setShowAnalysisDetail] = useState(false); // Show details view
+  const [nextCursor, setNextCursor] = useState(null); // Where the next page of history starts (null = no more)
+  const [loadingMore, setLoadingMore] = useState(false); // Loading the next page
 
   const navigate = useNavigate(); // For changing pages
   const panelButtons = ["AI Text Detector", "History"]; // Navigation buttons
@@ -32,7 +34,8 @@ const HistoryPage = function() {
     navigate("/");
   };
 
-  // Load the analysis history from the API
+  // Load the first page of analysis history from the API
+  // The list only has summaries (no sentence results), the full analysis is loaded when a tab is clicked
   async function loadHistory() {
     setLoading(true); // Show loading spinner
     setError(null); // Clear any errors
@@ -41,12 +44,9 @@ const HistoryPage = function() {
       const response = await apiService.getHistory();
       console.log("History loaded:", response.data);
       
-      // Sort analyses from newest to oldest
-      const sortedAnalyses = (response.data.analyses || []).sort(function(a, b) {
-        return new Date(b.timestamp) - new Date(a.timestamp);
-      });
-      
-      setAnalyses(sortedAnalyses);
+      // The API already returns analyses from newest to oldest
+      setAnalyses(response.data.analyses || []);
+      setNextCursor(response.data.next_cursor || null);
     } catch (err) {
       const errorMessage = handleApiError(err);
       setError(errorMessage);
@@ -56,12 +56,33 @@ const HistoryPage = function() {
     }
   };
 
+  // Load the next page of history and add it to the end of the list
+  async function loadMoreHistory() {
+    setLoadingMore(true);
+    setError(null);
+
+    try {
+      const response = await apiService.getHistory(nextCursor);
+      setAnalyses(function(current) {
+        return current.concat(response.data.analyses || []);
+      });
+      setNextCursor(response.data.next_cursor || null);
+    } catch (err) {
+      const errorMessage = handleApiError(err);
+      setError(errorMessage);
+      console.error("Error loading more history:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   // Clear all history (with confirmation)
   async function clearHistory() {
     if (window.confirm("Are you sure you want to clear all history?")) {
       try {
         await apiService.clearHistory();
         setAnalyses([]); // Empty the list
+        setNextCursor(null);
         setSelectedAnalysis(null); // Clear selection
       } catch (err) {
         const errorMessage = handleApiError(err);
@@ -71,10 +92,18 @@ const HistoryPage = function() {
     }
   };
 
-  // Handle when a history tab is clicked
-  function handleTabClick(analysis) {
+  // Handle when a history tab is clicked: fetch the full analysis (with sentence results) and show it
+  async function handleTabClick(analysis) {
     setSelectedAnalysis(analysis);
     setShowAnalysisDetail(true); // Show the detailed view
+
+    try {
+      const response = await apiService.getAnalysis(analysis.id);
+      setSelectedAnalysis(response.data.analysis);
+    } catch (err) {
+      // Keep showing the summary we already have
+      console.error("Error loading analysis details:", err);
+    }
   };
 
   // Load history when page first loads
@@ -156,6 +185,20 @@ const HistoryPage = function() {
                       );
                     })}
                   </div>
+
+                  {/* Only shown while there are older analyses to load */}
+                  {nextCursor && (
+                    <div className="history-controls">
+                      <Button 
+                        onClick={loadMoreHistory}
+                        variant="primary"
+                        size="small"
+                        disabled={loadingMore}
+                      >
+                        {loadingMore ? "Loading..." : "Load More"}
+                      </Button>
+                    </div>
+                  )}
                 </>
               )}
             </div>
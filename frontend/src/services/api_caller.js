@@ -149,9 +149,16 @@ export const apiService = {
     return apiClient.post('/detect', formData, { headers });
   },
   
-  // Get history
-  getHistory: function() {
-    return apiClient.get('/history');
+  // Get a page of history (newest first). Pass the previous page's next_cursor to get the page after it
+  getHistory: function(cursor, limit) {
+    const params = {};
+    if (cursor) {
+      params.cursor = cursor;
+    }
+    if (limit) {
+      params.limit = limit;
+    }
+    return apiClient.get('/history', { params: params });
   },
   
   // Get specific analysis
@@ -196,7 +203,7 @@ export const handleApiError = function(error) {
     } else if (status === 404) {
       return data.error || 'Page not found';
     } else if (status === 413) {
-      return data.error || 'File too big (max 500KB)';
+      return data.error || 'File too big (max 20MB)';
     } else if (status === 500) {
       return data.error || 'Server error';
     } else {